@@ -0,0 +1,88 @@
+"""Benchmark of the active-particle compaction of model rollouts.
+
+Action sequences are evaluated with `rollout_actions', as an MPC solver does, with
+the dimensions of MuJoCo Hopper and the default neural network dynamical model.
+Each particle terminates with a fixed probability per step, as with
+`LargeStateTermination' in locomotion tasks. For each compaction threshold, the
+number of particles on which the dynamical model is evaluated and the wall-clock
+time are compared with the rollouts without compaction.
+"""
+import time
+
+import numpy as np
+import torch
+
+from rllib.model import AbstractModel, NNModel
+from rllib.reward.quadratic_reward import QuadraticReward
+from rllib.util.rollout import rollout_actions
+
+DIM_STATE, DIM_ACTION = 11, 3
+NUM_PARTICLES = 400
+HORIZON = 25
+HAZARDS = [0.0, 0.05, 0.2]
+THRESHOLDS = [None, 0.5, 0.25, 0.0]
+NUM_REPETITIONS = 5
+SEED = 0
+
+torch.manual_seed(SEED)
+np.random.seed(SEED)
+
+
+class HazardTermination(AbstractModel):
+    """Termination model where each particle terminates with probability `hazard'."""
+
+    def __init__(self, hazard):
+        super().__init__(dim_state=(), dim_action=(), model_kind="termination")
+        self.hazard = hazard
+
+    def forward(self, state, action, next_state=None):
+        """Return termination model logits."""
+        probs = torch.tensor([1 - self.hazard, self.hazard])
+        return probs.log().expand(*state.shape[:-1], 2)
+
+
+class CountingNNModel(NNModel):
+    """Neural network model that counts the particles on which it is evaluated."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_evaluations = 0
+
+    def forward(self, state, action, next_state=None):
+        """See `NNModel.forward'."""
+        self.num_evaluations += state.shape[:-1].numel()
+        return super().forward(state, action, next_state)
+
+
+dynamical_model = CountingNNModel(dim_state=(DIM_STATE,), dim_action=(DIM_ACTION,))
+reward_model = QuadraticReward(torch.eye(DIM_STATE), 0.1 * torch.eye(DIM_ACTION))
+dynamical_model.eval()
+
+for hazard in HAZARDS:
+    termination_model = HazardTermination(hazard)
+    print(f"Termination probability per step {hazard}:")
+    baseline = None
+    for threshold in THRESHOLDS:
+        dynamical_model.num_evaluations = 0
+        start = time.time()
+        with torch.no_grad():
+            for _ in range(NUM_REPETITIONS):
+                rollout_actions(
+                    dynamical_model,
+                    reward_model,
+                    torch.randn(HORIZON, NUM_PARTICLES, DIM_ACTION),
+                    torch.randn(NUM_PARTICLES, DIM_STATE),
+                    termination_model,
+                    stack_dim=-2,
+                    fields=["reward"],
+                    compaction_threshold=threshold,
+                )
+        elapsed = (time.time() - start) / NUM_REPETITIONS
+        evaluations = dynamical_model.num_evaluations / NUM_REPETITIONS
+        if baseline is None:
+            baseline = (evaluations, elapsed)
+        print(
+            f"  threshold {threshold}: {evaluations:.0f} model evaluations "
+            f"({evaluations / baseline[0]:.2f}x), {1000 * elapsed:.1f} ms "
+            f"({elapsed / baseline[1]:.2f}x)."
+        )
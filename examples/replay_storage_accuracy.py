@@ -0,0 +1,81 @@
+"""Accuracy report of the reduced-precision storage of an Experience Replay.
+
+The same transitions are stored in full precision and with every reduced-precision
+storage policy. Then, the same batches are sampled from every buffer and compared.
+The errors are relative to the standard deviation of each dimension.
+The states have the dimensions of MuJoCo Humanoid and Ant, with a different scale
+per dimension.
+"""
+
+import numpy as np
+import torch
+
+from rllib.dataset import ExperienceReplay, reduced_precision_storage
+from rllib.dataset.datatypes import Observation
+
+ENVIRONMENTS = {"Humanoid": (376, 17), "Ant": (111, 8)}
+MAX_LEN = 20000
+NUM_STEPS = 1
+NUM_BATCHES = 10
+BATCH_SIZE = 256
+SEED = 0
+
+torch.manual_seed(SEED)
+np.random.seed(SEED)
+
+
+def memory_size(memory):
+    """Get the number of bytes of the columns of a buffer."""
+    return sum(column.element_size() * column.numel() for column in memory.memory)
+
+
+for environment, (dim_state, dim_action) in ENVIRONMENTS.items():
+    state_scale = torch.logspace(-2, 2, dim_state)
+    policies = {
+        "float32": None,
+        "float16": reduced_precision_storage(torch.float16),
+        "bfloat16": reduced_precision_storage(torch.bfloat16),
+        "uint8": reduced_precision_storage(torch.uint8),
+    }
+    memories = {
+        name: ExperienceReplay(MAX_LEN, num_steps=NUM_STEPS, storage_dtypes=policy)
+        for name, policy in policies.items()
+    }
+
+    state = torch.randn(dim_state) * state_scale
+    for i in range(MAX_LEN):
+        next_state = state + 0.1 * torch.randn(dim_state) * state_scale
+        observation = Observation(
+            state=state,
+            action=torch.randn(dim_action),
+            reward=torch.randn(()),
+            next_state=next_state,
+            done=torch.tensor(float(i % 1000 == 999)),
+            log_prob_action=torch.randn(()),
+        ).to_torch()
+        for memory in memories.values():
+            memory.append(observation.clone())
+        state = next_state
+
+    full = memories.pop("float32")
+    print(f"{environment}: {memory_size(full) / 2 ** 20:.1f} MiB in float32.")
+    for name, memory in memories.items():
+        errors = {"state": [], "next_state": [], "reward": [], "log_prob_action": []}
+        for _ in range(NUM_BATCHES):
+            indexes = np.random.choice(full.valid_indexes, BATCH_SIZE)
+            observation = full._get_observation(indexes)
+            reduced_observation = memory._get_observation(indexes)
+            for key in errors:
+                x, y = getattr(observation, key), getattr(reduced_observation, key)
+                errors[key].append((x - y).abs() / (x.std(0) + 1e-6))
+
+        print(
+            f"  {name}: {memory_size(memory) / 2 ** 20:.1f} MiB "
+            f"({memory_size(full) / memory_size(memory):.1f}x smaller)."
+        )
+        for key, error in errors.items():
+            error = torch.cat(error)
+            print(
+                f"    {key}: error / std "
+                f"median {error.median():.2e}, max {error.max():.2e}."
+            )
@@ -1,5 +1,6 @@
 """Interface for agents."""
 import contextlib
+import os
 from abc import ABCMeta
 from dataclasses import asdict
 
@@ -9,6 +10,10 @@ from torch.optim.optimizer import Optimizer
 from tqdm import tqdm
 
 from rllib.dataset.datatypes import Loss
+from rllib.dataset.experience_replay import (
+    ExperienceReplay,
+    MemoryMappedExperienceReplay,
+)
 from rllib.dataset.utilities import average_dataclass
 from rllib.util.early_stopping import EarlyStopping
 from rllib.util.logger import Logger
@@ -131,7 +136,10 @@ class AbstractAgent(object, metaclass=ABCMeta):
         if self.total_steps < self.exploration_steps or (
             self.total_episodes < self.exploration_episodes
         ):
-            policy = self.policy.random()
+            state_shape = torch.as_tensor(state).shape
+            num_batch_dims = len(state_shape) - len(self.policy.dim_state)
+            batch_shape = state_shape[: max(num_batch_dims, 0)]
+            policy = self.policy.random(batch_shape if batch_shape else None)
         else:
             if not isinstance(state, torch.Tensor):
                 state = torch.tensor(
@@ -143,7 +151,7 @@ class AbstractAgent(object, metaclass=ABCMeta):
         if self.training:
             action = self.pi.sample()
         elif self.pi.has_enumerate_support:
-            action = torch.argmax(self.pi.probs)
+            action = torch.argmax(self.pi.probs, dim=-1)  # One per state of a batch.
         else:
             try:
                 action = self.pi.mean
@@ -167,11 +175,10 @@ class AbstractAgent(object, metaclass=ABCMeta):
             self.policy.update()  # update policy parameters (eps-greedy.)
             self.counters["total_steps"] += 1
             self.episode_steps[-1] += 1
-        self.logger.update(rewards=observation.reward.item())
-        self.logger.update(entropy=observation.entropy.item())
-
+        self.logger.update(
+            rewards=observation.reward.item(), entropy=observation.entropy.item()
+        )
         self.last_trajectory.append(observation)
-        observation.to(self.device)
 
     def start_episode(self):
         """Start a new episode."""
@@ -312,6 +319,14 @@ class AbstractAgent(object, metaclass=ABCMeta):
         -------
         path: str.
             Path where agent is saved.
+
+        Notes
+        -----
+        Experience replay buffers are not pickled. Instead, a columnar snapshot is
+        saved in a directory next to the agent, e.g. `last_memory' for `last.pkl', and
+        the agent only stores its path.
+        Memory-mapped buffers are pickled, as they only store a reference to their
+        files.
         """
         if directory is None:
             directory = self.logger.log_dir
@@ -323,6 +338,10 @@ class AbstractAgent(object, metaclass=ABCMeta):
                 continue
             elif isinstance(value, nn.Module) or isinstance(value, Optimizer):
                 params[key] = value.state_dict()
+            elif isinstance(value, ExperienceReplay) and not isinstance(
+                value, MemoryMappedExperienceReplay
+            ):
+                params[key] = value.save(f"{os.path.splitext(path)[0]}_{key}")
             else:
                 params[key] = value
 
@@ -344,5 +363,9 @@ class AbstractAgent(object, metaclass=ABCMeta):
                 continue
             elif isinstance(value, nn.Module) or isinstance(value, Optimizer):
                 value.load_state_dict(agent_dict[key])
+            elif isinstance(value, ExperienceReplay) and isinstance(
+                agent_dict[key], str
+            ):
+                value.load(agent_dict[key])
             else:
                 self.__dict__[key] = agent_dict[key]
@@ -14,7 +14,12 @@ from torch.optim import Adam
 from rllib.agent.abstract_agent import AbstractAgent
 from rllib.algorithms.model_learning_algorithm import ModelLearningAlgorithm
 from rllib.algorithms.mpc.policy_shooting import PolicyShooting
-from rllib.dataset.experience_replay import ExperienceReplay, StateExperienceReplay
+from rllib.dataset.experience_replay import (
+    BatchPrefetcher,
+    ExperienceReplay,
+    MemoryMappedExperienceReplay,
+    StateExperienceReplay,
+)
 from rllib.model import TransformedModel
 from rllib.policy.mpc_policy import MPCPolicy
 from rllib.policy.random_policy import RandomPolicy
@@ -32,6 +37,11 @@ class ModelBasedAgent(AbstractAgent):
     planning_algorithm: MPCSolver.
     thompson_sampling: bool.
         Flag that indicates whether or not to use posterior sampling for the model.
+    prefetch_batches: int, optional (default=0).
+        Number of batches sampled in a background thread during `learn'. Only use it
+        if the policy learning algorithm does not sample the memory itself.
+    stale_priorities: bool, optional (default=False).
+        Allow prefetched batches to miss the latest updates of the memory.
 
     Other Parameters
     ----------------
@@ -59,6 +69,8 @@ class ModelBasedAgent(AbstractAgent):
         memory=None,
         batch_size=100,
         clip_grad_val=10.0,
+        prefetch_batches=0,
+        stale_priorities=False,
         *args,
         **kwargs,
     ):
@@ -109,7 +121,11 @@ class ModelBasedAgent(AbstractAgent):
 
         if memory is None:
             memory = ExperienceReplay(max_len=100000, num_steps=0)
+        if isinstance(memory, MemoryMappedExperienceReplay) and memory.path is None:
+            memory.path = f"{self.logger.log_dir}/memory"
         self.memory = memory
+        self.prefetch_batches = prefetch_batches
+        self.stale_priorities = stale_priorities
         self.initial_states_dataset = StateExperienceReplay(
             max_len=1000, dim_state=self.dynamical_model.dim_state
         )
@@ -179,14 +195,18 @@ class ModelBasedAgent(AbstractAgent):
 
     def learn(self, memory=None):
         """Learn a policy with the model."""
-        #
+        prefetcher = BatchPrefetcher(
+            self.memory if memory is None else memory,
+            self.batch_size,
+            max_prefetch=self.prefetch_batches,
+            stale_priorities=self.stale_priorities,
+            # The batches are only sampled together when they are prefetched.
+            num_batches=self.num_iter if self.prefetch_batches > 0 else None,
+        )
 
         def closure():
             """Gradient calculation."""
-            if memory is None:
-                observation, *_ = self.memory.sample_batch(self.batch_size)
-            else:
-                observation, *_ = memory.sample_batch(self.batch_size)
+            observation, *_ = prefetcher.sample_batch()
             self.optimizer.zero_grad()
             losses = self.algorithm(observation.clone())
             losses.combined_loss.mean().backward()
@@ -198,7 +218,7 @@ class ModelBasedAgent(AbstractAgent):
 
         with DisableGradient(
             self.dynamical_model, self.reward_model, self.termination_model
-        ):
+        ), prefetcher:
             self._learn_steps(closure)
 
     @property
@@ -16,6 +16,8 @@ class ModelBasedAgent(AbstractAgent):
     thompson_sampling: bool
     memory: ExperienceReplay
     initial_states_dataset: StateExperienceReplay
+    prefetch_batches: int
+    stale_priorities: bool
     model_learn_train_frequency: int
     model_learn_num_rollouts: int
     model_learn_exploration_episodes: int
@@ -37,6 +39,8 @@ class ModelBasedAgent(AbstractAgent):
         memory: Optional[ExperienceReplay] = ...,
         thompson_sampling: bool = ...,
         training_verbose: bool = ...,
+        prefetch_batches: int = ...,
+        stale_priorities: bool = ...,
         *args: Any,
         **kwargs: Any,
     ) -> None: ...
@@ -3,11 +3,32 @@
 import torch
 
 from rllib.agent.abstract_agent import AbstractAgent
-from rllib.dataset.experience_replay import ExperienceReplay
+from rllib.dataset.experience_replay import (
+    BatchPrefetcher,
+    ExperienceReplay,
+    MemoryMappedExperienceReplay,
+)
 
 
 class OffPolicyAgent(AbstractAgent):
-    """Template for an on-policy algorithm."""
+    """Template for an on-policy algorithm.
+
+    Parameters
+    ----------
+    memory: ExperienceReplay.
+        Memory where the observations are stored.
+    reset_memory_after_learn: bool, optional (default=False).
+        Flag that resets the memory after each call to `learn'.
+    prefetch_batches: int, optional (default=0).
+        Number of batches sampled in a background thread during `learn'.
+        If zero, the batches are sampled synchronously.
+    stale_priorities: bool, optional (default=False).
+        Allow prefetched batches to miss the latest updates of the memory.
+
+    Other Parameters
+    ----------------
+    See AbstractAgent.
+    """
 
     def __init__(
         self,
@@ -15,6 +36,8 @@ class OffPolicyAgent(AbstractAgent):
         train_frequency=1,
         batch_size=100,
         reset_memory_after_learn=False,
+        prefetch_batches=0,
+        stale_priorities=False,
         *args,
         **kwargs,
     ):
@@ -22,6 +45,10 @@ class OffPolicyAgent(AbstractAgent):
             train_frequency=train_frequency, batch_size=batch_size, *args, **kwargs
         )
         self.reset_memory_after_learn = reset_memory_after_learn
+        self.prefetch_batches = prefetch_batches
+        self.stale_priorities = stale_priorities
+        if isinstance(memory, MemoryMappedExperienceReplay) and memory.path is None:
+            memory.path = f"{self.logger.log_dir}/memory"
         self.memory = memory
 
     @classmethod
@@ -53,11 +80,18 @@ class OffPolicyAgent(AbstractAgent):
 
     def learn(self):
         """Train the off-policy agent."""
-        #
+        prefetcher = BatchPrefetcher(
+            self.memory,
+            self.batch_size,
+            max_prefetch=self.prefetch_batches,
+            stale_priorities=self.stale_priorities,
+            # The batches are only sampled together when they are prefetched.
+            num_batches=self.num_iter if self.prefetch_batches > 0 else None,
+        )
 
         def closure():
             """Gradient calculation."""
-            observation, idx, weight = self.memory.sample_batch(self.batch_size)
+            observation, idx, weight = prefetcher.sample_batch()
 
             self.optimizer.zero_grad()
             losses_ = self.algorithm(observation.clone())
@@ -68,11 +102,12 @@ class OffPolicyAgent(AbstractAgent):
             )
 
             # Update memory
-            self.memory.update(idx, losses_.td_error.abs().detach())
+            prefetcher.update(idx, losses_.td_error.abs().detach())
 
             return losses_
 
-        self._learn_steps(closure)
+        with prefetcher:
+            self._learn_steps(closure)
 
         if self.reset_memory_after_learn:
             self.memory.reset()
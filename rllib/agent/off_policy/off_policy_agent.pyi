@@ -10,12 +10,16 @@ class OffPolicyAgent(AbstractAgent):
     algorithm: AbstractAlgorithm
     memory: ExperienceReplay
     reset_memory_after_learn: bool
+    prefetch_batches: int
+    stale_priorities: bool
     def __init__(
         self,
         memory: ExperienceReplay,
         num_iter: int = ...,
         batch_size: int = ...,
         reset_memory_after_learn: bool = ...,
+        prefetch_batches: int = ...,
+        stale_priorities: bool = ...,
         *args: Any,
         **kwargs: Any,
     ) -> None: ...
@@ -85,14 +85,13 @@ class AbstractMBAlgorithm(object):
             initial_action=initial_action,
             max_steps=self.num_steps,
             termination_model=self.termination_model,
+            stack_dim=initial_state.ndim - 1 if stack_obs else None,
         )
         if not stack_obs:
             self._log_trajectory(trajectory)
-            return trajectory
         else:
-            observation = stack_list_of_tuples(trajectory, dim=initial_state.ndim - 1)
-            self._log_observation(observation)
-            return observation
+            self._log_observation(trajectory)
+        return trajectory
 
     def _log_trajectory(self, trajectory):
         """Log the simulated trajectory."""
@@ -2,7 +2,7 @@
 import torch
 
 from rllib.dataset.experience_replay import ExperienceReplay
-from rllib.dataset.utilities import unstack_observations
+from rllib.dataset.experience_replay.utilities import sample_initial_states
 
 from .dyna import Dyna
 
@@ -61,36 +61,21 @@ class DataAugmentation(Dyna):
             trajectory = super().simulate(state, policy, stack_obs=stack_obs)
 
         for observations in trajectory:
-            observation_samples = unstack_observations(observations)
-            for observation in observation_samples:
-                self.sim_memory.append(observation)
+            self.sim_memory.extend(observations)
 
         return trajectory
 
     def _sample_initial_states(self):
         """Get initial states to sample from."""
-        # Samples from experience replay empirical distribution.
-        obs, *_ = self.memory.sample_batch(self.num_memory_samples)
-        for transform in self.memory.transformations:
-            obs = transform.inverse(obs)
-        initial_states = obs.state[:, 0, :]  # obs is an n-step return.
-
-        # Samples from empirical initial state distribution.
-        if self.num_initial_state_samples > 0:
-            initial_states_ = self.initial_state_dataset.sample_batch(
-                self.num_initial_state_samples
-            )
-            initial_states = torch.cat((initial_states, initial_states_), dim=0)
-
-        # Samples from initial distribution.
-        if self.num_initial_distribution_samples > 0:
-            initial_states_ = self.initial_distribution.sample(
-                (self.num_initial_distribution_samples,)
-            )
-            initial_states = torch.cat((initial_states, initial_states_), dim=0)
-
-        initial_states = initial_states.unsqueeze(0)
-        return initial_states
+        initial_states = sample_initial_states(
+            initial_states_dataset=self.initial_state_dataset,
+            num_initial_state_samples=self.num_initial_state_samples,
+            initial_distribution=self.initial_distribution,
+            num_initial_distribution_samples=self.num_initial_distribution_samples,
+            memory=self.memory,
+            num_memory_samples=self.num_memory_samples,
+        )
+        return initial_states.unsqueeze(0)
 
     def update(self):
         """Update base algorithm."""
@@ -32,6 +32,9 @@ class ModelLearningAlgorithm(AbstractMBAlgorithm):
         Maximum size of dataset.
     validation_ratio: float.
         Validation set ratio.
+    per_head_batches: bool.
+        Flag that indicates whether to train each head of an ensemble with a batch
+        sampled from its bootstrap mask.
 
     Other Parameters
     ----------------
@@ -57,6 +60,7 @@ class ModelLearningAlgorithm(AbstractMBAlgorithm):
         validation_ratio=0.1,
         calibrate=True,
         num_steps=0,
+        per_head_batches=False,
         *args,
         **kwargs,
     ):
@@ -90,6 +94,7 @@ class ModelLearningAlgorithm(AbstractMBAlgorithm):
         self.non_decrease_iter = non_decrease_iter
         self.validation_ratio = validation_ratio
         self.calibrate = calibrate
+        self.per_head_batches = per_head_batches
 
         if self.num_epochs > 0:
             assert self.model_optimizer is not None
@@ -140,6 +145,7 @@ class ModelLearningAlgorithm(AbstractMBAlgorithm):
             logger=logger,
             epsilon=self.epsilon,
             non_decrease_iter=self.non_decrease_iter,
+            per_head_batches=self.per_head_batches,
         )
         if (
             calibrate
@@ -17,6 +17,7 @@ class ModelLearningAlgorithm(AbstractMBAlgorithm):
     non_decrease_iter: int
     validation_ratio: float
     calibrate: bool
+    per_head_batches: bool
     train_set: BootstrapExperienceReplay
     validation_set: BootstrapExperienceReplay
     def __init__(
@@ -31,6 +32,7 @@ class ModelLearningAlgorithm(AbstractMBAlgorithm):
         non_decrease_iter: int = ...,
         calibrate: bool = ...,
         num_steps: int = ...,
+        per_head_batches: bool = ...,
         *args: Any,
         **kwargs: Any,
     ) -> None: ...
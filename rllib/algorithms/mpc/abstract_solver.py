@@ -6,7 +6,6 @@ import numpy as np
 import torch
 import torch.nn as nn
 
-from rllib.dataset.utilities import stack_list_of_tuples
 from rllib.util.multiprocessing import run_parallel_returns
 from rllib.util.neural_networks.utilities import repeat_along_dimension
 from rllib.util.rollout import rollout_actions
@@ -103,15 +102,15 @@ class MPCSolver(nn.Module, metaclass=ABCMeta):
 
     def evaluate_action_sequence(self, action_sequence, state):
         """Evaluate action sequence by performing a rollout."""
-        trajectory = stack_list_of_tuples(
-            rollout_actions(
-                self.dynamical_model,
-                self.reward_model,
-                self.action_scale * action_sequence,  # scale actions.
-                state,
-                self.termination_model,
-            ),
-            dim=-2,
+        fields = ("reward", "next_state") if self.terminal_reward else ("reward",)
+        trajectory = rollout_actions(
+            self.dynamical_model,
+            self.reward_model,
+            self.action_scale * action_sequence,  # scale actions.
+            state,
+            self.termination_model,
+            stack_dim=-2,
+            fields=fields,
         )
 
         returns = discount_sum(trajectory.reward, self.gamma)
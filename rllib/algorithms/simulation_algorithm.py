@@ -1,7 +1,7 @@
 """Python Script Template."""
 import gpytorch
-import torch
 
+from rllib.dataset.experience_replay.utilities import sample_initial_states
 from rllib.util.neural_networks.utilities import DisableGradient
 
 from .abstract_mb_algorithm import AbstractMBAlgorithm
@@ -65,29 +65,15 @@ class SimulationAlgorithm(AbstractMBAlgorithm):
 
     def get_initial_states(self, initial_states_dataset, real_dataset):
         """Get initial states to sample from."""
-        # Samples from empirical initial state distribution.
-        initial_states = initial_states_dataset.sample_batch(
-            max(self.num_initial_state_samples, 1)
-            # hack: f
+        initial_states = sample_initial_states(
+            initial_states_dataset=initial_states_dataset,
+            num_initial_state_samples=max(self.num_initial_state_samples, 1),
+            initial_distribution=self.initial_distribution,
+            num_initial_distribution_samples=self.num_initial_distribution_samples,
+            memory=real_dataset,
+            num_memory_samples=self.num_memory_samples,
         )
-
-        # Samples from initial distribution.
-        if self.num_initial_distribution_samples > 0:
-            initial_states_ = self.initial_distribution.sample(
-                (self.num_initial_distribution_samples,)
-            )
-            initial_states = torch.cat((initial_states, initial_states_), dim=0)
-
-        # Samples from experience replay empirical distribution.
-        if self.num_memory_samples > 0:
-            obs, *_ = real_dataset.sample_batch(self.num_memory_samples)
-            for transform in real_dataset.transformations:
-                obs = transform.inverse(obs)
-            initial_states_ = obs.state[:, 0, :]  # obs is an n-step return.
-            initial_states = torch.cat((initial_states, initial_states_), dim=0)
-
-        initial_states = initial_states.unsqueeze(0)
-        return initial_states
+        return initial_states.unsqueeze(0)
 
     def simulate(
         self, state, policy, initial_action=None, logger=None, stack_obs=False
@@ -1,3 +1,4 @@
 from .dataset import TrajectoryDataset
+from .episode_buffer import EpisodeBuffer
 from .experience_replay import *
 from .utilities import *
@@ -1,13 +1,10 @@
 """Implementation of a Trajectory Dataset."""
-from dataclasses import asdict
-
-import numpy as np
 import torch
 from torch.utils import data
 
 from rllib.dataset.datatypes import Observation
 
-from .utilities import map_and_cast, stack_list_of_tuples
+from .utilities import stack_list_of_tuples
 
 
 class TrajectoryDataset(data.Dataset):
@@ -15,6 +12,12 @@ class TrajectoryDataset(data.Dataset):
 
     The dataset splits the dataset into subsequences of fixed length.
 
+    The trajectories are stored contiguously, in one column per field of the
+    Observation, and `_offsets' holds the row where each trajectory starts, as a
+    ragged (CSR) array. The columns grow geometrically. A sub-trajectory is a slice of
+    the columns, hence it is not copied, and a batch of sub-trajectories is gathered
+    with one index per column.
+
     Properties
     ----------
     sequence_length: int, optional(default: 1)
@@ -33,6 +36,8 @@ class TrajectoryDataset(data.Dataset):
         append a trajectory to the dataset.
     shuffle():
         shuffle the dataset.
+    sample_batch(batch_size):
+        sample a batch of sub-trajectories.
     sequence_length: int
         length of the sub-trajectories.
 
@@ -41,9 +46,13 @@ class TrajectoryDataset(data.Dataset):
     def __init__(self, sequence_length=None, transformations=None):
         super().__init__()
         self._sequence_length = sequence_length
-        self._trajectories = []
-        self._sub_trajectory_indexes = []
+        self._data = None
+        self._offsets = torch.zeros(1, dtype=torch.long)
+        self._trajectory_indexes = torch.zeros(0, dtype=torch.long)
+        self._sub_trajectory_indexes = torch.zeros(0, dtype=torch.long)
         self._num_points = 0
+        self._all_data = None
+        self._all_data_versions = None
         self.transformations = transformations if transformations else []
 
     def __getitem__(self, idx):
@@ -58,17 +67,14 @@ class TrajectoryDataset(data.Dataset):
         sub-trajectory: Observation
         """
         if self.sequence_length is None:  # get trajectory
-            observation = self._trajectories[idx]
+            trajectory_idx = self._trajectory_indexes[idx]
+            start = self._offsets[trajectory_idx]
+            end = self._offsets[trajectory_idx + 1]
         else:  # Get sub-trajectory.
-            trajectory_idx, start = self._sub_trajectory_indexes[idx]
+            start = self._sub_trajectory_indexes[idx]
             end = start + self._sequence_length
 
-            trajectory = self._trajectories[trajectory_idx]
-
-            observation = Observation(
-                **{key: val[start:end] for key, val in asdict(trajectory).items()}
-            )
-
+        observation = Observation(*map(lambda x: x[start:end], self._data))
         for transform in self.transformations:
             observation = transform(observation)
 
@@ -86,13 +92,42 @@ class TrajectoryDataset(data.Dataset):
 
         """
         if self._sequence_length is None:
-            return len(self._trajectories)
+            return len(self._trajectory_indexes)
         else:
             return len(self._sub_trajectory_indexes)
 
+    @property
+    def num_trajectories(self):
+        """Return the number of trajectories."""
+        return len(self._offsets) - 1
+
+    def _write(self, trajectory, num_observations):
+        """Write a trajectory after the last row, growing the columns if needed."""
+        start, end = self._num_points, self._num_points + num_observations
+        if self._data is None:
+            self._data = Observation(
+                *map(lambda x: x.new_zeros((end,) + x.shape[1:]), trajectory)
+            )
+        elif end > len(self._data.state):
+            capacity = max(end, 2 * len(self._data.state))
+            self._data = Observation(
+                *map(
+                    lambda x: torch.cat(
+                        (x, x.new_zeros((capacity - len(x),) + x.shape[1:]))
+                    ),
+                    self._data,
+                )
+            )
+        for column, value in zip(self._data, trajectory):
+            column[start:end] = value.detach()
+        self._num_points = end
+
     def append(self, trajectory):
         """Append new trajectories to the dataset.
 
+        The fields of the trajectory without a leading dimension with the number of
+        observations are shared by all of them.
+
         Parameters
         ----------
         trajectory: sized
@@ -102,9 +137,10 @@ class TrajectoryDataset(data.Dataset):
         ValueError
             If the new trajectory is shorter than the sequence length.
         """
-        trajectory_index = len(self._trajectories)
+        trajectory_index = self.num_trajectories
 
         if isinstance(trajectory, Observation):
+            trajectory = trajectory.to_torch()
             try:
                 num_observations = len(trajectory.reward)
             except TypeError:
@@ -112,7 +148,7 @@ class TrajectoryDataset(data.Dataset):
         else:
             # Stack the tuples to one trajectory
             num_observations = len(trajectory)
-            trajectory = stack_list_of_tuples(trajectory)
+            trajectory = stack_list_of_tuples(trajectory).to_torch()
 
         if (
             self._sequence_length is not None
@@ -120,8 +156,23 @@ class TrajectoryDataset(data.Dataset):
         ):
             raise ValueError("The sequence is shorter than the sequence length")
 
+        def _expand(x):
+            if x.ndim > 0 and len(x) == num_observations:
+                return x
+            return x.expand(num_observations, *x.shape)
+
+        trajectory = Observation(*map(_expand, trajectory))
+
         # Add trajectory to dataset
-        self._trajectories.append(trajectory)
+        start = self._num_points
+        self._write(trajectory, num_observations)
+        self._offsets = torch.cat(
+            (self._offsets, torch.tensor([self._num_points], dtype=torch.long))
+        )
+        self._trajectory_indexes = torch.cat(
+            (self._trajectory_indexes, torch.tensor([trajectory_index]))
+        )
+        self._all_data = None
 
         # Update the transformers but do not apply transforms.
         for transformation in self.transformations:
@@ -130,29 +181,79 @@ class TrajectoryDataset(data.Dataset):
         # Add sub-trajectory indexes
         if self._sequence_length is not None:
             sub_indexes = self._get_subindexes(num_observations, self._sequence_length)
-            sub_indexes = [(trajectory_index, sub_index) for sub_index in sub_indexes]
-
-            self._sub_trajectory_indexes += sub_indexes
+            self._sub_trajectory_indexes = torch.cat(
+                (self._sub_trajectory_indexes, start + torch.tensor(sub_indexes).long())
+            )
 
     def shuffle(self):
         """Shuffle the dataset."""
         if self._sequence_length is not None:
-            np.random.shuffle(self._trajectories)
+            permutation = torch.randperm(len(self._sub_trajectory_indexes))
+            self._sub_trajectory_indexes = self._sub_trajectory_indexes[permutation]
         else:
-            np.random.shuffle(self._sub_trajectory_indexes)
+            permutation = torch.randperm(len(self._trajectory_indexes))
+            self._trajectory_indexes = self._trajectory_indexes[permutation]
+
+    def get_batch(self, indexes):
+        """Get the sub-trajectories at `indexes' with shape [batch x sequence_length].
+
+        Parameters
+        ----------
+        indexes: Tensor
+
+        Returns
+        -------
+        sub-trajectories: Observation
+        """
+        if self._sequence_length is None:
+            raise ValueError("The trajectories have no common sequence length.")
+        starts = self._sub_trajectory_indexes[torch.as_tensor(indexes)]
+        rows = starts.unsqueeze(-1) + torch.arange(self._sequence_length)
+        observation = Observation(*map(lambda x: x[rows], self._data))
+        for transform in self.transformations:
+            observation = transform(observation)
+        return observation
+
+    def sample_batch(self, batch_size):
+        """Sample a batch of sub-trajectories uniformly at random.
+
+        Parameters
+        ----------
+        batch_size: int
+
+        Returns
+        -------
+        sub-trajectories: Observation
+        """
+        return self.get_batch(torch.randint(len(self), (batch_size,)))
 
     @property
     def all_data(self):
-        """Get all the data."""
-        data = map_and_cast(torch.cat, self._trajectories)
-        for transformation in self.transformations:
-            data = transformation(data)
-        return data
+        """Get all the data.
+
+        Without transformations, the columns are returned without copies. Else, the
+        transformed data is cached until a trajectory is appended or the version of
+        a transformation changes.
+        """
+        data = Observation(*map(lambda x: x[: self._num_points], self._data))
+        if not self.transformations:
+            return data
+
+        versions = tuple(
+            (id(transform), getattr(transform, "version", 0))
+            for transform in self.transformations
+        )
+        if self._all_data is None or versions != self._all_data_versions:
+            for transformation in self.transformations:
+                data = transformation(data)
+            self._all_data, self._all_data_versions = data, versions
+        # A new observation, as the transformations reassign the fields of theirs.
+        return Observation(*self._all_data)
 
     @property
     def initial_states(self):
         """Return a list with initial states."""
-        return np.stack([trajectory.state[0] for trajectory in self._trajectories])
+        return self._data.state[self._offsets[:-1]].numpy()
 
     @property
     def sequence_length(self):
@@ -163,15 +264,16 @@ class TrajectoryDataset(data.Dataset):
     def sequence_length(self, value):
         """Set the sequence length and update the sub-trajectory indexes."""
         self._sequence_length = value
-        self._sub_trajectory_indexes = []
+        self._sub_trajectory_indexes = torch.zeros(0, dtype=torch.long)
         if value is not None:
-            for trajectory_index, trajectory in enumerate(self._trajectories):
-                num_observations = len(trajectory.state)
-                sub_indexes = self._get_subindexes(num_observations, value)
-                sub_indexes = [
-                    (trajectory_index, sub_index) for sub_index in sub_indexes
-                ]
-                self._sub_trajectory_indexes += sub_indexes
+            lengths = self._offsets[1:] - self._offsets[:-1]
+            sub_indexes = [
+                start + torch.tensor(self._get_subindexes(length, value)).long()
+                for start, length in zip(self._offsets.tolist(), lengths.tolist())
+            ]
+            self._sub_trajectory_indexes = torch.cat(
+                [self._sub_trajectory_indexes] + sub_indexes
+            )
 
     @staticmethod
     def _get_subindexes(num_observations, sequence_length, drop_last=False):
@@ -1,6 +1,7 @@
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 from numpy import ndarray
+from torch import Tensor
 from torch.utils import data
 
 from .datatypes import Observation
@@ -8,8 +9,13 @@ from .transforms import AbstractTransform
 
 class TrajectoryDataset(data.Dataset):
     _sequence_length: int
-    _trajectories: List[Observation]
-    _sub_trajectory_indexes: List[int]
+    _data: Optional[Observation]
+    _offsets: Tensor
+    _trajectory_indexes: Tensor
+    _sub_trajectory_indexes: Tensor
+    _num_points: int
+    _all_data: Optional[Observation]
+    _all_data_versions: Optional[Tuple[Tuple[int, int], ...]]
     transformations: List[AbstractTransform]
     def __init__(
         self,
@@ -18,8 +24,13 @@ class TrajectoryDataset(data.Dataset):
     ) -> None: ...
     def __getitem__(self, idx: int) -> Observation: ...
     def __len__(self) -> int: ...
+    @property
+    def num_trajectories(self) -> int: ...
+    def _write(self, trajectory: Observation, num_observations: int) -> None: ...
     def append(self, trajectory: Union[Observation, List[Observation]]) -> None: ...
     def shuffle(self) -> None: ...
+    def get_batch(self, indexes: Tensor) -> Observation: ...
+    def sample_batch(self, batch_size: int) -> Observation: ...
     @property
     def all_data(self) -> Observation: ...
     @property
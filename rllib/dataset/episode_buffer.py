@@ -0,0 +1,88 @@
+"""Implementation of a buffer with the transitions of an episode."""
+import numpy as np
+import torch
+
+from rllib.dataset.datatypes import Observation
+
+
+class EpisodeBuffer(object):
+    """A buffer that writes the transitions of an episode into preallocated tensors.
+
+    The rows are allocated in blocks of `capacity' rows, one column per field, the
+    first time that a block is needed. `append' writes the results of a step in the
+    next row, converting them to the default dtype, and the Observation of a row is
+    only built when it is accessed. Its fields are views of the row, hence they
+    share the storage of the block, and the fields that are not stored are the
+    shared defaults of Observation.
+
+    A new block is allocated when a block is full, and the old blocks are kept, so
+    the views of the previous rows stay valid. A buffer holds one episode, as the
+    agents keep the observations that they observe.
+
+    Parameters
+    ----------
+    capacity: int, optional (default=256).
+        Number of rows of each block.
+    """
+
+    fields = (
+        "state",
+        "action",
+        "reward",
+        "next_state",
+        "done",
+        "log_prob_action",
+        "entropy",
+    )
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._blocks = []
+        self._num_rows = 0
+
+    def __len__(self):
+        """Return the number of transitions in the buffer."""
+        return self._num_rows
+
+    def __getitem__(self, index):
+        """Return the Observation of row `index', whose fields are views."""
+        if index < 0:
+            index += self._num_rows
+        if not 0 <= index < self._num_rows:
+            raise IndexError(f"index {index} is out of range.")
+        block, row = divmod(index, self.capacity)
+        columns = self._blocks[block]
+        return Observation(**{name: column[row] for name, column in columns.items()})
+
+    def _allocate_block(self, values):
+        """Allocate a block with the shapes of `values'."""
+        self._blocks.append(
+            {
+                name: torch.empty(
+                    (self.capacity,) + np.shape(value), dtype=torch.get_default_dtype()
+                )
+                for name, value in zip(self.fields, values)
+            }
+        )
+
+    def append(
+        self,
+        state,
+        action,
+        reward,
+        next_state,
+        done,
+        log_prob_action=1.0,
+        entropy=0.0,
+    ):
+        """Write a transition in the next row and return its Observation."""
+        values = (state, action, reward, next_state, done, log_prob_action, entropy)
+        block, row = divmod(self._num_rows, self.capacity)
+        if block == len(self._blocks):
+            self._allocate_block(values)
+        for column, value in zip(self._blocks[block].values(), values):
+            if isinstance(value, (np.ndarray, np.generic)):
+                value = torch.as_tensor(value)
+            column[row] = value
+        self._num_rows += 1
+        return self[self._num_rows - 1]
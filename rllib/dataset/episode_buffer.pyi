@@ -0,0 +1,25 @@
+from typing import Dict, List, Tuple
+
+from torch import Tensor
+
+from .datatypes import Action, Done, Observation, Probability, Reward, State
+
+class EpisodeBuffer(object):
+    fields: Tuple[str, ...]
+    capacity: int
+    _blocks: List[Dict[str, Tensor]]
+    _num_rows: int
+    def __init__(self, capacity: int = ...) -> None: ...
+    def __len__(self) -> int: ...
+    def __getitem__(self, index: int) -> Observation: ...
+    def _allocate_block(self, values: Tuple) -> None: ...
+    def append(
+        self,
+        state: State,
+        action: Action,
+        reward: Reward,
+        next_state: State,
+        done: Done,
+        log_prob_action: Probability = ...,
+        entropy: Probability = ...,
+    ) -> Observation: ...
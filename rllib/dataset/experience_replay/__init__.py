@@ -1,5 +1,9 @@
+from .batch_prefetcher import BatchPrefetcher
 from .bootstrap_experience_replay import BootstrapExperienceReplay
 from .exp3_experience_replay import EXP3ExperienceReplay
 from .experience_replay import ExperienceReplay
+from .memory_mapped_experience_replay import MemoryMappedExperienceReplay
 from .prioritized_experience_replay import PrioritizedExperienceReplay
+from .quantization import AffineQuantizer, reduced_precision_storage
+from .shared_memory_experience_replay import SharedMemoryExperienceReplay
 from .state_experience_replay import StateExperienceReplay
@@ -0,0 +1,174 @@
+"""Implementation of a Batch Prefetcher for Experience Replay Buffers."""
+import queue
+import threading
+
+from .experience_replay import ExperienceReplay
+
+
+class BatchPrefetcher(object):
+    """Sample batches of an Experience Replay Buffer in a background thread.
+
+    The worker thread keeps up to `max_prefetch' batches in a bounded queue, so that
+    sampling overlaps with the optimization step that consumes the previous batch.
+
+    When the memory has a sampling distribution that `update' modifies, e.g., a
+    PrioritizedExperienceReplay, a batch depends on the updates of all the previous
+    batches. By default, the worker samples the next batch only once the update of
+    the last batch was applied, or once the next batch is requested without an
+    update. With `stale_priorities', the worker samples ahead and the batches in the
+    queue may miss up to `max_prefetch' updates.
+
+    If the batches do not depend on the updates and `num_batches' is given, the
+    batches are sampled `num_batches' at a time with `sample_batches', which gathers
+    all of them at once.
+
+    While the prefetcher runs, the memory must not be accessed other than through it.
+    With `max_prefetch' equal to zero, the batches are sampled synchronously.
+
+    Parameters
+    ----------
+    memory: ExperienceReplay.
+        Memory to sample from.
+    batch_size: int.
+        Size of the batches.
+    max_prefetch: int, optional (default=2).
+        Maximum number of batches sampled ahead.
+    stale_priorities: bool, optional (default=False).
+        Flag that allows batches to be sampled before the previous updates.
+    num_batches: int, optional.
+        Number of batches sampled together, e.g., the number of learning steps.
+
+    Methods
+    -------
+    start():
+        Start the worker thread.
+    stop():
+        Stop the worker thread and drop the prefetched batches.
+    sample_batch():
+        Get the next batch.
+    update(indexes, td_error):
+        Update the sampling distribution of the memory.
+
+    Examples
+    --------
+    A learner samples from the prefetcher and updates the priorities of a memory::
+
+        with BatchPrefetcher(memory, batch_size=32) as prefetcher:
+            observation, idx, weight = prefetcher.sample_batch()
+            prefetcher.update(idx, td_error)
+    """
+
+    def __init__(
+        self,
+        memory,
+        batch_size,
+        max_prefetch=2,
+        stale_priorities=False,
+        num_batches=None,
+    ):
+        self.memory = memory
+        self.batch_size = batch_size
+        self.max_prefetch = max_prefetch
+        self.num_batches = num_batches
+        # Without an `update', the batches never depend on the previous ones.
+        self.stale_priorities = stale_priorities or (
+            type(memory).update is ExperienceReplay.update
+        )
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max(1, max_prefetch))
+        self._permits = threading.Semaphore(0)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pending_update = False
+        self._batches = []
+
+    def __enter__(self):
+        """Start the worker thread."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the worker thread."""
+        self.stop()
+
+    def start(self):
+        """Start the worker thread."""
+        if self.max_prefetch == 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._permits = threading.Semaphore(1)
+        self._pending_update = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread and drop the prefetched batches."""
+        self._batches = []
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._permits.release()
+        while self._thread.is_alive():
+            try:  # Unblock a worker waiting on a full queue.
+                self._queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._thread = None
+        self._queue = queue.Queue(maxsize=max(1, self.max_prefetch))
+
+    def _sample(self):
+        """Sample the next batches from the memory, in reverse order."""
+        if self.stale_priorities and self.num_batches:
+            batches = self.memory.sample_batches(self.num_batches, self.batch_size)
+            return batches[::-1]
+        return [self.memory.sample_batch(self.batch_size)]
+
+    def _run(self):
+        """Sample batches until the prefetcher is stopped."""
+        while not self._stop_event.is_set():
+            if not self.stale_priorities:
+                self._permits.acquire()
+                if self._stop_event.is_set():
+                    return
+            try:
+                with self._lock:
+                    batches = self._sample()
+            except Exception as exception:  # Raise it in the consumer thread.
+                batches = [exception]
+            while batches:
+                self._queue.put(batches.pop())
+
+    def sample_batch(self):
+        """Get the next batch.
+
+        Returns
+        -------
+        observation: Observation.
+        indexes: Tensor.
+        weights: Tensor.
+        """
+        if self._thread is None:
+            if not self._batches:
+                self._batches = self._sample()
+            return self._batches.pop()
+        if self._pending_update:  # The last batch was not updated.
+            self._permits.release()
+        self._pending_update = True
+
+        batch = self._queue.get()
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+    def update(self, indexes, td_error):
+        """Update the sampling distribution of the memory.
+
+        The update is applied before the worker samples a batch that depends on it.
+        """
+        with self._lock:
+            self.memory.update(indexes, td_error)
+        if self._thread is not None and self._pending_update:
+            self._pending_update = False
+            self._permits.release()
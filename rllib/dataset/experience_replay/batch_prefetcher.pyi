@@ -0,0 +1,39 @@
+import queue
+import threading
+from typing import Any, List, Optional, Tuple
+
+from torch import Tensor
+
+from rllib.dataset.datatypes import Observation
+
+from .experience_replay import ExperienceReplay
+
+class BatchPrefetcher(object):
+    memory: ExperienceReplay
+    batch_size: int
+    max_prefetch: int
+    stale_priorities: bool
+    num_batches: Optional[int]
+    _lock: threading.Lock
+    _queue: queue.Queue
+    _permits: threading.Semaphore
+    _stop_event: threading.Event
+    _thread: Optional[threading.Thread]
+    _pending_update: bool
+    _batches: List[Tuple[Observation, Tensor, Tensor]]
+    def __init__(
+        self,
+        memory: ExperienceReplay,
+        batch_size: int,
+        max_prefetch: int = ...,
+        stale_priorities: bool = ...,
+        num_batches: Optional[int] = ...,
+    ) -> None: ...
+    def __enter__(self) -> BatchPrefetcher: ...
+    def __exit__(self, *args: Any) -> None: ...
+    def start(self) -> None: ...
+    def stop(self) -> None: ...
+    def _sample(self) -> List[Tuple[Observation, Tensor, Tensor]]: ...
+    def _run(self) -> None: ...
+    def sample_batch(self) -> Tuple[Observation, Tensor, Tensor]: ...
+    def update(self, indexes: Tensor, td_error: Tensor) -> None: ...
@@ -60,16 +60,61 @@ class BootstrapExperienceReplay(ExperienceReplay):
                 f"input has to be of type Observation, and it was {type(observation)}"
             )
 
+        super().append(observation)
+        ptr = (self.ptr - 1) % self.max_len  # The row of the observation.
         if self.bootstrap:
-            self.weights[self.ptr] = self.mask_distribution.sample()
+            self.weights[ptr] = self.mask_distribution.sample()
         else:
-            self.weights[self.ptr] = torch.ones(self.mask_distribution.batch_shape)
-        super().append(observation)
+            self.weights[ptr] = torch.ones(self.mask_distribution.batch_shape)
+
+    def sample_heads(self, batch_size):
+        """Sample one batch per bootstrap head, from the distribution of its mask.
+
+        The rows of head k are sampled with probability proportional to their mask
+        weights[:, k], with a single multinomial over the mask matrix. A head whose
+        mask is zero on every valid row samples them uniformly. The observations are
+        gathered with one index per column.
+
+        Returns
+        -------
+        observation: Observation.
+            Observation with shape [num_heads x batch_size x ...].
+        indexes: Tensor.
+            Sampled indexes with shape [num_heads x batch_size].
+        """
+        valid = self.valid[: len(self)]
+        probabilities = self.weights[: len(self)].t().float() * valid
+        empty = probabilities.sum(-1) == 0
+        probabilities[empty] = valid
+        indexes = torch.multinomial(probabilities, batch_size, replacement=True)
+        return self._get_observation(indexes), indexes
+
+    def _init_row_arrays(self, rows, cleared):
+        """See `ExperienceReplay._init_row_arrays'. Sample a mask for each row."""
+        if self.bootstrap:
+            masks = self.mask_distribution.sample((len(rows),))
+            self.weights[rows] = masks.to(self.weights.dtype)
+        else:
+            self.weights[rows] = 1
+
+    def _copy_row_arrays(self, other, source, target):
+        """See `ExperienceReplay._copy_row_arrays'.
+
+        If `other' has no bootstrap masks, new masks are sampled for the rows.
+        """
+        if other.weights.shape[1:] == self.weights.shape[1:]:
+            super()._copy_row_arrays(other, source, target)
+        elif self.bootstrap:
+            masks = self.mask_distribution.sample((len(target),))
+            self.weights[target] = masks.to(self.weights.dtype)
+        else:
+            self.weights[target] = 1
 
-    def split(self, ratio=0.8, *args, **kwargs):
+    def split(self, ratio=0.8, views=False, *args, **kwargs):
         """Split into two data sets."""
         return super().split(
             ratio=ratio,
+            views=views,
             num_bootstraps=self.weights.shape[-1],
             bootstrap=self.bootstrap,
             *args,
@@ -1,8 +1,11 @@
-from typing import Any
+from typing import Any, Tuple
 
 import numpy as np
+from torch import Tensor
 from torch.distributions import Poisson
 
+from rllib.dataset.datatypes import Observation
+
 from .experience_replay import ExperienceReplay
 
 class BootstrapExperienceReplay(ExperienceReplay):
@@ -15,3 +18,11 @@ class BootstrapExperienceReplay(ExperienceReplay):
         *args: Any,
         **kwargs: Any,
     ) -> None: ...
+    def sample_heads(self, batch_size: int) -> Tuple[Observation, Tensor]: ...
+    def _init_row_arrays(self, rows: Tensor, cleared: Tensor) -> None: ...
+    def _copy_row_arrays(
+        self, other: ExperienceReplay, source: Tensor, target: Tensor
+    ) -> None: ...
+    def split(
+        self, ratio: float = ..., views: bool = ..., *args: Any, **kwargs: Any
+    ) -> Tuple[BootstrapExperienceReplay, BootstrapExperienceReplay]: ...
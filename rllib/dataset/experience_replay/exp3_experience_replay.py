@@ -3,6 +3,7 @@
 import torch
 
 from .prioritized_experience_replay import PrioritizedExperienceReplay
+from .segment_tree import SumTree
 
 
 class EXP3ExperienceReplay(PrioritizedExperienceReplay):
@@ -27,6 +28,11 @@ class EXP3ExperienceReplay(PrioritizedExperienceReplay):
 
     ..math :: r_{t} / p_{:, t} 1[I_{t} = k]
 
+    The weights w_{k, t} are stored in a sum-tree and the valid indexes in another
+    one, where K is the number of valid transitions. Updating k priorities and
+    sampling k indexes cost O(k log K), and the importance sampling weights are only
+    computed for the sampled indexes.
+
     Parameters
     ----------
     max_len: int.
@@ -61,36 +67,92 @@ class EXP3ExperienceReplay(PrioritizedExperienceReplay):
     Foundations and Trends® in Machine Learning.
     """
 
+    max_exponent = 50.0
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._reference = self.max_priority
+        self._count_tree = SumTree(self.max_len)
 
     @property
     def probabilities(self):
         """Get list of probabilities."""
-        probs = self.weights[: len(self)].reciprocal()
-        return probs / torch.sum(probs)
+        return self._probabilities(torch.arange(len(self)))
+
+    def _probabilities(self, indexes):
+        """Get the sampling probabilities of `indexes'.
+
+        The exponential weights are kept in the sum tree relative to `_reference', so
+        only the touched leaves change and the normalizer is the root of the tree.
+        The uniform part is over the valid transitions, which are counted by another
+        sum tree.
+        """
+        total = self._sum_tree.total
+        beta = self.beta() if total > 0 else 1.0
+        weights = self._sum_tree[indexes] / total if total > 0 else 0.0
+        probs = (1 - beta) * weights + beta / self._count_tree.total
+        return (probs * self.valid[indexes]).float()
+
+    def _sample_indexes(self, batch_size, num_batches=None):
+        """Sample indexes with the EXP3 probabilities in O(log N).
+
+        Each index is sampled from the sum tree of the exponential weights, or with
+        probability beta uniformly from the valid transitions.
+        """
+        shape = (batch_size,) if num_batches is None else (num_batches, batch_size)
+        uniform = torch.rand(shape) < self.beta()
+        if self._sum_tree.total <= 0:
+            uniform[:] = True
+        indices = torch.where(
+            uniform,
+            self._count_tree.sample(batch_size, num_batches=num_batches),
+            self._sum_tree.sample(batch_size, num_batches=num_batches),
+        )
+        self._update_weights(indices)
+        return indices
+
+    def _set_priorities(self, indexes, priorities):
+        """Set the priorities at `indexes' and update the sum trees.
+
+        When the maximum priority drifts far from `_reference', the exponential
+        weights could overflow, so all of them are recomputed.
+        """
+        self._priorities[indexes] = priorities
+        if abs(self.max_priority - self._reference) > self.max_exponent:
+            self._reference = self.max_priority
+            indexes = torch.arange(self.max_len)
+
+        valid = self.valid[indexes]
+        self._sum_tree[indexes] = valid * torch.exp(
+            self._priorities[indexes].double() - self._reference
+        )
+        self._count_tree[indexes] = valid
+
+    def reset(self):
+        """Reset memory to empty."""
+        super().reset()
+        self._count_tree.reset()
 
     def update(self, indexes, td):
-        """Update experience replay sampling distribution with set of weights."""
+        """Update experience replay sampling distribution with set of weights.
+
+        Only the priorities at `indexes' are updated, in O(k log N).
+        """
         idx, inverse_idx, counts = torch.unique(
             indexes, return_counts=True, return_inverse=True
         )
 
-        inv_prob = self.probabilities[indexes].reciprocal()
-        self._priorities[indexes] += self.alpha() * td * inv_prob * counts[inverse_idx]
+        inv_prob = self._probabilities(indexes).reciprocal()
+        priorities = self._priorities[indexes]
+        priorities += self.alpha() * td * inv_prob * counts[inverse_idx]
 
-        self.max_priority = max(
-            self.max_priority, torch.max(self._priorities[idx]).item()
-        )
+        self.max_priority = max(self.max_priority, torch.max(priorities).item())
+        self._set_priorities(indexes, priorities)
         self.alpha.update()
         self.beta.update()
-        self._update_weights()
-
-    def _update_weights(self):
-        """Update priorities and weights."""
-        num = len(self)
-        probs = torch.exp(self._priorities[:num] - self.max_priority)
-        probs = (1 - self.beta()) * probs / torch.sum(probs) + self.beta() / num
 
-        weights = 1.0 / (probs * num)
-        self.weights[:num] = weights
+    def _update_weights(self, indexes):
+        """Update the importance sampling weights at `indexes'."""
+        probs = self._probabilities(indexes)
+        weights = 1.0 / (probs * self._count_tree.total)
+        self.weights[indexes] = weights.to(self.weights)
@@ -1,3 +1,16 @@
+from typing import Optional
+
+from torch import Tensor
+
 from .prioritized_experience_replay import PrioritizedExperienceReplay
+from .segment_tree import SumTree
 
-class EXP3ExperienceReplay(PrioritizedExperienceReplay): ...
+class EXP3ExperienceReplay(PrioritizedExperienceReplay):
+    max_exponent: float
+    _reference: float
+    _count_tree: SumTree
+    def _probabilities(self, indexes: Tensor) -> Tensor: ...
+    def _sample_indexes(
+        self, batch_size: int, num_batches: Optional[int] = ...
+    ) -> Tensor: ...
+    def _update_weights(self, indexes: Tensor) -> None: ...
@@ -1,15 +1,17 @@
 """Implementation of an Experience Replay Buffer."""
+import copy
 import math
+import os
 import warnings
-from dataclasses import asdict
+from dataclasses import asdict, fields
 
 import numpy as np
 import torch
 from torch.utils import data
-from torch.utils.data._utils.collate import default_collate
 
 from rllib.dataset.datatypes import Observation
-from rllib.dataset.utilities import stack_list_of_tuples
+
+from .quantization import AffineQuantizer
 
 
 class ExperienceReplay(data.Dataset):
@@ -18,6 +20,29 @@ class ExperienceReplay(data.Dataset):
     The Experience Replay algorithm stores transitions and access them IID.
     It erases the older samples once the buffer is full, like on a queue.
 
+    The transitions are stored column-wise: `memory' is an Observation whose entries
+    are tensors of shape [max_len x field_shape]. They are allocated lazily when the
+    first observation is appended.
+
+    The transformed observations are cached in another set of columns. New rows are
+    transformed lazily when they are read. When the version of a transformation
+    changes, e.g., a normalizer is updated, the cached rows are stale. Then, the
+    sampled rows are transformed directly until as many rows as the buffer holds were
+    transformed, and only then the whole cache is refreshed. Set
+    `cache_transformations' to False to always transform the sampled rows.
+
+    The columns can be stored with reduced precision through `storage_dtypes', e.g.,
+    the policy returned by `reduced_precision_storage'. Only the floating point and
+    boolean columns are converted, and only the gathered rows are converted back to
+    their original data type. The cache of transformed observations is disabled
+    in this case, as it would hold full-precision columns.
+
+    With `deduplicate_next_state', the next states are not stored. The next state of
+    a transition is the state of the following row, and the next state of the last
+    transition of a trajectory is kept in the state of an extra invalid row, as the
+    one appended by `end_episode'. When an appended state differs from the previous
+    next state, such a row is inserted automatically.
+
     Parameters
     ----------
     max_len: int.
@@ -27,11 +52,20 @@ class ExperienceReplay(data.Dataset):
         callable that takes an observation as input and returns a modified observation.
         If they have an `update` method it will be called whenever a new trajectory
         is added to the dataset.
+    num_steps: int, optional.
+        Number of steps in return vector.
+    storage_dtypes: dict, optional.
+        Dictionary from the name of an Observation field to the data type, or the
+        AffineQuantizer, used to store its column.
+    deduplicate_next_state: bool, optional (default=False).
+        Reconstruct the next states from the states of the following rows.
 
     Methods
     -------
     append(observation) -> None:
         append an observation to the dataset.
+    extend(observation, episode_ends=None) -> None:
+        append a batch of observations to the dataset at once.
     is_full: bool
         check if buffer is full.
     update(indexes, td_error):
@@ -40,10 +74,18 @@ class ExperienceReplay(data.Dataset):
         Get all the transformed data.
     sample_batch(batch_size):
         Get a batch of data.
+    sample_sequences(batch_size, length):
+        Get a batch of windows that do not cross the end of an episode.
+    sample_states(num_states):
+        Get the raw states of a batch of transitions.
     reset():
         Reset the memory to zero.
     get_observation(idx):
         Get the observation at a given index.
+    save(path):
+        Save a columnar snapshot of the buffer.
+    load(path):
+        Load a columnar snapshot of the buffer.
 
     References
     ----------
@@ -54,18 +96,36 @@ class ExperienceReplay(data.Dataset):
     TODO: Make this class robust, easy to use, and fast.
     """
 
-    def __init__(self, max_len, transformations=None, num_steps=0):
+    metadata_file = "metadata.pt"
+    cache_transformations = True
+
+    def __init__(
+        self,
+        max_len,
+        transformations=None,
+        num_steps=0,
+        storage_dtypes=None,
+        deduplicate_next_state=False,
+    ):
         super().__init__()
         self.max_len = max_len
-        self.memory = np.empty((self.max_len,), dtype=Observation)
+        self.memory = None
 
         self.valid = torch.zeros(self.max_len)
         self.weights = torch.ones(self.max_len)
+        self.episode_ids = torch.zeros(self.max_len, dtype=torch.long)
         self.data_count = 0
+        self._num_episodes = 0
+        self._episode_open = False
 
         self.transformations = transformations or list()
         self._num_steps = num_steps
         self.zero_observation = None
+        self.storage_dtypes = copy.deepcopy(storage_dtypes or dict())
+        self._field_dtypes = dict()
+        self.deduplicate_next_state = deduplicate_next_state
+        self._last_next_state = None
+        self._reset_cache()
 
         self.raw = False
 
@@ -76,48 +136,160 @@ class ExperienceReplay(data.Dataset):
     def from_other(cls, other, num_steps=None):
         """Create a Experience Replay from another one.
 
-        All observations will be added sequentially, but only that will be copied.
-        Weights will be initialized as if these were new observations.
+        The valid observations are copied in the order they were appended, and the
+        episodes are padded for the new number of steps. See `_relocate_rows'.
+        Weights are copied if they have the same shape as the new ones, else they are
+        initialized as if these were new observations.
         """
         num_steps = other.num_steps if num_steps is None else num_steps
-        new = cls(other.max_len, other.transformations, num_steps)
+        new = cls(
+            max_len=other.max_len,
+            transformations=other.transformations,
+            num_steps=num_steps,
+            storage_dtypes=other.storage_dtypes,
+            deduplicate_next_state=other.deduplicate_next_state,
+        )
+        new._copy_rows(other)
+        return new
 
-        start_idx = other.ptr
-        for i in range(other.max_len):
-            # Start iterating at the next location.
-            # In this case, when the num_steps change, old observations are erased.
+    def _relocate_rows(self, other):
+        """Compute the rows of this buffer where the transitions of `other' go.
 
-            if other.valid[(start_idx + i) % other.max_len]:
-                observation = other.memory[(start_idx + i) % other.max_len]
-                new.append(observation)
-            elif other.valid[(start_idx + i - 1) % other.max_len]:  # Last of episode.
-                new.end_episode()
-            else:  # Either empty or belongs to some padding.
-                pass
+        The result is the same as appending the valid rows of `other' one at a time,
+        from the oldest one, and ending the episode at the first invalid row after
+        each trajectory. See `_plan_appends'.
 
-        return new
+        Returns
+        -------
+        source: Tensor.
+            Rows of `other' that are kept.
+        target: Tensor.
+            Rows of this buffer where they go.
+        data_count: int.
+            Number of rows appended, including the padding.
+        """
+        order = (other.ptr + torch.arange(other.max_len)) % other.max_len
+        valid = other.valid[order].bool()
+        source = order[valid]
+        if len(source) == 0:
+            return source, source, 0
+
+        # A trajectory ends at the first invalid row, but the newest row has none.
+        next_valid = torch.cat([valid[1:], torch.ones(1, dtype=torch.bool)])
+        ends = ~next_valid[valid]
+        previous = torch.cat([torch.zeros(1, dtype=torch.bool), valid[:-1]])[valid]
+        breaks = torch.zeros_like(ends)
+        if self.deduplicate_next_state:
+            state = other._gather_field("state", source)
+            next_state = other._gather_field("next_state", source).roll(1, 0)
+            breaks = previous & ~self._continues(next_state, state)
+
+        kept, offsets, data_count = self._plan_appends(breaks, ends)
+        return source[kept], offsets % self.max_len, data_count
+
+    @staticmethod
+    def _continues(next_state, state):
+        """Check if each state equals the corresponding next state."""
+        return (state == next_state).reshape(len(state), -1).all(-1)
+
+    def _plan_appends(self, breaks, ends):
+        """Compute the rows taken by appending a sequence of transitions at once.
+
+        Each transition takes one row, preceded by the extra row that keeps the
+        previous next state if `breaks' is set, and followed by the padding of
+        `end_episode' if `ends' is set. The padding after the last transition
+        invalidates the following rows as `append' does, and the transitions that
+        would be overwritten by the later ones are dropped.
+
+        Returns
+        -------
+        kept: Tensor.
+            Mask of the transitions that are kept.
+        offsets: Tensor.
+            Rows of the kept transitions, from the first row appended.
+        num_rows: int.
+            Number of rows appended, including the padding.
+        """
+        padding = ends.long() * self._padding_steps
+        offsets = torch.cumsum(1 + breaks.long() + padding, 0) - 1 - padding
+        num_rows = int(offsets[-1] + 1 + padding[-1])
+        last_row = max(num_rows, int(offsets[-1]) + 1 + self._padding_steps)
+        kept = offsets >= last_row - self.max_len
+        return kept, offsets[kept], num_rows
 
-    def split(self, ratio=0.8, *args, **kwargs):
-        """Split into two data sets."""
+    def _copy_rows(self, other):
+        """Copy the transitions of `other' into this empty buffer.
+
+        See `_relocate_rows'. The transformations are not updated, as they already
+        saw these transitions.
+        """
+        source, target, data_count = self._relocate_rows(other)
+        self.data_count = data_count
+        if len(source) == 0:
+            return
+
+        observation = other._gather(source)
+        if self.memory is None:
+            self._init_observation(Observation(*map(lambda x: x[0], observation)))
+        self._write(target, observation)
+        self.valid[target] = 1
+        self.episode_ids[target] = other.episode_ids[source]
+        self._num_episodes = other._num_episodes
+        self._episode_open = other._episode_open
+        self._copy_row_arrays(other, source, target)
+
+    def _copy_row_arrays(self, other, source, target):
+        """Copy the arrays indexed by row, other than the memory, from `other'.
+
+        The `valid' flags of the target rows must be already set.
+        """
+        if other.weights.shape[1:] == self.weights.shape[1:]:
+            self.weights[target] = other.weights[source].to(self.weights.dtype)
+
+    def split(self, ratio=0.8, views=False, *args, **kwargs):
+        """Split into two data sets.
+
+        With `views', the data sets share the memory of this buffer and only the rows
+        that are valid differ, hence nothing is copied. The views must not be appended
+        to, and appending to this buffer overwrites their observations.
+        """
         idx = np.arange(0, len(self))
         np.random.shuffle(idx)
         split_idx = math.ceil(ratio * len(self))
         train_idx = idx[:split_idx]
         test_idx = idx[split_idx:]
 
-        train = type(self)(
-            max_len=self.max_len, transformations=self.transformations, *args, **kwargs
-        )
-        test = type(self)(
-            max_len=self.max_len, transformations=self.transformations, *args, **kwargs
-        )
+        train, test = [
+            type(self)(
+                max_len=self.max_len,
+                transformations=self.transformations,
+                storage_dtypes=self.storage_dtypes,
+                deduplicate_next_state=self.deduplicate_next_state,
+                *args,
+                **kwargs,
+            )
+            for _ in range(2)
+        ]
 
         for dataset, idx in zip([train, test], [train_idx, test_idx]):
-            for i in idx:
-                dataset.memory[i] = self.memory[i]
-                dataset.valid[i] = self.valid[i]
-                dataset.weights[i] = self.weights[i]
-                dataset.data_count += 1
+            idx = torch.as_tensor(idx, dtype=torch.long)
+            if self.memory is not None:
+                dataset.zero_observation = self.zero_observation
+                dataset._field_dtypes = self._field_dtypes
+                if views:
+                    dataset.memory = self.memory
+                else:
+                    dataset.memory = dataset._memory_from_columns(
+                        {
+                            name: torch.zeros_like(column)
+                            for name, column in self._stored_columns().items()
+                        }
+                    )
+                    dataset._write(idx, self._gather(idx))
+            dataset.valid[idx] = self.valid[idx]
+            dataset.episode_ids[idx] = self.episode_ids[idx]
+            dataset._copy_row_arrays(self, idx, idx)
+            dataset.data_count = self.data_count if views else len(idx)
 
         return train, test
 
@@ -147,7 +319,60 @@ class ExperienceReplay(data.Dataset):
 
         return asdict(self._get_observation(idx)), idx, self.weights[idx]
 
+    def _storage_dtype(self, name, dtype):
+        """Return the data type of the column `name' for values of type `dtype'."""
+        storage = self.storage_dtypes.get(name)
+        if storage is None or not (dtype.is_floating_point or dtype == torch.bool):
+            return dtype
+        return getattr(storage, "dtype", storage)
+
+    def _is_stored(self, name):
+        """Check if the field `name' has its own column."""
+        return not (self.deduplicate_next_state and name == "next_state")
+
+    def _stored_columns(self):
+        """Return a dictionary with the columns of the memory that are stored."""
+        return {
+            field.name: column
+            for field, column in zip(fields(Observation), self.memory)
+            if self._is_stored(field.name)
+        }
+
+    def _memory_from_columns(self, columns):
+        """Build the memory from the stored columns.
+
+        Without a column of next states, it points to the column of states.
+        """
+        return Observation(
+            **{
+                field.name: columns[field.name]
+                if self._is_stored(field.name)
+                else columns["state"]
+                for field in fields(Observation)
+            }
+        )
+
+    def _allocate_memory(self, observation):
+        """Allocate one [max_len x field_shape] column per field of `observation'."""
+        self.memory = self._memory_from_columns(
+            {
+                field.name: torch.zeros(
+                    (self.max_len,) + x.shape,
+                    dtype=self._storage_dtype(field.name, x.dtype),
+                    device=x.device,
+                )
+                for field, x in zip(fields(Observation), observation)
+                if self._is_stored(field.name)
+            }
+        )
+
     def _init_observation(self, observation):
+        self._field_dtypes = {
+            field.name: x.dtype for field, x in zip(fields(Observation), observation)
+        }
+        self._allocate_memory(observation)
+        self._reset_cache()
+
         if observation.state.ndim == 0:
             dim_state, num_states = 1, 1
         else:
@@ -165,22 +390,176 @@ class ExperienceReplay(data.Dataset):
             num_actions=num_actions,
         )
 
-    def _get_consecutive_observations(self, start_idx, num_steps):
-        if num_steps == 0 and not (
-            isinstance(start_idx, int) or isinstance(start_idx, np.int)
-        ):
-            observation = stack_list_of_tuples(self.memory[start_idx])
-            return Observation(*map(lambda x: x.unsqueeze(1), observation))
-        num_steps = max(1, num_steps)
-        if start_idx + num_steps <= self.max_len:
-            obs_list = self.memory[start_idx : start_idx + num_steps]
-        else:  # The trajectory is split by the circular buffer.
-            delta_idx = start_idx + num_steps - self.max_len
-            obs_list = np.concatenate(
-                (self.memory[start_idx : self.max_len], self.memory[:delta_idx])
+    def _gather(self, indexes, memory=None):
+        """Gather the observations at `indexes' with one index per column.
+
+        By default, the raw observations in `memory' are gathered and converted back
+        to their original data type.
+        """
+        if memory is not None:
+            return Observation(*map(lambda column: column[indexes], memory))
+        return Observation(
+            *[
+                self._decode(name, column[index])
+                for name, index, column in self._locate_columns(indexes)
+            ]
+        )
+
+    def _locate_columns(self, indexes):
+        """Return the name of the stored field, the rows and the column of each field.
+
+        Without a column of next states, they are the states of the following rows.
+        """
+        located = []
+        for field, column in zip(fields(Observation), self.memory):
+            if self._is_stored(field.name):
+                located.append((field.name, indexes, column))
+            else:
+                next_indexes = (torch.as_tensor(indexes) + 1) % self.max_len
+                located.append(("state", next_indexes, column))
+        return located
+
+    def _gather_field(self, name, indexes):
+        """Gather the field `name' of the observations at `indexes'."""
+        names = [field.name for field in fields(Observation)]
+        stored_name, index, column = self._locate_columns(indexes)[names.index(name)]
+        return self._decode(stored_name, column[index])
+
+    def _decode(self, name, value):
+        """Convert values stored in the column `name' to their original data type."""
+        dtype = self._field_dtypes.get(name, value.dtype)
+        if value.dtype == dtype:
+            return value
+        storage = self.storage_dtypes[name]
+        if isinstance(storage, AffineQuantizer):
+            return storage.dequantize(value, dtype=dtype)
+        return value.to(dtype)
+
+    def _write(self, indexes, observation):
+        """Write an observation into the columns at `indexes'."""
+        located = self._locate_columns(indexes)
+        for (name, index, column), value in zip(located, observation):
+            value = torch.as_tensor(value).detach()
+            storage = self.storage_dtypes.get(name)
+            if isinstance(storage, AffineQuantizer) and column.dtype == storage.dtype:
+                storage.write(column, index, value)
+            else:
+                column[index] = value
+        if self._cache is not None:
+            self._dirty_rows.append(torch.as_tensor(indexes, dtype=torch.long))
+            if self.deduplicate_next_state:
+                self._dirty_rows.append((self._dirty_rows[-1] + 1) % self.max_len)
+
+    def _transform(self, observation):
+        """Apply all the transformations to an observation."""
+        for transform in self.transformations:
+            observation = transform(observation)
+        return observation
+
+    def _transformation_versions(self):
+        """Return the identity and the version of every transformation."""
+        return tuple(
+            (id(transform), getattr(transform, "version", 0))
+            for transform in self.transformations
+        )
+
+    def _reset_cache(self):
+        """Drop the cached transformed observations."""
+        self._cache = None
+        self._cache_zero = None
+        self._cache_versions = None
+        self._dirty_rows = []
+        self._uncached_rows = 0
+
+    def _write_cache(self, indexes):
+        """Transform the raw observations at `indexes' and write them to the cache."""
+        observation = self._transform(self._gather(indexes))
+        if self._cache is None:
+            self._cache = Observation(
+                *map(
+                    lambda x: torch.zeros(
+                        (self.max_len,) + x.shape[1:], dtype=x.dtype, device=x.device
+                    ),
+                    observation,
+                )
             )
+        for column, value in zip(self._cache, observation):
+            column[indexes] = value.detach()
 
-        return stack_list_of_tuples(obs_list)
+    def _update_cache(self, num_rows):
+        """Bring the cache up to date before reading `num_rows' rows from it.
+
+        Returns
+        -------
+        cached: bool.
+            True if the rows can be read from the cache, False if they must be
+            transformed directly.
+        """
+        if not self.cache_transformations or self.storage_dtypes:
+            return False
+
+        versions = self._transformation_versions()
+        if versions != self._cache_versions:
+            # Refreshing the whole cache costs as much as transforming the valid rows.
+            # Only pay it once that many rows were transformed directly.
+            valid_indexes = self.valid_indexes
+            self._uncached_rows += num_rows
+            if self._uncached_rows < len(valid_indexes):
+                return False
+            self._dirty_rows = []
+            self._uncached_rows = 0
+            self._write_cache(valid_indexes)
+            self._cache_zero = self._transform(self.zero_observation.clone())
+            self._cache_versions = versions
+        elif len(self._dirty_rows) > 0:
+            indexes = torch.cat([index.reshape(-1) for index in self._dirty_rows])
+            self._dirty_rows = []
+            self._write_cache(indexes)
+        return True
+
+    def _following_rows(self, indexes, offsets):
+        """Return the rows `offsets' after `indexes' in the circular buffer."""
+        return (indexes + offsets) % self.max_len
+
+    def _newer_rows(self, indexes):
+        """Return the number of rows appended after each of `indexes'."""
+        return (self.ptr - 1 - indexes) % self.max_len
+
+    @staticmethod
+    def _mask_observation(observation, zero_observation, mask):
+        """Replace the transitions of `observation' where `mask' is False by zeros."""
+        def _mask(column, zero):
+            shape = mask.shape + (1,) * (column.dim() - mask.dim())
+            return torch.where(mask.reshape(shape), column, zero.to(column))
+
+        return Observation(*map(_mask, observation, zero_observation))
+
+    def _get_consecutive_observations(self, start_idx, num_steps, cached=False):
+        """Get `num_steps' consecutive observations starting at `start_idx'.
+
+        The windows wrap around the end of the circular buffer. If `start_idx' is an
+        integer, the returned observation has shape [num_steps x ...], else it has
+        shape [batch x num_steps x ...].
+        When `num_steps' is zero, windows of length one are returned.
+        If `cached' is True, the transformed observations are read from the cache.
+
+        The invalid transitions inside a window (i.e., the padding after the end of
+        an episode) are replaced by the zero observation using the `valid' mask.
+        """
+        start_idx = torch.as_tensor(start_idx, dtype=torch.long)
+        offsets = torch.arange(max(1, num_steps))
+        indexes = self._following_rows(start_idx.unsqueeze(-1), offsets)
+        if cached:
+            observation = self._gather(indexes, self._cache)
+            zero_observation = self._cache_zero
+        else:
+            observation = self._gather(indexes)
+            zero_observation = self.zero_observation
+        if num_steps == 0:
+            return observation
+
+        valid = self.valid[indexes].bool()
+        return self._mask_observation(observation, zero_observation, valid)
 
     def _get_observation(self, idx):
         """Return any desired observation.
@@ -194,36 +573,53 @@ class ExperienceReplay(data.Dataset):
         observation: Observation
 
         """
+        if self.raw or not self.transformations:
+            return self._get_consecutive_observations(idx, self.num_steps)
+
+        num_rows = torch.as_tensor(idx).numel() * max(1, self.num_steps)
+        if self._update_cache(num_rows):
+            return self._get_consecutive_observations(idx, self.num_steps, cached=True)
+
         observation = self._get_consecutive_observations(idx, self.num_steps)
-        if self.raw:
-            return observation
-        for transform in self.transformations:
-            observation = transform(observation)
-        return observation
+        return self._transform(observation)
 
     def reset(self):
         """Reset memory to empty."""
-        self.memory = np.empty((self.max_len,), dtype=Observation)
+        self.memory = None
         self.valid = torch.zeros(self.max_len)
+        self.episode_ids = torch.zeros(self.max_len, dtype=torch.long)
         self.data_count = 0
+        self._episode_open = False
         self.zero_observation = None
+        self._last_next_state = None
+        self._reset_cache()
+
+    @property
+    def _padding_steps(self):
+        """Return the number of invalid rows kept after the last transition."""
+        return max(self.num_steps, int(self.deduplicate_next_state))
 
     def end_episode(self):
         """Terminate an episode.
 
-        It appends `num_steps' invalid transitions to the replay buffer.
+        It appends `num_steps' invalid transitions to the replay buffer, or one when
+        the next states are deduplicated and `num_steps' is zero.
+        These are already marked as invalid by `append'.
         """
-        for _ in range(self.num_steps):
+        for _ in range(self._padding_steps):
             self.data_count += 1
+        self._last_next_state = None
+        self._episode_open = False
 
     def append_invalid(self):
         """Append an invalid transition."""
         if self.zero_observation is None:
             warnings.warn("Buffer not initialized.", RuntimeWarning)
         else:
-            self.memory[self.ptr] = self.zero_observation
             self.valid[self.ptr] = 0
             self.data_count += 1
+            self._last_next_state = None
+            self._episode_open = False
 
     def append(self, observation):
         """Append new observation to the dataset.
@@ -243,29 +639,242 @@ class ExperienceReplay(data.Dataset):
             )
 
         if self.zero_observation is None:
-            self._init_observation(observation)
+            self._init_observation(observation.to_torch())
+
+        if self.deduplicate_next_state:
+            state = torch.as_tensor(observation.state)
+            if self.valid[(self.ptr - 1) % self.max_len] and not (
+                self._last_next_state is not None
+                and torch.equal(state, self._last_next_state)
+            ):
+                # The trajectory is not continued. Keep the next state of the last
+                # transition in the row at `ptr'.
+                self.data_count += 1
+                self._episode_open = False
+            self._last_next_state = torch.as_tensor(observation.next_state).clone()
 
-        self.memory[self.ptr] = observation.clone()
+        if not self._episode_open:
+            self._num_episodes += 1
+            self._episode_open = True
+        self._write(self.ptr, observation)
         self.valid[self.ptr] = 1
+        self.episode_ids[self.ptr] = self._num_episodes
 
-        for i in range(self.num_steps):
-            self.memory[(self.ptr + i + 1) % self.max_len] = self.zero_observation
-            self.valid[(self.ptr + i + 1) % self.max_len] = 0
+        if self._padding_steps > 0:
+            padding = (self.ptr + 1 + torch.arange(self._padding_steps)) % self.max_len
+            self.valid[padding] = 0
         self.data_count += 1
 
         for transformation in self.transformations:
             transformation.update(observation)
             observation = transformation(observation)
 
+    def extend(self, observation, episode_ends=None):
+        """Append a batch of observations to the dataset at once.
+
+        It is equivalent to appending the observations one at a time, in row-major
+        order, and ending an episode after those where `episode_ends' is set. The
+        batch shape is the shape of the reward, as in `unstack_observations', and the
+        done flags have the same shape unless they are scalars. The state, the action
+        and the next state have it as leading dimensions unless they are scalars, and
+        the other fields without it are shared by all the observations. All the rows
+        are written with one copy per column and the transformations are updated once
+        with the whole batch.
+
+        Parameters
+        ----------
+        observation: Observation
+            Observation whose fields have the batch shape as leading dimensions.
+        episode_ends: Tensor, optional.
+            Boolean flags with the batch shape.
+
+        Raises
+        ------
+        TypeError
+            If the new observation is not of type Observation.
+        ValueError
+            If the done flags, the state, the action or the next state do not have the
+            batch shape.
+        """
+        if not isinstance(observation, Observation):
+            raise TypeError(
+                f"input has to be of type Observation, and it was {type(observation)}"
+            )
+
+        observation = observation.to_torch()
+        batch_shape = observation.reward.shape
+        num_observations = batch_shape.numel()
+        if num_observations == 0:
+            return
+        if observation.done.ndim > 0 and observation.done.shape != batch_shape:
+            # With one-dimensional states, the states of a batch with an extra reward
+            # dimension would still start with the batch shape.
+            raise ValueError(
+                f"done of shape {tuple(observation.done.shape)} does not match the "
+                f"batch shape {tuple(batch_shape)} of the reward."
+            )
+
+        def _flatten(name, x):
+            if x.shape[: len(batch_shape)] == batch_shape:
+                return x.reshape(num_observations, *x.shape[len(batch_shape) :])
+            if x.ndim > 0 and name in ("state", "action", "next_state"):
+                raise ValueError(
+                    f"{name} of shape {tuple(x.shape)} does not start with the batch "
+                    f"shape {tuple(batch_shape)} of the reward."
+                )
+            return x.expand(num_observations, *x.shape)
+
+        observation = Observation(
+            *[
+                _flatten(field.name, x)
+                for field, x in zip(fields(Observation), observation)
+            ]
+        )
+        if episode_ends is None:
+            ends = torch.zeros(num_observations, dtype=torch.bool)
+        else:
+            ends = torch.as_tensor(episode_ends, dtype=torch.bool).reshape(-1)
+
+        if self.zero_observation is None:
+            self._init_observation(Observation(*map(lambda x: x[0], observation)))
+
+        breaks = torch.zeros_like(ends)
+        if self.deduplicate_next_state:
+            # The first observation is compared as in `append', the others with the
+            # previous ones unless an episode ended in between.
+            state, next_state = observation.state, observation.next_state
+            breaks[1:] = ~ends[:-1] & ~self._continues(next_state[:-1], state[1:])
+            breaks[0] = bool(self.valid[(self.ptr - 1) % self.max_len]) and not (
+                self._last_next_state is not None
+                and torch.equal(state[0], self._last_next_state)
+            )
+            self._last_next_state = None if ends[-1] else next_state[-1].clone()
+
+        kept, offsets, num_rows = self._plan_appends(breaks, ends)
+        num_cleared = max(num_rows, int(offsets[-1]) + 1 + self._padding_steps)
+        cleared = self.ptr + torch.arange(min(num_cleared, self.max_len))
+        cleared, rows = cleared % self.max_len, (self.ptr + offsets) % self.max_len
+
+        self.valid[cleared] = 0
+        # An episode starts after an end or a break, or at the first observation.
+        starts = breaks.clone()
+        starts[1:] |= ends[:-1]
+        if not self._episode_open:
+            starts[0] = True
+        episode_ids = self._num_episodes + torch.cumsum(starts.long(), 0)
+        self._num_episodes = int(episode_ids[-1])
+        self._episode_open = not bool(ends[-1])
+
+        self._write(rows, Observation(*map(lambda x: x[kept], observation)))
+        self.valid[rows] = 1
+        self.episode_ids[rows] = episode_ids[kept]
+        self.data_count += num_rows
+        self._init_row_arrays(rows, cleared)
+
+        for transformation in self.transformations:
+            transformation.update(observation)
+            observation = transformation(observation)
+
+    def _init_row_arrays(self, rows, cleared):
+        """Initialize the arrays indexed by row, other than the memory, in `extend'.
+
+        The new observations are written at `rows', and every row written or
+        invalidated by `extend', including `rows', is in `cleared'.
+        """
+        pass
+
+    def _sample_indexes(self, batch_size, num_batches=None):
+        """Sample indexes of valid observations.
+
+        They have shape [batch_size], or [num_batches x batch_size] if `num_batches'
+        is given.
+        """
+        size = batch_size if num_batches is None else (num_batches, batch_size)
+        return torch.as_tensor(np.random.choice(self.valid_indexes, size))
+
     def sample_batch(self, batch_size):
         """Sample a batch of observations."""
-        indices = np.random.choice(self.valid_indexes, batch_size)
-        if self.num_steps == 0:
-            obs = self._get_observation(indices)
-            return (obs, torch.tensor(indices), self.weights[indices])
+        indices = self._sample_indexes(batch_size)
+        obs = self._get_observation(indices)
+        return obs, indices, self.weights[indices]
+
+    def sample_batches(self, num_batches, batch_size):
+        """Sample `num_batches' batches of observations at once.
+
+        The indexes of all the batches are sampled together and the observations are
+        gathered in a single [num_batches x batch_size] block. Each batch is a view of
+        this block, hence no further copies are made.
+
+        Returns
+        -------
+        batches: list of tuples (observation, indexes, weights).
+        """
+        indices = self._sample_indexes(batch_size, num_batches=num_batches)
+        obs = self._get_observation(indices)
+        weights = self.weights[indices]
+        return [
+            (Observation(*[x[i] for x in obs]), indices[i], weights[i])
+            for i in range(num_batches)
+        ]
+
+    def sample_states(self, num_states):
+        """Sample the states of `num_states' transitions.
+
+        Only the state of a single step is gathered. The transformations are applied
+        and inverted, as when the sampled observations are inverted.
+        """
+        indexes = self._sample_indexes(num_states)
+        if not self.transformations:
+            return self._gather_field("state", indexes)
+        observation = self._transform(self._gather(indexes))
+        for transform in self.transformations:
+            observation = transform.inverse(observation)
+        return observation.state
+
+    def sample_sequences(self, batch_size, length):
+        """Sample a batch of windows of `length' consecutive transitions.
+
+        The windows start at the transitions sampled as in `sample_batch' and never
+        cross the end of an episode. The transitions of a window after the end of its
+        episode, or after the newest transition, are masked out and replaced by the
+        zero observation instead of rejecting the window. The episode of each row is
+        kept in `episode_ids', hence all the windows are gathered at once.
+
+        Returns
+        -------
+        observation: Observation.
+            Observation of shape [batch_size x length x ...].
+        indexes: Tensor.
+            Rows where the windows start.
+        weights: Tensor.
+            Weights of these rows.
+        mask: Tensor.
+            Flags of shape [batch_size x length] of the transitions in the windows.
+        """
+        indexes = self._sample_indexes(batch_size)
+        observation, mask = self._get_sequences(indexes, length)
+        return observation, indexes, self.weights[indexes], mask
+
+    def _get_sequences(self, indexes, length):
+        """Get the masked windows of `length' transitions that start at `indexes'."""
+        offsets = torch.arange(length)
+        rows = self._following_rows(indexes.unsqueeze(-1), offsets)
+        mask = (
+            self.valid[rows].bool()
+            & (self.episode_ids[rows] == self.episode_ids[indexes].unsqueeze(-1))
+            & (offsets <= self._newer_rows(indexes).unsqueeze(-1))
+        )
+
+        if self.raw or not self.transformations:
+            observation = self._gather(rows)
+            zero_observation = self.zero_observation
+        elif self._update_cache(rows.numel()):
+            observation = self._gather(rows, self._cache)
+            zero_observation = self._cache_zero
         else:
-            obs, idx, weight = default_collate([self[i] for i in indices])
-            return Observation(**obs), idx, weight
+            observation = self._transform(self._gather(rows))
+            zero_observation = self._transform(self.zero_observation.clone())
+        return self._mask_observation(observation, zero_observation, mask), mask
 
     @property
     def is_full(self):
@@ -280,16 +889,15 @@ class ExperienceReplay(data.Dataset):
     @property
     def all_data(self):
         """Get all the data."""
-        all_obs = self.all_raw
-
-        for transformation in self.transformations:
-            all_obs = transformation(all_obs)
-        return all_obs
+        valid_indexes = self.valid_indexes
+        if self.transformations and self._update_cache(len(valid_indexes)):
+            return self._gather(valid_indexes, self._cache)
+        return self._transform(self._gather(valid_indexes))
 
     @property
     def all_raw(self):
         """Get all the un-transformed data."""
-        all_raw = stack_list_of_tuples(self.memory[self.valid_indexes])
+        all_raw = self._gather(self.valid_indexes)
         return all_raw
 
     @property
@@ -309,14 +917,120 @@ class ExperienceReplay(data.Dataset):
 
     @num_steps.setter
     def num_steps(self, value):
-        """Reset the number of steps."""
+        """Reset the number of steps and relocate the rows for the new padding."""
+        # Shallow copy that keeps the current rows, without calling `__getstate__'.
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
         self._num_steps = value
-        other = ExperienceReplay.from_other(self, num_steps=value)
-        self.memory = other.memory
-        self.valid = other.valid
-        self.data_count = other.data_count
-        self.weights = other.weights
+        self.reset()
+        self._copy_rows(other)
 
     def update(self, indexes, td_error):
         """Update experience replay sampling distribution with set of weights."""
         pass
+
+    def _snapshot_arrays(self):
+        """Return the arrays that a snapshot stores besides the memory columns."""
+        return {
+            "valid": self.valid,
+            "weights": self.weights,
+            "episode_ids": self.episode_ids,
+        }
+
+    def _snapshot_metadata(self):
+        """Return the metadata that a snapshot stores."""
+        return {
+            "max_len": self.max_len,
+            "data_count": self.data_count,
+            "num_steps": self.num_steps,
+            "zero_observation": self.zero_observation,
+            "transformations": self.transformations,
+            "storage_dtypes": self.storage_dtypes,
+            "field_dtypes": self._field_dtypes,
+            "deduplicate_next_state": self.deduplicate_next_state,
+            "num_episodes": self._num_episodes,
+            "episode_open": self._episode_open,
+        }
+
+    def _restore_snapshot(self, metadata, arrays):
+        """Restore the buffer from the metadata and the arrays of a snapshot."""
+        if metadata["max_len"] != self.max_len:
+            raise ValueError(
+                f"The snapshot has max_len {metadata['max_len']}, "
+                f"but the buffer has max_len {self.max_len}."
+            )
+        self.data_count = metadata["data_count"]
+        self._num_steps = metadata["num_steps"]
+        self.zero_observation = metadata["zero_observation"]
+        self.transformations = metadata["transformations"]
+        self.storage_dtypes = metadata["storage_dtypes"]
+        self._field_dtypes = metadata["field_dtypes"]
+        self.deduplicate_next_state = metadata["deduplicate_next_state"]
+        self._last_next_state = None
+        self._reset_cache()
+        self.valid = arrays["valid"]
+        self.weights = arrays["weights"]
+        # Snapshots without episodes have one episode per run of valid rows.
+        self.episode_ids = arrays.get("episode_ids", torch.cumsum(self.valid == 0, 0))
+        self._num_episodes = metadata.get("num_episodes", self.max_len)
+        self._episode_open = metadata.get("episode_open", False)
+        if self.zero_observation is None:
+            self.memory = None
+        else:
+            # Numpy has no bfloat16, so these columns are saved as int16.
+            self.memory = self._memory_from_columns(
+                {
+                    field.name: arrays[field.name].view(torch.bfloat16)
+                    if self.storage_dtypes.get(field.name) == torch.bfloat16
+                    and arrays[field.name].dtype == torch.int16
+                    else arrays[field.name]
+                    for field in fields(Observation)
+                    if self._is_stored(field.name)
+                }
+            )
+
+    def save(self, path):
+        """Save a snapshot of the buffer in directory `path'.
+
+        Every column of the memory and every array in `_snapshot_arrays' is saved in a
+        raw `.npy' file, and the remaining state in a small metadata file.
+
+        Returns
+        -------
+        path: str.
+            Directory where the snapshot is saved.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = self._snapshot_arrays()
+        if self.memory is not None:
+            arrays.update(self._stored_columns())
+
+        # Write to temporary files and then replace the old ones. This keeps the old
+        # snapshot valid if the process is interrupted and never truncates a file
+        # that is memory-mapped by a loaded buffer.
+        for name, array in arrays.items():
+            with open(f"{path}/{name}.npy.tmp", "wb") as file:
+                array = array.detach().cpu()
+                if array.dtype == torch.bfloat16:
+                    array = array.view(torch.int16)
+                np.save(file, array.numpy())
+            os.replace(f"{path}/{name}.npy.tmp", f"{path}/{name}.npy")
+
+        metadata = self._snapshot_metadata()
+        metadata["arrays"] = list(arrays.keys())
+        torch.save(metadata, f"{path}/{self.metadata_file}.tmp")
+        os.replace(f"{path}/{self.metadata_file}.tmp", f"{path}/{self.metadata_file}")
+        return path
+
+    def load(self, path):
+        """Load a snapshot saved in directory `path'.
+
+        The arrays are memory-mapped copy-on-write, hence they are not copied into
+        memory until they are read and the snapshot files are never modified.
+        """
+        metadata = torch.load(f"{path}/{self.metadata_file}")
+        arrays = {
+            name: torch.from_numpy(np.load(f"{path}/{name}.npy", mmap_mode="c"))
+            for name in metadata["arrays"]
+        }
+        self._restore_snapshot(metadata, arrays)
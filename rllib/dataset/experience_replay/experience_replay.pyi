@@ -1,46 +1,120 @@
 from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
 
+import torch
 import torch.nn as nn
-from numpy import ndarray
 from torch import Tensor
 from torch.utils import data
 
 from rllib.dataset.datatypes import Observation
 from rllib.dataset.transforms import AbstractTransform
 
+from .quantization import AffineQuantizer
+
 T = TypeVar("T", bound="ExperienceReplay")
 
 class ExperienceReplay(data.Dataset):
+    metadata_file: str
+    cache_transformations: bool
     max_len: int
-    memory: ndarray
+    memory: Optional[Observation]
     valid: Tensor
     weights: Tensor
+    episode_ids: Tensor
     transformations: List[AbstractTransform]
     data_count: int
+    _num_episodes: int
+    _episode_open: bool
     _num_steps: int
     zero_observation: Optional[Observation]
     raw: bool
+    storage_dtypes: Dict[str, Union[torch.dtype, AffineQuantizer]]
+    _field_dtypes: Dict[str, torch.dtype]
+    deduplicate_next_state: bool
+    _last_next_state: Optional[Tensor]
+    _cache: Optional[Observation]
+    _cache_zero: Optional[Observation]
+    _cache_versions: Optional[Tuple[Tuple[int, int], ...]]
+    _dirty_rows: List[Tensor]
+    _uncached_rows: int
     def __init__(
         self,
         max_len: int,
         transformations: Optional[Union[List[AbstractTransform], nn.ModuleList]] = ...,
         num_steps: int = ...,
+        storage_dtypes: Optional[Dict[str, Union[torch.dtype, AffineQuantizer]]] = ...,
+        deduplicate_next_state: bool = ...,
     ) -> None: ...
     @classmethod
     def from_other(cls: Type[T], other: T, num_steps: Optional[int] = ...) -> T: ...
-    def split(self, ratio: float = ..., *args: Any, **kwargs: Any) -> Tuple[T, T]: ...
+    def _relocate_rows(self, other: ExperienceReplay) -> Tuple[Tensor, Tensor, int]: ...
+    @staticmethod
+    def _continues(next_state: Tensor, state: Tensor) -> Tensor: ...
+    def _plan_appends(
+        self, breaks: Tensor, ends: Tensor
+    ) -> Tuple[Tensor, Tensor, int]: ...
+    def _copy_rows(self, other: ExperienceReplay) -> None: ...
+    def _copy_row_arrays(
+        self, other: ExperienceReplay, source: Tensor, target: Tensor
+    ) -> None: ...
+    def split(
+        self, ratio: float = ..., views: bool = ..., *args: Any, **kwargs: Any
+    ) -> Tuple[T, T]: ...
     def __len__(self) -> int: ...
     def __getitem__(self, item: int) -> Tuple[Dict[str, Tensor], int, Tensor]: ...
+    def _storage_dtype(self, name: str, dtype: torch.dtype) -> torch.dtype: ...
+    def _is_stored(self, name: str) -> bool: ...
+    def _stored_columns(self) -> Dict[str, Tensor]: ...
+    def _memory_from_columns(self, columns: Dict[str, Tensor]) -> Observation: ...
+    def _allocate_memory(self, observation: Observation) -> None: ...
     def _init_observation(self, observation: Observation) -> None: ...
+    def _gather(
+        self, indexes: Union[int, Tensor], memory: Optional[Observation] = ...
+    ) -> Observation: ...
+    def _locate_columns(
+        self, indexes: Union[int, Tensor]
+    ) -> List[Tuple[str, Union[int, Tensor], Tensor]]: ...
+    def _gather_field(self, name: str, indexes: Union[int, Tensor]) -> Tensor: ...
+    def _decode(self, name: str, value: Tensor) -> Tensor: ...
+    def _write(self, indexes: Union[int, Tensor], observation: Observation) -> None: ...
+    def _transform(self, observation: Observation) -> Observation: ...
+    def _transformation_versions(self) -> Tuple[Tuple[int, int], ...]: ...
+    def _reset_cache(self) -> None: ...
+    def _write_cache(self, indexes: Tensor) -> None: ...
+    def _update_cache(self, num_rows: int) -> bool: ...
+    def _following_rows(self, indexes: Tensor, offsets: Tensor) -> Tensor: ...
+    def _newer_rows(self, indexes: Tensor) -> Tensor: ...
+    @staticmethod
+    def _mask_observation(
+        observation: Observation, zero_observation: Observation, mask: Tensor
+    ) -> Observation: ...
     def _get_consecutive_observations(
-        self, start_idx: int, num_steps: int
+        self, start_idx: Union[int, Tensor], num_steps: int, cached: bool = ...
     ) -> Observation: ...
     def _get_observation(self, idx: int) -> Observation: ...
     def reset(self) -> None: ...
+    @property
+    def _padding_steps(self) -> int: ...
     def end_episode(self) -> None: ...
     def append(self, observation: Observation) -> None: ...
     def append_invalid(self) -> None: ...
+    def extend(
+        self, observation: Observation, episode_ends: Optional[Tensor] = ...
+    ) -> None: ...
+    def _init_row_arrays(self, rows: Tensor, cleared: Tensor) -> None: ...
+    def _sample_indexes(
+        self, batch_size: int, num_batches: Optional[int] = ...
+    ) -> Tensor: ...
     def sample_batch(self, batch_size: int) -> Tuple[Observation, Tensor, Tensor]: ...
+    def sample_states(self, num_states: int) -> Tensor: ...
+    def sample_sequences(
+        self, batch_size: int, length: int
+    ) -> Tuple[Observation, Tensor, Tensor, Tensor]: ...
+    def _get_sequences(
+        self, indexes: Tensor, length: int
+    ) -> Tuple[Observation, Tensor]: ...
+    def sample_batches(
+        self, num_batches: int, batch_size: int
+    ) -> List[Tuple[Observation, Tensor, Tensor]]: ...
     def update(self, indexes: Tensor, td_error: Tensor) -> None: ...
     @property
     def all_data(self) -> Observation: ...
@@ -56,3 +130,10 @@ class ExperienceReplay(data.Dataset):
     def num_steps(self) -> int: ...
     @num_steps.setter
     def num_steps(self, value: int) -> None: ...
+    def _snapshot_arrays(self) -> Dict[str, Tensor]: ...
+    def _snapshot_metadata(self) -> Dict[str, Any]: ...
+    def _restore_snapshot(
+        self, metadata: Dict[str, Any], arrays: Dict[str, Tensor]
+    ) -> None: ...
+    def save(self, path: str) -> str: ...
+    def load(self, path: str) -> None: ...
@@ -0,0 +1,183 @@
+"""Implementation of an Experience Replay Buffer stored in memory-mapped files."""
+import os
+import tempfile
+from dataclasses import fields
+
+import numpy as np
+import torch
+
+from rllib.dataset.datatypes import Observation
+
+from .experience_replay import ExperienceReplay
+
+
+class MemoryMappedExperienceReplay(ExperienceReplay):
+    """An Experience Replay Buffer whose memory lives in memory-mapped files.
+
+    Every column of the memory, the valid flags, the weights and the episode ids are
+    stored in a `.npy' file inside `path'. Only the rows that are accessed are paged
+    into RAM, hence the buffer can be larger than the available memory.
+
+    If `path' already holds a flushed buffer, e.g., after a restart, it is reopened.
+    Pickling the buffer flushes it and only stores a reference to the files.
+    The transformed observations are not cached, as the cache would live in RAM.
+
+    Parameters
+    ----------
+    path: str, optional.
+        Directory where the files are stored. The off-policy and model-based agents
+        set it to `memory' inside their log directory. Otherwise, a temporary
+        directory is created when the first observation is appended.
+    max_len: int.
+        buffer size of experience replay algorithm.
+    transformations: list of transforms.AbstractTransform, optional.
+        A sequence of transformations to apply to the dataset, each of which is a
+        callable that takes an observation as input and returns a modified observation.
+        If they have an `update` method it will be called whenever a new trajectory
+        is added to the dataset.
+    num_steps: int, optional.
+        Number of steps in return vector.
+
+    Methods
+    -------
+    flush():
+        Write the memory and the metadata to disk.
+    """
+
+    cache_transformations = False
+
+    def __init__(self, path=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self._memmaps = dict()
+        if path is not None and os.path.exists(f"{path}/{self.metadata_file}"):
+            self._open()
+
+    def __getstate__(self):
+        """Flush the buffer and return the state without the memory-mapped arrays."""
+        self.flush()
+        state = self.__dict__.copy()
+        for key in ["memory", "valid", "weights", "episode_ids", "_memmaps"]:
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state):
+        """Reopen the memory-mapped arrays."""
+        self.__dict__.update(state)
+        self.memory = None
+        self.valid = torch.zeros(self.max_len)
+        self.weights = torch.ones(self.max_len)
+        self.episode_ids = torch.zeros(self.max_len, dtype=torch.long)
+        self._memmaps = dict()
+        if self.path is not None and os.path.exists(
+            f"{self.path}/{self.metadata_file}"
+        ):
+            self._open()
+
+    def _create_memmap(self, name, shape, dtype):
+        """Create a zero-initialized memory-mapped array and return it as a tensor.
+
+        Numpy has no bfloat16, so these arrays are stored as int16.
+        """
+        storage_dtype = torch.int16 if dtype == torch.bfloat16 else dtype
+        array = np.lib.format.open_memmap(
+            f"{self.path}/{name}.npy",
+            mode="w+",
+            dtype=torch.empty(0, dtype=storage_dtype).numpy().dtype,
+            # The header of the file is written with repr, which a torch.Size breaks.
+            shape=tuple(int(size) for size in shape),
+        )
+        self._memmaps[name] = array
+        return torch.from_numpy(array).view(dtype)
+
+    def _load_memmap(self, name):
+        """Load an existing memory-mapped array and return it as a tensor."""
+        array = np.load(f"{self.path}/{name}.npy", mmap_mode="r+")
+        self._memmaps[name] = array
+        return torch.from_numpy(array)
+
+    def _allocate_memory(self, observation):
+        """Allocate the columns and the arrays indexed by row in `path'."""
+        if self.path is None:
+            self.path = tempfile.mkdtemp(prefix="memory_")
+        os.makedirs(self.path, exist_ok=True)
+
+        # The old arrays may be mapped to the files that are about to be overwritten.
+        valid, weights = self.valid.clone(), self.weights.clone()
+        episode_ids = self.episode_ids.clone()
+        self._memmaps = dict()
+        self.memory = self._memory_from_columns(
+            {
+                field.name: self._create_memmap(
+                    field.name,
+                    (self.max_len,) + x.shape,
+                    self._storage_dtype(field.name, x.dtype),
+                )
+                for field, x in zip(fields(Observation), observation)
+                if self._is_stored(field.name)
+            }
+        )
+        self.valid = self._create_memmap("valid", valid.shape, valid.dtype)
+        self.valid[:] = valid
+        self.weights = self._create_memmap("weights", weights.shape, weights.dtype)
+        self.weights[:] = weights
+        self.episode_ids = self._create_memmap(
+            "episode_ids", episode_ids.shape, episode_ids.dtype
+        )
+        self.episode_ids[:] = episode_ids
+
+    def _open(self):
+        """Reopen a buffer that was flushed to `path'."""
+        metadata = torch.load(f"{self.path}/{self.metadata_file}")
+        self._memmaps = dict()
+        arrays = {name: self._load_memmap(name) for name in metadata["arrays"]}
+        self._restore_snapshot(metadata, arrays)
+
+    def flush(self):
+        """Write the memory-mapped arrays and the metadata to disk."""
+        if self.memory is None:
+            return
+        for array in self._memmaps.values():
+            array.flush()
+        metadata = self._snapshot_metadata()
+        metadata["arrays"] = list(self._memmaps.keys())
+        torch.save(metadata, f"{self.path}/{self.metadata_file}")
+
+    def reset(self):
+        """Reset memory to empty."""
+        super().reset()
+        self._memmaps = dict()
+        if self.path is not None and os.path.exists(
+            f"{self.path}/{self.metadata_file}"
+        ):
+            os.remove(f"{self.path}/{self.metadata_file}")
+
+    def save(self, path):
+        """Flush the buffer and save a snapshot of it in directory `path'.
+
+        If `path' is the directory of the buffer, the files are only flushed.
+        """
+        self.flush()
+        if self.path is None or os.path.abspath(path) != os.path.abspath(self.path):
+            super().save(path)
+        return path
+
+    def load(self, path):
+        """Reopen the buffer saved in directory `path' and keep its files there."""
+        self.path = path
+        self._open()
+
+    @ExperienceReplay.num_steps.setter
+    def num_steps(self, value):
+        """Reset the number of steps and write the relocated rows to `path'.
+
+        The rows are copied into memory first, as their files are overwritten.
+        """
+        if self.memory is not None:
+            columns = self._stored_columns()
+            self.memory = self._memory_from_columns(
+                {name: column.clone() for name, column in columns.items()}
+            )
+            self.valid, self.weights = self.valid.clone(), self.weights.clone()
+            self.episode_ids = self.episode_ids.clone()
+        ExperienceReplay.num_steps.fset(self, value)
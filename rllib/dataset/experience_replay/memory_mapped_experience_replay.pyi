@@ -0,0 +1,26 @@
+from typing import Any, Dict, Optional, Tuple
+
+from numpy import memmap
+from torch import Tensor, dtype
+
+from rllib.dataset.datatypes import Observation
+
+from .experience_replay import ExperienceReplay
+
+class MemoryMappedExperienceReplay(ExperienceReplay):
+    path: Optional[str]
+    _memmaps: Dict[str, memmap]
+    def __init__(
+        self, path: Optional[str] = ..., *args: Any, **kwargs: Any
+    ) -> None: ...
+    def __getstate__(self) -> Dict[str, Any]: ...
+    def __setstate__(self, state: Dict[str, Any]) -> None: ...
+    def _create_memmap(
+        self, name: str, shape: Tuple[int, ...], dtype: dtype
+    ) -> Tensor: ...
+    def _load_memmap(self, name: str) -> Tensor: ...
+    def _open(self) -> None: ...
+    def flush(self) -> None: ...
+    def reset(self) -> None: ...
+    def save(self, path: str) -> str: ...
+    def load(self, path: str) -> None: ...
@@ -1,13 +1,11 @@
 """Implementation of a Prioritized Experience Replay Buffer."""
 
-import numpy as np
 import torch
-from torch.utils.data._utils.collate import default_collate
 
-from rllib.dataset.datatypes import Observation
 from rllib.util.parameter_decay import Constant, ParameterDecay
 
 from .experience_replay import ExperienceReplay
+from .segment_tree import MinTree, SumTree
 
 
 class PrioritizedExperienceReplay(ExperienceReplay):
@@ -22,9 +20,12 @@ class PrioritizedExperienceReplay(ExperienceReplay):
     where \alpha is a parameter.
 
     The IS weights are given by:
-    ..math :: w_i = (N P(i)) ^ \beta,
+    ..math :: w_i = (N P(i)) ^ {-\beta} / \max_j w_j,
     where \beta is a parameter.
 
+    The priorities are stored in a sum-tree, to sample in O(log N), and in a min-tree,
+    to compute the normalization of the weights in O(1).
+
     Parameters
     ----------
     max_len: int.
@@ -68,6 +69,8 @@ class PrioritizedExperienceReplay(ExperienceReplay):
 
         self.max_priority = max_priority
         self._priorities = torch.zeros(self.max_len)
+        self._sum_tree = SumTree(self.max_len)
+        self._min_tree = MinTree(self.max_len)
         self.weights = torch.zeros(self.max_len)
 
     @classmethod
@@ -80,12 +83,11 @@ class PrioritizedExperienceReplay(ExperienceReplay):
             epsilon=other.epsilon,
             max_priority=other.max_priority,
             transformations=other.transformations,
-            num_steps=num_steps if num_steps else other.num_steps,
+            num_steps=other.num_steps if num_steps is None else num_steps,
+            storage_dtypes=other.storage_dtypes,
+            deduplicate_next_state=other.deduplicate_next_state,
         )
-
-        for observation in other.memory:
-            if isinstance(observation, Observation):
-                new.append(observation)
+        new._copy_rows(other)
         return new
 
     @property
@@ -96,20 +98,83 @@ class PrioritizedExperienceReplay(ExperienceReplay):
     @priorities.setter
     def priorities(self, value):
         """Set list of priorities."""
-        self._priorities = value
-        self._update_weights()
+        self._set_priorities(torch.arange(self.max_len), value)
 
     @property
     def probabilities(self):
         """Get list of probabilities."""
         num = len(self)
-        return self._priorities[:num] / torch.sum(self._priorities[:num])
+        return self._priorities[:num] / self._sum_tree.total.item()
+
+    def _set_priorities(self, indexes, priorities):
+        """Set the priorities at `indexes' and update the segment trees.
+
+        Invalid transitions have zero priority, so they are never sampled.
+        """
+        self._priorities[indexes] = priorities * self.valid[indexes]
+        priorities = self._priorities[indexes]
+        self._sum_tree[indexes] = priorities
+        self._min_tree[indexes] = torch.where(
+            priorities > 0, priorities, torch.tensor(float("inf"))
+        )
+
+    def _copy_row_arrays(self, other, source, target):
+        """See `ExperienceReplay._copy_row_arrays'.
+
+        The priorities of another prioritized buffer are kept, else the rows are
+        initialized with the maximum priority.
+        """
+        super()._copy_row_arrays(other, source, target)
+        if isinstance(other, PrioritizedExperienceReplay):
+            priorities = other._priorities[source]
+        else:
+            priorities = torch.full((len(target),), float(self.max_priority))
+        self._set_priorities(target, priorities)
+
+    def _snapshot_arrays(self):
+        """See `ExperienceReplay._snapshot_arrays'."""
+        arrays = super()._snapshot_arrays()
+        arrays["priorities"] = self._priorities
+        return arrays
+
+    def _snapshot_metadata(self):
+        """See `ExperienceReplay._snapshot_metadata'."""
+        metadata = super()._snapshot_metadata()
+        metadata["alpha"], metadata["beta"] = self.alpha, self.beta
+        metadata["max_priority"] = self.max_priority
+        return metadata
+
+    def _restore_snapshot(self, metadata, arrays):
+        """See `ExperienceReplay._restore_snapshot'.
+
+        The segment trees are rebuilt from the priorities.
+        """
+        super()._restore_snapshot(metadata, arrays)
+        self.alpha = metadata["alpha"]
+        self.beta = metadata["beta"]
+        self.max_priority = metadata["max_priority"]
+        self._priorities = torch.zeros(self.max_len)
+        self._sum_tree.reset()
+        self._min_tree.reset()
+        self._set_priorities(torch.arange(self.max_len), arrays["priorities"].clone())
 
-    def sample_batch(self, batch_size):
-        """Get a batch of data."""
-        probs = self.probabilities.numpy()
-        indices = np.random.choice(len(self), batch_size, p=probs / np.sum(probs))
-        return default_collate([self[i] for i in indices])
+    def reset(self):
+        """Reset memory to empty."""
+        super().reset()
+        self._priorities = torch.zeros(self.max_len)
+        self._sum_tree.reset()
+        self._min_tree.reset()
+
+    def _sample_indexes(self, batch_size, num_batches=None):
+        """Sample indexes proportionally to their priorities.
+
+        The indexes are sampled in O(log N) with the sum tree and the importance
+        sampling weights are only computed for the sampled indexes. All the batches
+        are sampled with the current priorities.
+        """
+        indices = self._sum_tree.sample(batch_size, num_batches=num_batches)
+        self._update_weights(indices)
+        return indices
 
     def append(self, observation):
         """Append new observation to the dataset.
@@ -123,19 +188,40 @@ class PrioritizedExperienceReplay(ExperienceReplay):
         TypeError
             If the new observation is not of type Observation.
         """
-        self._priorities[self.ptr] = self.max_priority
         super().append(observation)
-        self._update_weights()
+        ptr = self.ptr - 1  # The row where the observation was written.
+        padding = (ptr + torch.arange(self._padding_steps + 1)) % self.max_len
+        priorities = torch.zeros(self._padding_steps + 1)
+        priorities[0] = self.max_priority
+        self._set_priorities(padding, priorities)
+
+    def _init_row_arrays(self, rows, cleared):
+        """See `ExperienceReplay._init_row_arrays'.
+
+        The new observations have the maximum priority and the other rows zero.
+        """
+        self._set_priorities(cleared, torch.zeros(len(cleared)))
+        self._set_priorities(rows, torch.full((len(rows),), float(self.max_priority)))
+
+    def append_invalid(self):
+        """Append an invalid transition."""
+        ptr = self.ptr
+        super().append_invalid()
+        if self.zero_observation is not None:
+            self._set_priorities(ptr, torch.tensor(0.0))
 
     def update(self, indexes, td_error):
         """Update experience replay sampling distribution with set of weights."""
-        self._priorities[indexes] = (td_error + self.epsilon) ** self.alpha()
+        self._set_priorities(indexes, (td_error + self.epsilon) ** self.alpha())
         self.alpha.update()
         self.beta.update()
-        self._update_weights()
 
-    def _update_weights(self):
-        """Update priorities and weights."""
-        num = len(self)
-        weights = torch.pow(self.probabilities * num, -self.beta())
-        self.weights[:num] = weights
+    def _update_weights(self, indexes):
+        r"""Update the importance sampling weights at `indexes'.
+
+        The weights are normalized by the largest weight, given by the smallest
+        priority, so that they only scale the updates downwards.
+        """
+        min_priority = self._min_tree.min
+        weights = torch.pow(self._sum_tree[indexes] / min_priority, -self.beta())
+        self.weights[indexes] = weights.to(self.weights)
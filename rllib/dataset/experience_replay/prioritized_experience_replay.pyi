@@ -1,10 +1,11 @@
-from typing import Any, Union
+from typing import Any, Optional, Union
 
 from torch import Tensor
 
 from rllib.util.parameter_decay import ParameterDecay
 
 from .experience_replay import ExperienceReplay
+from .segment_tree import MinTree, SumTree
 
 class PrioritizedExperienceReplay(ExperienceReplay):
     alpha: ParameterDecay
@@ -12,7 +13,8 @@ class PrioritizedExperienceReplay(ExperienceReplay):
     epsilon: Tensor
     max_priority: float
     _priorities: Tensor
-    priors: Tensor
+    _sum_tree: SumTree
+    _min_tree: MinTree
     def __init__(
         self,
         alpha: Union[float, ParameterDecay] = ...,
@@ -22,7 +24,17 @@ class PrioritizedExperienceReplay(ExperienceReplay):
         *args: Any,
         **kwargs: Any,
     ) -> None: ...
-    def _update_weights(self) -> None: ...
+    def _init_row_arrays(self, rows: Tensor, cleared: Tensor) -> None: ...
+    def _copy_row_arrays(
+        self, other: ExperienceReplay, source: Tensor, target: Tensor
+    ) -> None: ...
+    def _set_priorities(
+        self, indexes: Union[int, Tensor], priorities: Tensor
+    ) -> None: ...
+    def _update_weights(self, indexes: Tensor) -> None: ...
+    def _sample_indexes(
+        self, batch_size: int, num_batches: Optional[int] = ...
+    ) -> Tensor: ...
     @property
     def priorities(self) -> Tensor: ...
     @priorities.setter
@@ -0,0 +1,109 @@
+"""Reduced-precision storage of the columns of an Experience Replay Buffer."""
+
+import torch
+
+
+class AffineQuantizer(object):
+    r"""Affine quantization of a column into uint8 with per-dimension scale and offset.
+
+    A value is stored as the integer code
+        .. math:: q = round((x - low) / scale), scale = (high - low) / 255,
+    and it is read back as `low + scale * q'. The error is at most `scale / 2'.
+
+    If `low' and `high' are not given, the range is fitted to the written values.
+    When a written value falls outside of the range, the range is widened by a
+    relative `margin' and the whole column is quantized again. Hence, widening is
+    rare after the first observations, but passing the bounds of the state space
+    avoids it altogether. The values must be finite.
+
+    Parameters
+    ----------
+    low: Tensor or float, optional.
+        Lower bound of the values, per dimension.
+    high: Tensor or float, optional.
+        Upper bound of the values, per dimension.
+    margin: float, optional (default=0.5).
+        Relative margin added at each side of the range when it is widened.
+    """
+
+    dtype = torch.uint8
+    num_levels = 255
+
+    def __init__(self, low=None, high=None, margin=0.5):
+        self.low = None if low is None else torch.as_tensor(low).double()
+        self.high = None if high is None else torch.as_tensor(high).double()
+        self.margin = margin
+
+    @property
+    def scale(self):
+        """Return the size of a quantization step."""
+        return ((self.high - self.low) / self.num_levels).clamp_min(1e-12)
+
+    def quantize(self, value):
+        """Return the codes of `value'."""
+        code = torch.round((value.double() - self.low) / self.scale)
+        return code.clamp(0, self.num_levels).to(self.dtype)
+
+    def dequantize(self, code, dtype=None):
+        """Return the values of `code' with data type `dtype'."""
+        dtype = torch.get_default_dtype() if dtype is None else dtype
+        return (self.low + self.scale * code.double()).to(dtype)
+
+    def write(self, column, indexes, value):
+        """Quantize `value' and write it into `column' at `indexes'.
+
+        If `value' is outside of the range, the range is widened and the codes
+        already in `column' are quantized again.
+        """
+        value = torch.as_tensor(value).detach()
+        rows = value.double().reshape((-1,) + column.shape[1:])
+        low, high = rows.min(0)[0], rows.max(0)[0]
+        if self.low is not None:
+            if (low >= self.low).all() and (high <= self.high).all():
+                column[indexes] = self.quantize(value)
+                return
+            low, high = torch.min(low, self.low), torch.max(high, self.high)
+            old_values = self.dequantize(column, dtype=torch.double)
+        else:
+            old_values = None
+
+        width = high - low
+        self.low, self.high = low - self.margin * width, high + self.margin * width
+        if old_values is not None:
+            column[:] = self.quantize(old_values)
+        column[indexes] = self.quantize(value)
+
+
+def reduced_precision_storage(state_dtype=torch.float16, low=None, high=None):
+    """Return a storage policy that cuts the memory of a buffer 2-4x.
+
+    States and next states are stored with `state_dtype', rewards and log
+    probabilities as float16 and the done flags as bool.
+
+    Parameters
+    ----------
+    state_dtype: torch.dtype, optional (default=torch.float16).
+        Either torch.float16, torch.bfloat16, or torch.uint8 for affine quantization.
+    low: Tensor or float, optional.
+        Lower bound of the states for affine quantization.
+    high: Tensor or float, optional.
+        Upper bound of the states for affine quantization.
+
+    Returns
+    -------
+    storage_dtypes: dict.
+        Dictionary from the name of an Observation field to its storage data type or
+        quantizer.
+    """
+    if state_dtype == torch.uint8:
+        state, next_state = AffineQuantizer(low, high), AffineQuantizer(low, high)
+    else:
+        state, next_state = state_dtype, state_dtype
+
+    return {
+        "state": state,
+        "next_state": next_state,
+        "reward": torch.float16,
+        "log_prob_action": torch.float16,
+        "done": torch.bool,
+    }
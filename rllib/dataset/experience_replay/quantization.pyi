@@ -0,0 +1,32 @@
+from typing import Dict, Optional, Union
+
+import torch
+from torch import Tensor
+
+class AffineQuantizer(object):
+    dtype: torch.dtype
+    num_levels: int
+    low: Optional[Tensor]
+    high: Optional[Tensor]
+    margin: float
+    def __init__(
+        self,
+        low: Optional[Union[Tensor, float]] = ...,
+        high: Optional[Union[Tensor, float]] = ...,
+        margin: float = ...,
+    ) -> None: ...
+    @property
+    def scale(self) -> Tensor: ...
+    def quantize(self, value: Tensor) -> Tensor: ...
+    def dequantize(
+        self, code: Tensor, dtype: Optional[torch.dtype] = ...
+    ) -> Tensor: ...
+    def write(
+        self, column: Tensor, indexes: Union[int, Tensor], value: Tensor
+    ) -> None: ...
+
+def reduced_precision_storage(
+    state_dtype: torch.dtype = ...,
+    low: Optional[Union[Tensor, float]] = ...,
+    high: Optional[Union[Tensor, float]] = ...,
+) -> Dict[str, Union[torch.dtype, AffineQuantizer]]: ...
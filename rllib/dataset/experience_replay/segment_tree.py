@@ -0,0 +1,129 @@
+"""Implementation of Segment Trees for prioritized sampling."""
+
+import torch
+
+
+class SegmentTree(object):
+    """A Segment Tree stored in a flat array.
+
+    The leaves hold the values of the tree and every internal node holds the
+    reduction, with `operation', of its two children. The root holds the reduction of
+    all the values. Updates of k leaves and the reduction cost O(k log N).
+
+    Parameters
+    ----------
+    capacity: int.
+        Number of leaves of the tree.
+    operation: callable.
+        Associative binary operation used to reduce two nodes.
+    neutral_element: float.
+        Neutral element of the operation. Unset leaves hold this value.
+
+    References
+    ----------
+    Schaul, T., Quan, J., Antonoglou, I., & Silver, D. (2015).
+    Prioritized experience replay. ICLR.
+    """
+
+    def __init__(self, capacity, operation, neutral_element):
+        self.capacity = capacity
+        self._num_leaves = 1 << max(0, capacity - 1).bit_length()
+        self.operation = operation
+        self.neutral_element = neutral_element
+        self._tree = torch.full(
+            (2 * self._num_leaves,), neutral_element, dtype=torch.double
+        )
+
+    def __len__(self):
+        """Return the number of leaves of the tree."""
+        return self.capacity
+
+    def __getitem__(self, idx):
+        """Get the value of the leaves at `idx'."""
+        return self._tree[self._num_leaves + torch.as_tensor(idx, dtype=torch.long)]
+
+    def __setitem__(self, idx, value):
+        """Set the value of the leaves at `idx' and update their ancestors."""
+        node = self._num_leaves + torch.as_tensor(idx, dtype=torch.long).reshape(-1)
+        value = torch.as_tensor(value, dtype=self._tree.dtype).reshape(-1)
+        self._tree[node] = value
+
+        # All the leaves are at the same depth, so the ancestors are too.
+        node = torch.unique(node // 2)
+        while node[0] > 0:
+            self._tree[node] = self.operation(
+                self._tree[2 * node], self._tree[2 * node + 1]
+            )
+            node = torch.unique(node // 2)
+
+    @property
+    def values(self):
+        """Get the value of all the leaves."""
+        return self._tree[self._num_leaves : self._num_leaves + self.capacity]
+
+    def reduce(self):
+        """Return the reduction of all the values of the tree."""
+        return self._tree[1]
+
+    def reset(self):
+        """Reset all the values to the neutral element."""
+        self._tree.fill_(self.neutral_element)
+
+
+class SumTree(SegmentTree):
+    """A Segment Tree that keeps the sum of the values.
+
+    The values must be non-negative. It samples leaves proportionally to its value.
+    """
+
+    def __init__(self, capacity):
+        super().__init__(capacity, operation=torch.add, neutral_element=0.0)
+
+    @property
+    def total(self):
+        """Return the sum of all the values."""
+        return self.reduce()
+
+    def find_prefix_sum_idx(self, prefix_sum):
+        """Find the leaves where the cumulative sum reaches `prefix_sum'.
+
+        Every entry of `prefix_sum' descends from the root in parallel. Leaves with
+        zero value are never returned as long as the total sum is positive.
+        """
+        prefix_sum = torch.as_tensor(prefix_sum, dtype=self._tree.dtype).clone()
+        node = torch.ones_like(prefix_sum, dtype=torch.long)
+        while node[0] < self._num_leaves:
+            left = self._tree[2 * node]
+            right = self._tree[2 * node + 1]
+            go_right = (prefix_sum >= left) & (right > 0)
+            prefix_sum = torch.where(go_right, prefix_sum - left, prefix_sum)
+            node = 2 * node + go_right.long()
+        return node - self._num_leaves
+
+    def sample(self, batch_size, num_batches=None):
+        """Sample `batch_size' leaves proportionally to their values.
+
+        The sampling is stratified: the total sum is divided into `batch_size'
+        segments of equal mass, and one leaf is sampled from each segment.
+        If `num_batches' is given, it returns [num_batches x batch_size] leaves and
+        each batch is stratified independently.
+        """
+        shape = (batch_size,) if num_batches is None else (num_batches, batch_size)
+        segment = self.total / batch_size
+        prefix_sum = (
+            torch.arange(batch_size, dtype=self._tree.dtype)
+            + torch.rand(shape, dtype=self._tree.dtype)
+        ) * segment
+        return self.find_prefix_sum_idx(prefix_sum.reshape(-1)).reshape(shape)
+
+
+class MinTree(SegmentTree):
+    """A Segment Tree that keeps the minimum of the values."""
+
+    def __init__(self, capacity):
+        super().__init__(capacity, operation=torch.min, neutral_element=float("inf"))
+
+    @property
+    def min(self):
+        """Return the minimum of all the values."""
+        return self.reduce()
@@ -0,0 +1,37 @@
+from typing import Callable, Optional, Union
+
+from torch import Tensor
+
+class SegmentTree(object):
+    capacity: int
+    _num_leaves: int
+    operation: Callable[[Tensor, Tensor], Tensor]
+    neutral_element: float
+    _tree: Tensor
+    def __init__(
+        self,
+        capacity: int,
+        operation: Callable[[Tensor, Tensor], Tensor],
+        neutral_element: float,
+    ) -> None: ...
+    def __len__(self) -> int: ...
+    def __getitem__(self, idx: Union[int, Tensor]) -> Tensor: ...
+    def __setitem__(
+        self, idx: Union[int, Tensor], value: Union[float, Tensor]
+    ) -> None: ...
+    @property
+    def values(self) -> Tensor: ...
+    def reduce(self) -> Tensor: ...
+    def reset(self) -> None: ...
+
+class SumTree(SegmentTree):
+    def __init__(self, capacity: int) -> None: ...
+    @property
+    def total(self) -> Tensor: ...
+    def find_prefix_sum_idx(self, prefix_sum: Tensor) -> Tensor: ...
+    def sample(self, batch_size: int, num_batches: Optional[int] = ...) -> Tensor: ...
+
+class MinTree(SegmentTree):
+    def __init__(self, capacity: int) -> None: ...
+    @property
+    def min(self) -> Tensor: ...
@@ -0,0 +1,342 @@
+"""Implementation of an Experience Replay Buffer in shared memory."""
+import copy
+import time
+
+import torch
+
+from rllib.dataset.datatypes import Observation
+
+from .experience_replay import ExperienceReplay
+from .quantization import AffineQuantizer
+
+
+class SharedMemoryExperienceReplay(ExperienceReplay):
+    """An Experience Replay Buffer that several actor processes append to.
+
+    The columns, the arrays indexed by row and the number of transitions appended by
+    each actor live in shared memory. The rows are split into one segment per
+    actor, and `actor(rank)' returns a buffer over the segment of an actor, with its
+    own write cursor. The learner samples all the actors without copies, and the
+    n-step windows wrap around inside each segment.
+
+    The rows are guarded by a sequence lock. Each row has a sequence number in shared
+    memory, which an actor increments before and after it writes the row, so it is
+    odd while the row is written. `extend' locks the whole segment of the actor. The
+    learner reads the sequence numbers of the rows of a window before and after it
+    gathers them, and reads again the windows with a row that was written meanwhile,
+    so a sampled transition never mixes the fields of two transitions.
+
+    The memory is allocated with `allocate', or the first observation appended by
+    the learner, before the actors start. With `torch.multiprocessing', the buffer
+    is shared with the actor processes when it is passed as an argument.
+
+    Each process updates its own copy of the transformations, hence only
+    transformations without state should be used. The transformed observations are
+    not cached, as the rows change in other processes, and the next states are not
+    deduplicated.
+
+    Parameters
+    ----------
+    max_len: int.
+        buffer size of experience replay algorithm. It must be divisible by the
+        number of actors.
+    num_actors: int, optional (default=1).
+        Number of actors that append to the buffer.
+    transformations: list of transforms.AbstractTransform, optional.
+        A sequence of transformations to apply to the dataset, each of which is a
+        callable that takes an observation as input and returns a modified observation.
+    num_steps: int, optional.
+        Number of steps in return vector.
+    storage_dtypes: dict, optional.
+        Dictionary from the name of an Observation field to the data type used to
+        store its column. Quantizers are not supported, as their range is not shared.
+    deduplicate_next_state: bool, optional (default=False).
+        It must be False, as the rows of an actor are not contiguous in the buffer.
+
+    Methods
+    -------
+    allocate(observation):
+        Allocate the shared columns.
+    actor(rank):
+        Get the buffer through which actor `rank' appends.
+
+    Examples
+    --------
+    The actors are processes that append to their own buffers::
+
+        memory = SharedMemoryExperienceReplay(max_len=10000, num_actors=4)
+        memory.allocate(observation)
+        processes = [
+            torch.multiprocessing.Process(target=collect, args=(memory.actor(rank),))
+            for rank in range(4)
+        ]
+    """
+
+    cache_transformations = False
+    max_read_attempts = 1000
+
+    def __init__(
+        self,
+        max_len,
+        num_actors=1,
+        transformations=None,
+        num_steps=0,
+        storage_dtypes=None,
+        deduplicate_next_state=False,
+    ):
+        if deduplicate_next_state:
+            raise ValueError("The next states of a shared buffer are always stored.")
+        if max_len % num_actors != 0:
+            raise ValueError(
+                f"max_len {max_len} is not divisible by num_actors {num_actors}."
+            )
+        if any(
+            isinstance(storage, AffineQuantizer)
+            for storage in (storage_dtypes or dict()).values()
+        ):
+            raise ValueError("Quantized columns can not be shared.")
+        self.num_actors = num_actors
+        self.segment_len = max_len // num_actors
+        self.rank = None
+        self._data_counts = torch.zeros(num_actors, dtype=torch.long).share_memory_()
+        super().__init__(
+            max_len,
+            transformations=transformations,
+            num_steps=num_steps,
+            storage_dtypes=storage_dtypes,
+        )
+        self.valid.share_memory_()
+        self.weights.share_memory_()
+        self.episode_ids.share_memory_()
+        self.sequences = torch.zeros(max_len, dtype=torch.long).share_memory_()
+
+    @property
+    def data_count(self):
+        """Return the number of rows appended by the actor, or by all of them."""
+        if self.rank is None:
+            return int(self._data_counts.sum())
+        return int(self._data_counts[self.rank])
+
+    @data_count.setter
+    def data_count(self, value):
+        """Set the number of rows appended by the actor."""
+        if self.rank is not None:
+            self._data_counts[self.rank] = value
+        elif value != self.data_count:
+            raise RuntimeError("Only the actors append to the buffer.")
+
+    def __len__(self):
+        """Return the current size of the buffer."""
+        if self.rank is not None:
+            return super().__len__()
+        return int(self._data_counts.clamp(max=self.segment_len).sum())
+
+    @property
+    def is_full(self):
+        """Flag that checks if the segments of all the actors are full."""
+        if self.rank is not None:
+            return self.data_count >= self.max_len
+        return bool((self._data_counts >= self.segment_len).all())
+
+    def _allocate_memory(self, observation):
+        """Allocate the columns in shared memory."""
+        super()._allocate_memory(observation)
+        for column in self._stored_columns().values():
+            column.share_memory_()
+
+    def allocate(self, observation):
+        """Allocate the shared columns for observations like `observation'."""
+        if self.memory is None:
+            self._init_observation(observation.to_torch())
+
+    def actor(self, rank):
+        """Get the buffer through which actor `rank' appends.
+
+        It is a buffer of length `segment_len' whose columns are views of the rows of
+        the actor.
+        """
+        if self.memory is None:
+            raise RuntimeError("Allocate the memory before starting the actors.")
+        rows = slice(rank * self.segment_len, (rank + 1) * self.segment_len)
+        actor = copy.copy(self)
+        actor.rank = rank
+        actor.max_len = self.segment_len
+        actor.memory = Observation(*map(lambda column: column[rows], self.memory))
+        actor.valid = self.valid[rows]
+        actor.weights = self.weights[rows]
+        actor.episode_ids = self.episode_ids[rows]
+        actor.sequences = self.sequences[rows]
+        actor._last_next_state = None
+        return actor
+
+    def append(self, observation):
+        """Append new observation to the segment of the actor.
+
+        Raises
+        ------
+        RuntimeError
+            If the buffer is not the one of an actor.
+        """
+        if self.rank is None:
+            if self.memory is None:
+                self.allocate(observation)
+                return
+            raise RuntimeError("Only the actors append to the buffer.")
+        # The row and the padding rows that are invalidated after it.
+        rows = (self.ptr + torch.arange(1 + self._padding_steps)) % self.max_len
+        self.sequences[rows] += 1
+        try:
+            super().append(observation)
+        finally:
+            self.sequences[rows] += 1
+
+    def extend(self, observation, episode_ends=None):
+        """Append a batch of observations to the segment of the actor.
+
+        The whole segment is locked while the observations are written.
+
+        Raises
+        ------
+        RuntimeError
+            If the buffer is not the one of an actor.
+        """
+        if self.rank is None:
+            raise RuntimeError("Only the actors append to the buffer.")
+        self.sequences += 1
+        try:
+            super().extend(observation, episode_ends=episode_ends)
+        finally:
+            self.sequences += 1
+
+    def _read_consistently(self, read, indexes, rows):
+        """Read the windows of `rows' that start at `indexes' under the sequence lock.
+
+        `read' returns a tuple of tensors whose first dimension indexes the windows.
+        The windows with a row that is written during the read are read again.
+
+        Raises
+        ------
+        RuntimeError
+            If a window is written during `max_read_attempts' reads.
+        """
+        values, pending = None, torch.arange(len(indexes))
+        for _ in range(self.max_read_attempts):
+            sequences = self.sequences[rows[pending]]
+            new_values = read(indexes[pending])
+            if values is None:
+                values = new_values
+            else:
+                for value, new_value in zip(values, new_values):
+                    value[pending] = new_value
+            torn = (self.sequences[rows[pending]] != sequences) | (sequences % 2 == 1)
+            pending = pending[torn.any(-1)]
+            if len(pending) == 0:
+                return values
+            time.sleep(1e-4)  # Let the actors finish their writes.
+        raise RuntimeError("The rows were written during every read.")
+
+    def _get_consecutive_observations(self, start_idx, num_steps, cached=False):
+        """See `ExperienceReplay._get_consecutive_observations'.
+
+        The learner reads the windows under the sequence lock.
+        """
+        get_observations = super()._get_consecutive_observations
+        if self.rank is not None:
+            return get_observations(start_idx, num_steps, cached)
+        start_idx = torch.as_tensor(start_idx, dtype=torch.long)
+        indexes = start_idx.reshape(-1)
+        offsets = torch.arange(max(1, num_steps))
+        rows = self._following_rows(indexes.unsqueeze(-1), offsets)
+        observation = self._read_consistently(
+            lambda idx: tuple(get_observations(idx, num_steps, cached)), indexes, rows
+        )
+        return Observation(
+            *map(lambda x: x.reshape(start_idx.shape + x.shape[1:]), observation)
+        )
+
+    def _get_sequences(self, indexes, length):
+        """See `ExperienceReplay._get_sequences'.
+
+        The learner reads the windows under the sequence lock.
+        """
+        get_sequences = super()._get_sequences
+        if self.rank is not None:
+            return get_sequences(indexes, length)
+
+        def read(idx):
+            observation, mask = get_sequences(idx, length)
+            return (*observation, mask)
+
+        rows = self._following_rows(indexes.unsqueeze(-1), torch.arange(length))
+        *observation, mask = self._read_consistently(read, indexes, rows)
+        return Observation(*observation), mask
+
+    def _following_rows(self, indexes, offsets):
+        """Return the rows `offsets' after `indexes' in the segment of each row."""
+        if self.rank is not None:
+            return super()._following_rows(indexes, offsets)
+        start = indexes - indexes % self.segment_len
+        return start + (indexes - start + offsets) % self.segment_len
+
+    def _newer_rows(self, indexes):
+        """Return the number of rows appended after `indexes' in their segments."""
+        if self.rank is not None:
+            return super()._newer_rows(indexes)
+        ptr = self._data_counts[indexes // self.segment_len] % self.segment_len
+        return (ptr - 1 - indexes % self.segment_len) % self.segment_len
+
+    def reset(self):
+        """Reset memory to empty, keeping the shared columns."""
+        self.valid.zero_()
+        self._episode_open = False
+        if self.rank is None:
+            self._data_counts.zero_()
+        else:
+            self.data_count = 0
+        self._last_next_state = None
+        self._reset_cache()
+
+    def split(self, ratio=0.8, views=False, *args, **kwargs):
+        """Refuse to split a shared buffer.
+
+        Raises
+        ------
+        RuntimeError
+            Always, as the rows of the actors are not contiguous.
+        """
+        raise RuntimeError("A shared buffer can not be split.")
+
+    @ExperienceReplay.num_steps.setter
+    def num_steps(self, value):
+        """Refuse to change the number of steps of a shared buffer.
+
+        Raises
+        ------
+        RuntimeError
+            Always, as the rows can not be relocated while the actors append to them.
+        """
+        raise RuntimeError("The number of steps of a shared buffer is fixed.")
+
+    def _snapshot_arrays(self):
+        """See `ExperienceReplay._snapshot_arrays'."""
+        arrays = super()._snapshot_arrays()
+        arrays["data_counts"] = self._data_counts
+        return arrays
+
+    def _restore_snapshot(self, metadata, arrays):
+        """See `ExperienceReplay._restore_snapshot'.
+
+        The arrays are copied into shared memory.
+        """
+        if self.rank is not None:
+            raise RuntimeError("Only the learner restores the buffer.")
+        self._data_counts.copy_(arrays.pop("data_counts"))
+        metadata = dict(metadata, data_count=self.data_count)
+        super()._restore_snapshot(metadata, arrays)
+        self.valid = self.valid.clone().share_memory_()
+        self.weights = self.weights.clone().share_memory_()
+        self.episode_ids = self.episode_ids.clone().share_memory_()
+        if self.memory is not None:
+            self.memory = Observation(
+                *map(lambda column: column.clone().share_memory_(), self.memory)
+            )
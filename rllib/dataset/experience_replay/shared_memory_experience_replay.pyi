@@ -0,0 +1,46 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import torch
+import torch.nn as nn
+from torch import Tensor
+
+from rllib.dataset.datatypes import Observation
+from rllib.dataset.transforms import AbstractTransform
+
+from .experience_replay import ExperienceReplay
+from .quantization import AffineQuantizer
+
+class SharedMemoryExperienceReplay(ExperienceReplay):
+    num_actors: int
+    segment_len: int
+    rank: Optional[int]
+    sequences: Tensor
+    max_read_attempts: int
+    _data_counts: Tensor
+    def __init__(
+        self,
+        max_len: int,
+        num_actors: int = ...,
+        transformations: Optional[Union[List[AbstractTransform], nn.ModuleList]] = ...,
+        num_steps: int = ...,
+        storage_dtypes: Optional[Dict[str, Union[torch.dtype, AffineQuantizer]]] = ...,
+        deduplicate_next_state: bool = ...,
+    ) -> None: ...
+    @property  # type: ignore
+    def data_count(self) -> int: ...
+    @data_count.setter
+    def data_count(self, value: int) -> None: ...
+    def allocate(self, observation: Observation) -> None: ...
+    def actor(self, rank: int) -> SharedMemoryExperienceReplay: ...
+    def extend(
+        self, observation: Observation, episode_ends: Optional[Tensor] = ...
+    ) -> None: ...
+    def _read_consistently(
+        self,
+        read: Callable[[Tensor], Tuple[Tensor, ...]],
+        indexes: Tensor,
+        rows: Tensor,
+    ) -> Tuple[Tensor, ...]: ...
+    def _restore_snapshot(
+        self, metadata: Dict[str, Any], arrays: Dict[str, Tensor]
+    ) -> None: ...
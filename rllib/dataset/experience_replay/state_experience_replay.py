@@ -3,7 +3,6 @@
 import numpy as np
 import torch
 from torch.utils import data
-from torch.utils.data._utils.collate import default_collate
 
 
 class StateExperienceReplay(data.Dataset):
@@ -108,7 +107,19 @@ class StateExperienceReplay(data.Dataset):
             self.memory[:delta] = state[:delta]
             self._ptr = delta
 
-    def sample_batch(self, batch_size):
-        """Get a batch of data."""
-        indices = np.random.choice(len(self), batch_size)
-        return default_collate([self[i] for i in indices])
+    def sample_batch(self, batch_size, out=None):
+        """Get a batch of data.
+
+        The states are gathered from the memory at once, into `out' if it is given.
+        """
+        indices = torch.as_tensor(np.random.choice(len(self), batch_size))
+        return torch.index_select(self.memory, 0, indices, out=out)
+
+    def sample_batches(self, num_batches, batch_size):
+        """Get `num_batches' batches of data gathered at once.
+
+        Each batch is a view of a single [num_batches x batch_size] block.
+        """
+        indices = np.random.choice(len(self), (num_batches, batch_size))
+        states = self.memory[indices]
+        return [states[i] for i in range(num_batches)]
@@ -0,0 +1,74 @@
+import pytest
+import torch
+
+from rllib.dataset import (
+    BatchPrefetcher,
+    ExperienceReplay,
+    PrioritizedExperienceReplay,
+)
+from rllib.dataset.datatypes import Observation
+
+
+@pytest.fixture(params=[0, 1, 4])
+def max_prefetch(request):
+    return request.param
+
+
+def fill(memory, num_transitions):
+    for _ in range(num_transitions):
+        memory.append(Observation.random_example(dim_state=(3,), dim_action=(2,)))
+    return memory
+
+
+def test_sample_batch(max_prefetch):
+    memory = fill(ExperienceReplay(max_len=100), 150)
+    with BatchPrefetcher(memory, 32, max_prefetch=max_prefetch) as prefetcher:
+        assert prefetcher.stale_priorities
+        for _ in range(10):
+            observation, idx, weight = prefetcher.sample_batch()
+            assert observation.state.shape == (32, 1, 3)
+            assert idx.shape == (32,)
+            assert weight.shape == (32,)
+    assert prefetcher._thread is None
+
+
+def test_num_batches(max_prefetch):
+    memory = fill(ExperienceReplay(max_len=100), 150)
+    with BatchPrefetcher(
+        memory, 32, max_prefetch=max_prefetch, num_batches=4
+    ) as prefetcher:
+        for _ in range(10):
+            observation, idx, weight = prefetcher.sample_batch()
+            assert observation.state.shape == (32, 1, 3)
+            assert idx.shape == (32,)
+
+
+def test_updates_before_samples(max_prefetch):
+    memory = fill(PrioritizedExperienceReplay(max_len=100), 150)
+    with BatchPrefetcher(memory, 32, max_prefetch=max_prefetch) as prefetcher:
+        assert not prefetcher.stale_priorities
+        target = None
+        for i in range(10):
+            observation, idx, weight = prefetcher.sample_batch()
+            if target is not None:  # All the samples come from the last update.
+                assert (idx == target).all()
+
+            # Leave a single row with non-zero priority.
+            target = memory.valid_indexes[i]
+            td_error = torch.zeros(len(memory.valid_indexes)) - memory.epsilon
+            td_error[i] = 1.0
+            prefetcher.update(memory.valid_indexes, td_error)
+
+
+def test_samples_without_update(max_prefetch):
+    memory = fill(PrioritizedExperienceReplay(max_len=100), 150)
+    with BatchPrefetcher(memory, 32, max_prefetch=max_prefetch) as prefetcher:
+        for _ in range(10):
+            prefetcher.sample_batch()
+
+
+def test_error():
+    memory = ExperienceReplay(max_len=100)
+    with pytest.raises(ValueError):
+        with BatchPrefetcher(memory, 32) as prefetcher:
+            prefetcher.sample_batch()
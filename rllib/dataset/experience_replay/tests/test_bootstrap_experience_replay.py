@@ -0,0 +1,37 @@
+import pytest
+import torch
+
+from rllib.dataset import BootstrapExperienceReplay
+from rllib.dataset.datatypes import Observation
+
+
+@pytest.fixture(params=[0, 2])
+def num_steps(request):
+    return request.param
+
+
+def create_ber(max_len, num_steps, num_transitions, num_bootstraps=5):
+    memory = BootstrapExperienceReplay(
+        max_len=max_len, num_steps=num_steps, num_bootstraps=num_bootstraps
+    )
+    for _ in range(num_transitions):
+        memory.append(Observation.random_example(dim_state=(3,), dim_action=(2,)))
+    return memory
+
+
+def test_sample_heads(num_steps):
+    memory = create_ber(100, num_steps, 150)
+    observation, idx = memory.sample_heads(32)
+    assert observation.state.shape == (5, 32, max(1, num_steps), 3)
+    assert idx.shape == (5, 32)
+    assert (memory.valid[idx] == 1).all()
+    # Every head only samples the rows of its bootstrap data set.
+    assert (memory.weights[idx, torch.arange(5).unsqueeze(-1)] > 0).all()
+
+
+def test_sample_heads_empty_mask():
+    memory = create_ber(100, 0, 50, num_bootstraps=2)
+    memory.weights[:, 0] = 0
+    observation, idx = memory.sample_heads(32)
+    assert (memory.valid[idx[0]] == 1).all()
+    assert (memory.weights[idx[1], 1] > 0).all()
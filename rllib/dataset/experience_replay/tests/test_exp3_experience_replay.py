@@ -0,0 +1,50 @@
+import pytest
+import torch
+
+from rllib.dataset import EXP3ExperienceReplay
+from rllib.dataset.datatypes import Observation
+
+
+@pytest.fixture(params=[0, 2])
+def num_steps(request):
+    return request.param
+
+
+def create_exp3(max_len, num_steps, num_transitions):
+    memory = EXP3ExperienceReplay(max_len=max_len, num_steps=num_steps)
+    for _ in range(num_transitions):
+        memory.append(Observation.random_example(dim_state=(3,), dim_action=(2,)))
+    return memory
+
+
+def test_sample_batch(num_steps):
+    memory = create_exp3(100, num_steps, 150)
+    observation, idx, weight = memory.sample_batch(32)
+    assert observation.state.shape == (32, max(1, num_steps), 3)
+    assert (memory.valid[idx] == 1).all()
+    torch.testing.assert_allclose(weight, torch.ones(32))
+
+
+def test_probabilities(num_steps):
+    memory = create_exp3(100, num_steps, 150)
+    for _ in range(10):
+        observation, idx, weight = memory.sample_batch(32)
+        memory.update(idx, torch.randn(32))
+
+    valid = memory.valid.bool()
+    priorities = memory.priorities[valid]
+    beta = memory.beta()
+    expected = (1 - beta) * torch.softmax(priorities, 0) + beta / valid.sum()
+    torch.testing.assert_allclose(memory.probabilities[valid], expected)
+    torch.testing.assert_allclose(memory.probabilities.sum(), torch.tensor(1.0))
+    assert (memory.probabilities[~valid] == 0).all()
+
+
+def test_large_priorities():
+    memory = create_exp3(100, 0, 50)
+    idx = memory.valid_indexes[:2]
+    memory.update(idx, torch.tensor([1e3, 2e3]))
+    assert memory._reference == memory.max_priority
+    observation, idx, weight = memory.sample_batch(64)
+    assert torch.isfinite(weight).all()
+    assert (memory.valid[idx] == 1).all()
@@ -1,5 +1,6 @@
 import numpy as np
 import pytest
+import torch
 
 from rllib.dataset import ExperienceReplay
 from rllib.dataset.datatypes import Observation
@@ -9,6 +10,7 @@ from rllib.dataset.transforms import (
     RewardClipper,
     StateNormalizer,
 )
+from rllib.dataset.utilities import stack_list_of_tuples
 from rllib.environment import GymEnvironment
 from rllib.util.rollout import step_env
 
@@ -123,6 +125,45 @@ class TestExperienceReplay(object):
 
         self._test_sample_batch(memory, batch_size, num_steps)
 
+    def test_sample_batch_equals_get_item(self, discrete, max_len, num_steps):
+        num_episodes = 3
+        episode_length = 200
+        memory = create_er_from_episodes(
+            discrete, max_len, num_steps, num_episodes, episode_length
+        )
+        observation, idx, weight = memory.sample_batch(batch_size=32)
+        for i, index in enumerate(idx):
+            observation_, idx_, weight_ = memory[index.item()]
+            assert idx_ == index
+            assert weight_ == weight[i]
+            assert Observation(*[x[i] for x in observation]) == Observation(
+                **observation_
+            )
+
+    def test_sample_batches(self, discrete, max_len, num_steps):
+        memory = create_er_from_episodes(discrete, max_len, num_steps, 3, 200)
+        batches = memory.sample_batches(num_batches=5, batch_size=32)
+        assert len(batches) == 5
+        for observation, idx, weight in batches:
+            for attribute in observation:
+                assert attribute.shape[:2] == (32, max(1, num_steps))
+            assert idx.shape == (32,)
+            assert weight.shape == (32,)
+            assert (memory.valid[idx] == 1).all()
+
+            for i, index in enumerate(idx):
+                observation_, idx_, weight_ = memory[index.item()]
+                assert Observation(*[x[i] for x in observation]) == Observation(
+                    **observation_
+                )
+
+        # All the batches are views of the same block.
+        state = batches[0][0].state
+        assert all(
+            batch[0].state.storage().data_ptr() == state.storage().data_ptr()
+            for batch in batches
+        )
+
     def test_reset(self, discrete, max_len, num_steps):
         num_episodes = 3
         episode_length = 200
@@ -137,13 +178,13 @@ class TestExperienceReplay(object):
             assert len(memory.valid_indexes) < len(memory)
 
             assert memory.ptr != 0
-        assert not np.all(memory.memory == np.full((max_len,), None))
+        assert memory.memory is not None
 
         memory.reset()
         assert memory.data_count == 0
         assert len(memory.valid_indexes) == 0
         assert memory.ptr == 0
-        assert np.all(memory.memory == np.full((max_len,), None))
+        assert memory.memory is None
 
     def test_end_episode(self, discrete, dim_state, dim_action, max_len, num_steps):
         num_transitions = 200
@@ -188,7 +229,9 @@ class TestExperienceReplay(object):
         assert memory.valid[(memory.ptr - 2) % max_len] == 1
         for i in range(num_steps):
             assert memory.valid[(memory.ptr + i) % max_len] == 0
-        assert memory.memory[(memory.ptr - 1) % max_len] is not observation
+        stored_observation = memory._gather((memory.ptr - 1) % max_len)
+        assert stored_observation == observation
+        assert stored_observation.state is not observation.state
 
     def test_len(self, discrete, dim_state, dim_action, max_len, num_steps):
         num_transitions = 200
@@ -290,6 +333,248 @@ class TestExperienceReplay(object):
         assert memory.num_steps == 2
         self._test_sample_batch(memory, 10, 2)
 
+    @pytest.mark.parametrize("deduplicate_next_state", [False, True])
+    def test_extend(self, dim_state, max_len, num_steps, deduplicate_next_state):
+        memory, extended_memory = [
+            ExperienceReplay(
+                max_len,
+                num_steps=num_steps,
+                transformations=[StateNormalizer()],
+                deduplicate_next_state=deduplicate_next_state,
+            )
+            for _ in range(2)
+        ]
+        for _ in range(4):
+            state = torch.randn(dim_state)
+            observations = []
+            for _ in range(40):
+                observation = Observation.random_example(dim_state=(dim_state,))
+                observation.state = state
+                state = observation.next_state
+                observations.append(observation)
+            episode_ends = torch.zeros(40, dtype=torch.bool)
+            episode_ends[[9, 39]] = True
+
+            # Stack them first, as `append' transforms the observations in place.
+            extended_memory.extend(
+                stack_list_of_tuples(observations), episode_ends=episode_ends
+            )
+            for observation, end in zip(observations, episode_ends):
+                memory.append(observation)
+                if end:
+                    memory.end_episode()
+
+        assert extended_memory.data_count == memory.data_count
+        assert (extended_memory.valid == memory.valid).all()
+        valid = memory.valid.bool()
+        assert (extended_memory.episode_ids[valid] == memory.episode_ids[valid]).all()
+        for x, y in zip(extended_memory.all_raw, memory.all_raw):
+            torch.testing.assert_allclose(x, y, equal_nan=True)
+        torch.testing.assert_allclose(
+            extended_memory.transformations[0]._normalizer.mean,
+            memory.transformations[0]._normalizer.mean,
+        )
+
+    def test_extend_batch_shape(self, dim_state, max_len, num_steps):
+        memory = ExperienceReplay(max_len, num_steps=num_steps)
+        observation = stack_list_of_tuples(
+            [Observation.random_example(dim_state=(dim_state,)) for _ in range(5)]
+        )
+        observation.reward = observation.reward.unsqueeze(-1)
+        with pytest.raises(ValueError):
+            memory.extend(observation)
+
+        observation.reward = observation.reward.squeeze(-1)
+        observation.done = torch.tensor(False)  # Shared by all the observations.
+        memory.extend(observation)
+        assert memory.data_count == 5
+        assert memory.memory.state.shape == (max_len, dim_state)
+
+    def test_from_other(self, dim_state, max_len, num_steps):
+        memory = ExperienceReplay(max_len, num_steps=num_steps)
+        for _ in range(5):
+            for _ in range(30):
+                memory.append(Observation.random_example(dim_state=(dim_state,)))
+            memory.end_episode()
+
+        for new_num_steps in [0, 3]:
+            # Append the rows one at a time, from the oldest one.
+            reference = ExperienceReplay(max_len, num_steps=new_num_steps)
+            for i in range(max_len):
+                idx = (memory.ptr + i) % max_len
+                if memory.valid[idx]:
+                    reference.append(memory._gather(idx))
+                elif i > 0 and memory.valid[idx - 1]:
+                    reference.end_episode()
+
+            new = ExperienceReplay.from_other(memory, num_steps=new_num_steps)
+            other = ExperienceReplay.from_other(memory)
+            other.num_steps = new_num_steps
+            for new_memory in [new, other]:
+                assert new_memory.data_count == reference.data_count
+                assert (new_memory.valid == reference.valid).all()
+                for x, y in zip(new_memory.all_raw, reference.all_raw):
+                    torch.testing.assert_allclose(x, y)
+
+    @pytest.mark.parametrize("episode_open", [False, True])
+    def test_sample_sequences(self, max_len, num_steps, episode_open):
+        # The states hold the episode and the step of each transition.
+        memory = ExperienceReplay(max_len, num_steps=num_steps)
+        lengths = [30, 5, 50, 20] * 3 + [max_len + 20]
+        for episode, length in enumerate(lengths):
+            for step in range(length):
+                observation = Observation.random_example(dim_state=(2,))
+                observation.state = torch.tensor([episode, step]).float()
+                memory.append(observation)
+            if episode < len(lengths) - 1 or not episode_open:
+                memory.end_episode()
+
+        observation, idx, weight, mask = memory.sample_sequences(64, 12)
+        assert observation.state.shape == (64, 12, 2)
+        assert mask.shape == (64, 12)
+        assert idx.shape == weight.shape == (64,)
+
+        episode, step = memory.memory.state[idx].long().t()
+        offsets = torch.arange(12)
+        # The windows of the last episode end at the newest transition, even if it
+        # fills the buffer and the next row has the same episode.
+        end = torch.tensor(lengths)[episode].unsqueeze(-1)
+        expected_mask = step.unsqueeze(-1) + offsets < end
+        assert (mask == expected_mask).all()
+        expected_state = torch.stack(
+            [episode.unsqueeze(-1).expand(-1, 12), step.unsqueeze(-1) + offsets], -1
+        ).float()
+        expected_state[~mask] = 0
+        torch.testing.assert_allclose(observation.state, expected_state)
+
+    def test_split_views(self, dim_state, max_len, num_steps):
+        memory = create_er_from_transitions(
+            False, dim_state, 2, max_len, num_steps, 150
+        )
+        train, test = memory.split(ratio=0.8, views=True)
+        assert train.memory is memory.memory
+        assert test.memory is memory.memory
+        assert (train.valid * test.valid == 0).all()
+        assert (train.valid + test.valid == memory.valid).all()
+        for dataset in [train, test]:
+            # The views hold the valid rows of the source at the same indexes.
+            observation = memory._gather(dataset.valid_indexes)
+            for x, y in zip(dataset.all_data, observation):
+                torch.testing.assert_allclose(x, y, equal_nan=True)
+
+    def test_memory_columns(self, discrete, dim_state, dim_action, max_len, num_steps):
+        memory = ExperienceReplay(max_len, num_steps=num_steps)
+        assert memory.memory is None
+
+        memory = create_er_from_transitions(
+            discrete, dim_state, dim_action, max_len, num_steps, 200
+        )
+        for column in memory.memory:
+            assert column.shape[0] == max_len
+
+        if discrete:
+            assert memory.memory.state.shape == (max_len,)
+        else:
+            assert memory.memory.state.shape == (max_len, dim_state)
+            assert memory.memory.action.shape == (max_len, dim_action)
+
+        idx = memory.valid_indexes[-1]
+        observation = memory._gather(idx)
+        for attribute, column in zip(observation, memory.memory):
+            assert (attribute == column[idx]).all() or attribute.isnan().all()
+
+    def test_save_load(self, tmp_path, discrete, dim_state, max_len, num_steps):
+        memory = create_er_from_transitions(
+            discrete, dim_state, 2, max_len, num_steps, 200
+        )
+        memory.end_episode()
+        path = memory.save(str(tmp_path / "memory"))
+
+        new_memory = ExperienceReplay(max_len, num_steps=num_steps)
+        new_memory.load(path)
+        assert new_memory.data_count == memory.data_count
+        assert new_memory.num_steps == memory.num_steps
+        assert (new_memory.valid == memory.valid).all()
+        assert (new_memory.weights == memory.weights).all()
+        for x, y in zip(new_memory.all_raw, memory.all_raw):
+            torch.testing.assert_allclose(x, y, equal_nan=True)
+        self._test_sample_batch(new_memory, 10, num_steps)
+
+        # Appending to a loaded buffer does not modify the snapshot.
+        new_memory.append(memory._gather(memory.valid_indexes[0]))
+        new_memory.save(path)
+        new_memory.load(path)
+        assert new_memory.data_count == memory.data_count + 1
+
+        with pytest.raises(ValueError):
+            ExperienceReplay(max_len + 1).load(path)
+
+    def test_transformation_cache(self, dim_state, max_len, num_steps):
+        normalizer = StateNormalizer()
+        memory = ExperienceReplay(
+            max_len, transformations=[normalizer], num_steps=num_steps
+        )
+        for _ in range(200):
+            memory.append(Observation.random_example(dim_state=(dim_state,)))
+        memory.end_episode()
+
+        def _assert_equal_uncached():
+            indexes = memory.valid_indexes
+            observation = memory._get_observation(indexes)
+            raw = memory._get_consecutive_observations(indexes, num_steps)
+            for x, y in zip(observation, normalizer(raw)):
+                torch.testing.assert_allclose(x, y, equal_nan=True)
+
+        # The first read of all the data fills the cache.
+        memory.all_data
+        assert memory._cache is not None
+        _assert_equal_uncached()
+
+        # New rows are transformed lazily.
+        memory.append(Observation.random_example(dim_state=(dim_state,)))
+        assert len(memory._dirty_rows) == 1
+        _assert_equal_uncached()
+        assert len(memory._dirty_rows) == 0
+
+        # Updating the transformation invalidates the cache.
+        version = normalizer.version
+        normalizer.update(Observation.random_example(dim_state=(dim_state,)))
+        assert normalizer.version > version
+        _assert_equal_uncached()
+        memory.all_data
+        _assert_equal_uncached()
+
+    def test_deduplicate_next_state(self, dim_state, max_len, num_steps):
+        memory = ExperienceReplay(max_len, num_steps=num_steps)
+        dedup_memory = ExperienceReplay(
+            max_len, num_steps=num_steps, deduplicate_next_state=True
+        )
+        for episode in range(3):
+            state = torch.randn(dim_state)
+            for _ in range(50):
+                observation = Observation.random_example(dim_state=(dim_state,))
+                observation.state = state
+                state = observation.next_state
+                memory.append(observation)
+                dedup_memory.append(observation)
+            # The next state of the last transition takes one extra row.
+            if episode == 0:
+                memory.end_episode()
+                dedup_memory.end_episode()
+                if num_steps == 0:
+                    memory.append_invalid()
+            else:  # A broken trajectory without end_episode.
+                memory.append_invalid()
+
+        assert dedup_memory.memory.next_state is dedup_memory.memory.state
+        assert (dedup_memory.valid == memory.valid).all()
+
+        indexes = memory.valid_indexes
+        observation = memory._get_observation(indexes)
+        dedup_observation = dedup_memory._get_observation(indexes)
+        for x, y in zip(observation, dedup_observation):
+            torch.testing.assert_allclose(x, y, equal_nan=True)
+
     def test_append_error(self):
         memory = ExperienceReplay(max_len=100)
         with pytest.raises(TypeError):
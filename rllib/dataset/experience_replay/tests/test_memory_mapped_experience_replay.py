@@ -0,0 +1,79 @@
+import os
+import pickle
+
+import pytest
+import torch
+
+from rllib.dataset import ExperienceReplay, MemoryMappedExperienceReplay
+from rllib.dataset.datatypes import Observation
+
+
+@pytest.fixture(params=[0, 2])
+def num_steps(request):
+    return request.param
+
+
+def fill(memory, num_transitions, episode_length=20):
+    for i in range(num_transitions):
+        memory.append(Observation.random_example(dim_state=(3,), dim_action=(2,)))
+        if (i + 1) % episode_length == 0:
+            memory.end_episode()
+
+
+def test_memory_in_files(tmp_path, num_steps):
+    path = str(tmp_path / "memory")
+    memory = MemoryMappedExperienceReplay(path=path, max_len=50, num_steps=num_steps)
+    fill(memory, 70)
+    assert os.path.exists(f"{path}/state.npy")
+    assert os.path.exists(f"{path}/valid.npy")
+
+    observation, idx, weight = memory.sample_batch(16)
+    assert observation.state.shape == (16, max(1, num_steps), 3)
+    assert idx.shape == (16,)
+    assert weight.shape == (16,)
+
+
+def test_same_as_experience_replay(tmp_path, num_steps):
+    memory = ExperienceReplay(max_len=50, num_steps=num_steps)
+    mmap_memory = MemoryMappedExperienceReplay(
+        path=str(tmp_path), max_len=50, num_steps=num_steps
+    )
+    for i in range(70):
+        observation = Observation.random_example(dim_state=(3,), dim_action=(2,))
+        memory.append(observation)
+        mmap_memory.append(observation)
+
+    assert memory.data_count == mmap_memory.data_count
+    assert (memory.valid == mmap_memory.valid).all()
+    for x, y in zip(memory.all_data, mmap_memory.all_data):
+        torch.testing.assert_allclose(x, y, equal_nan=True)
+
+
+def test_reopen(tmp_path, num_steps):
+    path = str(tmp_path)
+    memory = MemoryMappedExperienceReplay(path=path, max_len=50, num_steps=num_steps)
+    fill(memory, 70)
+    memory.flush()
+
+    reopened = MemoryMappedExperienceReplay(path=path, max_len=50)
+    assert reopened.data_count == memory.data_count
+    assert reopened.num_steps == num_steps
+    assert (reopened.valid == memory.valid).all()
+    torch.testing.assert_allclose(reopened.all_raw.state, memory.all_raw.state)
+
+    with pytest.raises(ValueError):
+        MemoryMappedExperienceReplay(path=path, max_len=100)
+
+
+def test_pickle(tmp_path):
+    memory = MemoryMappedExperienceReplay(path=str(tmp_path), max_len=10000)
+    fill(memory, 30)
+    state = memory.all_raw.state.clone()
+
+    serialized = pickle.dumps(memory)
+    column = memory.memory.state
+    assert len(serialized) < column.numel() * column.element_size()
+
+    memory = pickle.loads(serialized)
+    assert len(memory) == 30
+    torch.testing.assert_allclose(memory.all_raw.state, state)
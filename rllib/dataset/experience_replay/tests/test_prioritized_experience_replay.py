@@ -0,0 +1,120 @@
+import pytest
+import torch
+
+from rllib.dataset import PrioritizedExperienceReplay
+from rllib.dataset.datatypes import Observation
+from rllib.dataset.utilities import stack_list_of_tuples
+
+
+@pytest.fixture(params=[0, 2])
+def num_steps(request):
+    return request.param
+
+
+def create_per(max_len, num_steps, num_transitions):
+    memory = PrioritizedExperienceReplay(max_len=max_len, num_steps=num_steps)
+    for _ in range(num_transitions):
+        memory.append(Observation.random_example(dim_state=(3,), dim_action=(2,)))
+    return memory
+
+
+def test_sample_batch(num_steps):
+    memory = create_per(100, num_steps, 150)
+    observation, idx, weight = memory.sample_batch(32)
+    assert observation.state.shape == (32, max(1, num_steps), 3)
+    assert idx.shape == (32,)
+    assert weight.shape == (32,)
+    assert (memory.valid[idx] == 1).all()
+    torch.testing.assert_allclose(weight, torch.ones(32))
+
+
+def test_sample_batches(num_steps):
+    memory = create_per(100, num_steps, 150)
+    batches = memory.sample_batches(5, 32)
+    assert len(batches) == 5
+    for observation, idx, weight in batches:
+        assert observation.state.shape == (32, max(1, num_steps), 3)
+        assert idx.shape == (32,)
+        assert weight.shape == (32,)
+        assert (memory.valid[idx] == 1).all()
+
+
+def test_update(num_steps):
+    memory = create_per(100, num_steps, 150)
+    idx = memory.valid_indexes[:10]
+    memory.update(idx, torch.zeros(10))
+    priority = memory.epsilon ** memory.alpha()
+    torch.testing.assert_allclose(memory.priorities[idx], priority.expand(10))
+    torch.testing.assert_allclose(memory._min_tree.min.float(), priority)
+
+    observation, idx, weight = memory.sample_batch(1000)
+    assert (weight <= 1.0 + 1e-6).all()
+    assert (memory.valid[idx] == 1).all()
+
+
+def test_num_steps_keeps_priorities(num_steps):
+    def _priorities_by_age():
+        order = (memory.ptr + torch.arange(memory.max_len)) % memory.max_len
+        return memory.priorities[order[memory.valid[order].bool()]]
+
+    memory = create_per(100, num_steps, 150)
+    memory.update(memory.valid_indexes, torch.rand(len(memory.valid_indexes)))
+    priorities = _priorities_by_age()
+    memory.num_steps = 1
+    kept = _priorities_by_age()
+    torch.testing.assert_allclose(kept, priorities[-len(kept) :])
+    torch.testing.assert_allclose(
+        memory._sum_tree.total.float(), memory.priorities.sum()
+    )
+
+
+def test_split(num_steps):
+    memory = create_per(100, num_steps, 150)
+    for views in [False, True]:
+        train, test = memory.split(ratio=0.8, views=views)
+        for dataset in [train, test]:
+            idx = dataset.valid_indexes
+            torch.testing.assert_allclose(
+                dataset.priorities[idx], memory.priorities[idx]
+            )
+            observation, idx, weight = dataset.sample_batch(16)
+            assert (dataset.valid[idx] == 1).all()
+
+
+def test_extend(num_steps):
+    memory = create_per(100, num_steps, 50)
+    observations = [
+        Observation.random_example(dim_state=(3,), dim_action=(2,)) for _ in range(80)
+    ]
+    memory.extend(stack_list_of_tuples(observations))
+    assert memory.data_count == 130
+    torch.testing.assert_allclose(
+        memory.priorities, memory.max_priority * memory.valid
+    )
+    torch.testing.assert_allclose(
+        memory._sum_tree.total.float(), memory.priorities.sum()
+    )
+
+
+def test_invalid_transitions_have_zero_priority():
+    memory = create_per(100, 2, 50)
+    memory.end_episode()
+    invalid = (memory.valid == 0).nonzero(as_tuple=False).squeeze(-1)
+    assert (memory.priorities[invalid] == 0).all()
+    torch.testing.assert_allclose(
+        memory._sum_tree.total.float(), memory.priorities.sum()
+    )
+
+
+def test_save_load(tmp_path, num_steps):
+    memory = create_per(100, num_steps, 150)
+    idx = memory.valid_indexes[:10]
+    memory.update(idx, torch.rand(10))
+    path = memory.save(str(tmp_path))
+
+    new_memory = PrioritizedExperienceReplay(max_len=100)
+    new_memory.load(path)
+    assert new_memory.num_steps == num_steps
+    torch.testing.assert_allclose(new_memory.priorities, memory.priorities)
+    torch.testing.assert_allclose(new_memory._sum_tree.total, memory._sum_tree.total)
+    torch.testing.assert_allclose(new_memory._min_tree.min, memory._min_tree.min)
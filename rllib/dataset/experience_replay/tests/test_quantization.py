@@ -0,0 +1,105 @@
+import pytest
+import torch
+
+from rllib.dataset import (
+    AffineQuantizer,
+    ExperienceReplay,
+    MemoryMappedExperienceReplay,
+    reduced_precision_storage,
+)
+from rllib.dataset.datatypes import Observation
+
+
+@pytest.fixture(params=[torch.float16, torch.bfloat16, torch.uint8])
+def state_dtype(request):
+    return request.param
+
+
+@pytest.fixture(params=[0, 2])
+def num_steps(request):
+    return request.param
+
+
+def create_er(max_len, num_steps, num_transitions, storage_dtypes=None):
+    memory = ExperienceReplay(
+        max_len, num_steps=num_steps, storage_dtypes=storage_dtypes
+    )
+    for _ in range(num_transitions):
+        memory.append(Observation.random_example(dim_state=(8,), dim_action=(2,)))
+    return memory
+
+
+class TestAffineQuantizer(object):
+    def test_error(self):
+        quantizer = AffineQuantizer(low=-2.0, high=2.0)
+        column = torch.zeros(100, 3, dtype=quantizer.dtype)
+        value = torch.rand(100, 3) * 4 - 2
+        quantizer.write(column, torch.arange(100), value)
+        error = (quantizer.dequantize(column) - value).abs()
+        assert (error <= quantizer.scale / 2 + 1e-6).all()
+
+    def test_widen(self):
+        quantizer = AffineQuantizer()
+        column = torch.zeros(10, 2, dtype=quantizer.dtype)
+        value = torch.randn(10, 2)
+        for i in range(10):
+            quantizer.write(column, i, value[i])
+        assert (quantizer.low <= value.min(0)[0]).all()
+        assert (quantizer.high >= value.max(0)[0]).all()
+        error = (quantizer.dequantize(column) - value).abs()
+        assert (error <= 4 * quantizer.scale).all()
+
+
+class TestReducedPrecisionStorage(object):
+    def test_columns(self, state_dtype, num_steps):
+        memory = create_er(100, num_steps, 50, reduced_precision_storage(state_dtype))
+        assert memory.memory.state.dtype == state_dtype
+        assert memory.memory.next_state.dtype == state_dtype
+        assert memory.memory.reward.dtype == torch.float16
+        assert memory.memory.done.dtype == torch.bool
+        assert memory.memory.action.dtype == torch.get_default_dtype()
+
+        observation, idx, weight = memory.sample_batch(16)
+        for attribute in observation:
+            assert attribute.dtype == torch.get_default_dtype()
+
+    def test_accuracy(self, state_dtype, num_steps):
+        torch.manual_seed(0)
+        full = create_er(100, num_steps, 50)
+        torch.manual_seed(0)
+        reduced = create_er(
+            100, num_steps, 50, reduced_precision_storage(state_dtype, -6.0, 6.0)
+        )
+        indexes = full.valid_indexes
+        observation = full._get_observation(indexes)
+        reduced_observation = reduced._get_observation(indexes)
+        for x, y in zip(observation, reduced_observation):
+            torch.testing.assert_allclose(x, y, rtol=5e-2, atol=5e-2, equal_nan=True)
+
+    def test_save_load(self, tmp_path, state_dtype, num_steps):
+        memory = create_er(100, num_steps, 50, reduced_precision_storage(state_dtype))
+        path = memory.save(str(tmp_path / "memory"))
+
+        new_memory = ExperienceReplay(100, num_steps=num_steps)
+        new_memory.load(path)
+        assert new_memory.memory.state.dtype == state_dtype
+        for x, y in zip(new_memory.all_raw, memory.all_raw):
+            torch.testing.assert_allclose(x, y, equal_nan=True)
+
+    def test_memory_mapped(self, tmp_path, state_dtype, num_steps):
+        memory = MemoryMappedExperienceReplay(
+            path=str(tmp_path / "memory"),
+            max_len=100,
+            num_steps=num_steps,
+            storage_dtypes=reduced_precision_storage(state_dtype),
+        )
+        for _ in range(50):
+            memory.append(Observation.random_example(dim_state=(8,), dim_action=(2,)))
+        memory.flush()
+
+        new_memory = MemoryMappedExperienceReplay(
+            path=str(tmp_path / "memory"), max_len=100, num_steps=num_steps
+        )
+        assert new_memory.memory.state.dtype == state_dtype
+        for x, y in zip(new_memory.all_raw, memory.all_raw):
+            torch.testing.assert_allclose(x, y, equal_nan=True)
@@ -0,0 +1,49 @@
+import pytest
+import torch
+
+from rllib.dataset.experience_replay.segment_tree import MinTree, SumTree
+
+
+@pytest.fixture(params=[1, 7, 64, 100])
+def capacity(request):
+    return request.param
+
+
+def test_sum_tree(capacity):
+    tree = SumTree(capacity)
+    values = torch.rand(capacity)
+    tree[torch.arange(capacity)] = values
+    torch.testing.assert_allclose(tree.total, values.sum().double())
+    torch.testing.assert_allclose(tree.values, values.double())
+
+    tree[0] = 10.0
+    torch.testing.assert_allclose(tree.total, values[1:].sum().double() + 10.0)
+
+
+def test_min_tree(capacity):
+    tree = MinTree(capacity)
+    assert tree.min == float("inf")
+    values = torch.rand(capacity)
+    tree[torch.arange(capacity)] = values
+    torch.testing.assert_allclose(tree.min, values.min().double())
+
+    tree[capacity - 1] = -1.0
+    assert tree.min == -1.0
+
+
+def test_find_prefix_sum_idx(capacity):
+    tree = SumTree(capacity)
+    tree[torch.arange(capacity)] = torch.ones(capacity)
+    prefix_sum = torch.arange(capacity) + 0.5
+    assert (tree.find_prefix_sum_idx(prefix_sum) == torch.arange(capacity)).all()
+
+
+def test_sample_skips_zero_values(capacity):
+    tree = SumTree(capacity)
+    values = torch.zeros(capacity)
+    values[::2] = 1.0
+    tree[torch.arange(capacity)] = values
+    idx = tree.sample(1000)
+    assert idx.shape == (1000,)
+    assert (values[idx] > 0).all()
+    assert (idx < capacity).all()
@@ -0,0 +1,117 @@
+import pytest
+import torch
+
+from rllib.dataset import SharedMemoryExperienceReplay
+from rllib.dataset.datatypes import Observation
+
+
+@pytest.fixture(params=[0, 2])
+def num_steps(request):
+    return request.param
+
+
+def example():
+    return Observation.random_example(dim_state=(3,), dim_action=(2,))
+
+
+def collect(memory, num_transitions, episode_length=7):
+    for i in range(num_transitions):
+        observation = example()
+        observation.state[:] = memory.rank + 1  # Zero only in the padding.
+        memory.append(observation)
+        if i % episode_length == episode_length - 1:
+            memory.end_episode()
+
+
+def create_er(num_steps, num_actors=2):
+    memory = SharedMemoryExperienceReplay(
+        max_len=40 * num_actors, num_actors=num_actors, num_steps=num_steps
+    )
+    memory.allocate(example())
+    return memory
+
+
+def test_actors(num_steps):
+    memory = create_er(num_steps)
+    for rank in range(2):
+        collect(memory.actor(rank), 30 + 20 * rank)
+
+    assert memory.data_count == 30 + 50 + (30 // 7 + 50 // 7) * num_steps
+    assert len(memory) == min(30 + 30 // 7 * num_steps, 40) + 40
+    assert not memory.is_full
+
+    valid = memory.valid_indexes
+    for rank in range(2):
+        in_segment = valid // memory.segment_len == rank
+        assert (memory.memory.state[valid[in_segment]] == rank + 1).all()
+
+    observation, idx, weight = memory.sample_batch(64)
+    assert observation.state.shape == (64, max(1, num_steps), 3)
+    for i in range(max(1, num_steps)):  # Windows do not cross the segments.
+        state = observation.state[:, i]
+        rank = (idx // memory.segment_len + 1).unsqueeze(-1).float()
+        assert ((state == rank) | (state == 0)).all()
+
+
+def test_processes(num_steps):
+    memory = create_er(num_steps)
+    context = torch.multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=collect, args=(memory.actor(rank), 30))
+        for rank in range(2)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert memory.data_count == 2 * (30 + 30 // 7 * num_steps)
+    assert len(memory.valid_indexes) == 60
+    observation, idx, weight = memory.sample_batch(16)
+    assert observation.state.shape == (16, max(1, num_steps), 3)
+
+
+def collect_counter(memory, num_transitions):
+    for i in range(num_transitions):
+        observation = example()
+        value = memory.rank * num_transitions + i + 1
+        for field in (observation.state, observation.reward, observation.next_state):
+            field[...] = value
+        memory.append(observation)
+
+
+def test_sample_while_writing(num_steps):
+    memory = create_er(num_steps)
+    context = torch.multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=collect_counter, args=(memory.actor(rank), 5000))
+        for rank in range(2)
+    ]
+    for process in processes:
+        process.start()
+    while len(memory) == 0:
+        pass
+
+    while any(process.is_alive() for process in processes):
+        batch = memory.sample_batch(16)[0]
+        sequences = memory.sample_sequences(16, 3)[0]
+        for observation in (batch, sequences):
+            state = observation.state
+            assert (observation.next_state == state).all()
+            assert (observation.reward.unsqueeze(-1) == state).all()
+    for process in processes:
+        process.join()
+
+
+def test_errors():
+    memory = create_er(0)
+    with pytest.raises(RuntimeError):
+        memory.append(example())
+    with pytest.raises(RuntimeError):
+        memory.extend(example())
+    with pytest.raises(RuntimeError):
+        memory.num_steps = 1
+    with pytest.raises(RuntimeError):
+        memory.split()
+    with pytest.raises(ValueError):
+        SharedMemoryExperienceReplay(max_len=11, num_actors=2)
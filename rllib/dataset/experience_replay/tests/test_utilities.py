@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+import torch
+
+from rllib.dataset import ExperienceReplay, StateExperienceReplay
+from rllib.dataset.datatypes import Observation
+from rllib.dataset.experience_replay.utilities import (
+    init_er_from_files,
+    sample_initial_states,
+)
+from rllib.dataset.transforms import StateNormalizer
+
+
+@pytest.fixture(params=[0, 2])
+def num_steps(request):
+    return request.param
+
+
+@pytest.fixture(params=[1, 7, 1000])
+def chunk_size(request):
+    return request.param
+
+
+def create_dataset(num_transitions=100, dim_state=3, dim_action=2):
+    state = np.random.randn(num_transitions, dim_state)
+    episode_ends = np.zeros(num_transitions, dtype=np.bool_)
+    episode_ends[[end for end in (19, 49, 99) if end < num_transitions]] = True
+    return {
+        "state": state,
+        "action": np.random.randn(num_transitions, dim_action),
+        "reward": np.random.randn(num_transitions),
+        "next_state": state + 0.1,
+        "done": np.zeros(num_transitions),
+        "episode_ends": episode_ends,
+    }
+
+
+def test_npz(tmp_path, num_steps, chunk_size):
+    arrays = create_dataset()
+    np.savez(tmp_path / "dataset.npz", **arrays)
+    memory = ExperienceReplay(1000, num_steps=num_steps)
+    statistics = init_er_from_files(
+        memory, str(tmp_path / "dataset.npz"), chunk_size=chunk_size
+    )
+    assert statistics["num_transitions"] == 100
+    assert statistics["transitions_per_second"] > 0
+
+    assert len(memory.valid_indexes) == 100
+    assert memory.data_count == 100 + 3 * num_steps
+    torch.testing.assert_allclose(
+        memory.all_raw.state, torch.tensor(arrays["state"]).float()
+    )
+    assert len(torch.unique(memory.episode_ids[memory.valid_indexes])) == 3
+
+
+def test_npy_directory(tmp_path, num_steps, chunk_size):
+    arrays = create_dataset()
+    for name, array in arrays.items():
+        np.save(tmp_path / f"{name}.npy", array)
+    np.savez(tmp_path / "shard.npz", **create_dataset(50))
+    memory = ExperienceReplay(1000, num_steps=num_steps)
+    statistics = init_er_from_files(
+        memory, str(tmp_path), chunk_size=chunk_size, keys={"episode_ends": "none"}
+    )
+    assert statistics["num_transitions"] == 150
+
+    # The .npy files are read first and each file ends an episode.
+    assert memory.data_count == 150 + 2 * num_steps
+    torch.testing.assert_allclose(
+        memory.all_raw.reward[:100], torch.tensor(arrays["reward"]).float()
+    )
+
+
+def test_subsample_shuffle(tmp_path, num_steps, chunk_size):
+    arrays = create_dataset(1000)
+    arrays["reward"] = np.arange(1000.0)
+    np.savez(tmp_path / "dataset.npz", **arrays)
+
+    memory = ExperienceReplay((1 + num_steps) * 1000, num_steps=num_steps)
+    init_er_from_files(
+        memory, str(tmp_path / "dataset.npz"), chunk_size=chunk_size, subsample=0.5
+    )
+    reward = memory.all_raw.reward.flatten()
+    assert 300 < len(reward) < 700
+    assert (reward[1:] > reward[:-1]).all()
+    ids = memory.episode_ids[memory.valid_indexes]
+    continues = (reward[1:] == reward[:-1] + 1) & ~torch.tensor(
+        arrays["episode_ends"]
+    )[reward[:-1].long()]
+    assert ((ids[1:] == ids[:-1]) == continues).all()
+
+    memory = ExperienceReplay((1 + num_steps) * 1000, num_steps=num_steps)
+    init_er_from_files(
+        memory, str(tmp_path / "dataset.npz"), chunk_size=chunk_size, shuffle=True
+    )
+    reward = memory.all_raw.reward.flatten()
+    assert sorted(reward.tolist()) == list(range(1000))
+    assert not (reward[1:] > reward[:-1]).all()
+    assert len(torch.unique(memory.episode_ids[memory.valid_indexes])) == 1000
+
+
+def test_hdf5(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    arrays = create_dataset()
+    with h5py.File(tmp_path / "dataset.h5", "w") as file:
+        for name, array in arrays.items():
+            file.create_dataset(name, data=array)
+    memory = ExperienceReplay(1000)
+    init_er_from_files(memory, str(tmp_path / "dataset.h5"), chunk_size=7, seed=0)
+    assert len(memory.valid_indexes) == 100
+    torch.testing.assert_allclose(
+        memory.all_raw.action, torch.tensor(arrays["action"]).float()
+    )
+
+
+def test_error(tmp_path):
+    with pytest.raises(ValueError):
+        init_er_from_files(ExperienceReplay(10), str(tmp_path / "dataset.csv"))
+
+
+@pytest.mark.parametrize("transformations", [[], [StateNormalizer()]])
+def test_sample_initial_states(transformations):
+    initial_states_dataset = StateExperienceReplay(max_len=100, dim_state=(3,))
+    initial_states_dataset.append(torch.ones(50, 3))
+    initial_distribution = torch.distributions.MultivariateNormal(
+        torch.zeros(3) + 2, torch.eye(3) * 1e-6
+    )
+    memory = ExperienceReplay(100, num_steps=2, transformations=transformations)
+    for _ in range(50):
+        observation = Observation.random_example(dim_state=(3,), dim_action=(2,))
+        observation.state = torch.ones(3) * 3
+        memory.append(observation)
+
+    states = sample_initial_states(
+        initial_states_dataset, 4, initial_distribution, 5, memory, 6
+    )
+    assert states.shape == (15, 3)
+    torch.testing.assert_allclose(states[:4], torch.ones(4, 3))
+    torch.testing.assert_allclose(states[4:9], torch.ones(5, 3) * 2, 0, 1e-2)
+    torch.testing.assert_allclose(states[9:], torch.ones(6, 3) * 3)
+
+    out = torch.empty(6, 3)
+    states = sample_initial_states(memory=memory, num_memory_samples=6, out=out)
+    assert states is out
+    torch.testing.assert_allclose(states, torch.ones(6, 3) * 3)
+    torch.testing.assert_allclose(memory.sample_states(2), torch.ones(2, 3) * 3)
+    assert initial_states_dataset.sample_batch(8).shape == (8, 3)
@@ -1,14 +1,25 @@
 """Utilities for experience replay submodule."""
+import os
+import time
+from dataclasses import fields
 
+import numpy as np
 import torch
+from tqdm import tqdm
 
 from rllib.dataset.datatypes import Observation
+from rllib.dataset.utilities import stack_list_of_tuples
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
 
 
 def init_er_from_er(target_er, source_er):
     """Initialize an Experience Replay from an Experience Replay.
 
-    Copy all the transitions in the source ER to the target ER.
+    Copy all the transitions in the source ER to the target ER, from the oldest one.
 
     Parameters
     ----------
@@ -17,9 +28,11 @@ def init_er_from_er(target_er, source_er):
     source_er: Experience Replay
         Experience replay to be used.
     """
-    for i in range(len(source_er)):
-        observation, idx, weight = source_er[i]
-        target_er.append(Observation(**observation))
+    indexes = (source_er.ptr + torch.arange(source_er.max_len)) % source_er.max_len
+    valid = source_er.valid[indexes].bool()
+    episode_ends = valid & ~torch.cat((valid[1:], torch.ones(1, dtype=torch.bool)))
+    observation = source_er._transform(source_er._gather(indexes[valid]))
+    target_er.extend(observation, episode_ends=episode_ends[valid])
 
 
 def init_er_from_environment(target_er, environment):
@@ -61,6 +74,7 @@ def init_er_from_rollout(target_er, agent, environment, max_steps=1000):
     while not target_er.is_full:
         state = environment.reset()
         done = False
+        trajectory = []
         while not done:
             action = agent.act(state)
             next_state, reward, done, _ = environment.step(action)
@@ -73,9 +87,213 @@ def init_er_from_rollout(target_er, agent, environment, max_steps=1000):
             ).to_torch()
             state = next_state
 
-            target_er.append(observation)
+            trajectory.append(observation)
             if max_steps <= environment.time:
                 break
+        target_er.extend(stack_list_of_tuples(trajectory))
+
+
+def _open_offline_files(path):
+    """Yield the arrays of each file of an offline dataset, keyed by name.
+
+    A directory yields its `.npy' files together, memory-mapped, and then each of its
+    `.npz' and HDF5 files, in alphabetical order.
+    """
+    if os.path.isdir(path):
+        names = sorted(os.listdir(path))
+        arrays = {
+            name[: -len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in names
+            if name.endswith(".npy")
+        }
+        if arrays:
+            yield arrays
+        for name in names:
+            if name.endswith((".npz", ".h5", ".hdf5")):
+                yield from _open_offline_files(os.path.join(path, name))
+    elif path.endswith(".npz"):
+        # The arrays of a `.npz' file are compressed, hence they are read at once.
+        with np.load(path) as file:
+            yield {name: file[name] for name in file.files}
+    elif path.endswith((".h5", ".hdf5")):
+        if h5py is None:
+            raise ImportError("h5py is required to read HDF5 files.")
+        with h5py.File(path, "r") as file:
+            yield file
+    else:
+        raise ValueError(f"{path} is not a directory, a .npz or an HDF5 file.")
+
+
+def init_er_from_files(
+    target_er,
+    path,
+    chunk_size=100000,
+    keys=None,
+    subsample=1.0,
+    shuffle=False,
+    seed=None,
+    progress=False,
+):
+    """Initialize an Experience Replay from an offline dataset.
+
+    The dataset is a `.npz' file, an HDF5 file if h5py is installed, or a directory
+    with `.npy' files and such files. Each file holds one array per Observation
+    field, whose first dimension indexes the transitions, and optionally an array
+    `episode_ends' of boolean flags. The episodes end at these flags, at the done
+    flags and at the end of each file.
+
+    The transitions are read `chunk_size' at a time and each chunk is appended with
+    `extend', which writes it into the columns of the memory at once. The `.npy'
+    files are memory-mapped and the HDF5 datasets read lazily, hence only a chunk is
+    kept in memory. The arrays of a `.npz' file are decompressed at once.
+
+    Parameters
+    ----------
+    target_er: Experience Replay.
+        Experience replay to be filled.
+    path: str.
+        Path of the dataset.
+    chunk_size: int, optional (default=100000).
+        Number of transitions read at a time.
+    keys: dict, optional.
+        Dictionary from the name of an Observation field, or `episode_ends', to the
+        name of its array, for the arrays that are not named after them.
+    subsample: float, optional (default=1.0).
+        Fraction of the transitions, sampled at random, that are appended.
+    shuffle: bool, optional (default=False).
+        Flag that appends the transitions of each file in random order. Then, every
+        transition ends an episode.
+    seed: int, optional.
+        Seed of the subsampling and the shuffling.
+    progress: bool, optional (default=False).
+        Flag that shows a progress bar with the throughput.
+
+    Returns
+    -------
+    statistics: dict.
+        Number of transitions appended, seconds elapsed and transitions per second.
+    """
+    keys = {
+        **{field.name: field.name for field in fields(Observation)},
+        "episode_ends": "episode_ends",
+        **(keys or dict()),
+    }
+    random = np.random.default_rng(seed)
+    start_time = time.time()
+    num_transitions = 0
+    progress_bar = tqdm(unit=" transitions", unit_scale=True, disable=not progress)
+
+    for arrays in _open_offline_files(path):
+        columns = {name: arrays[key] for name, key in keys.items() if key in arrays}
+        rows = np.arange(len(columns["state"]))
+        if subsample < 1:
+            rows = rows[random.random(len(rows)) < subsample]
+        if shuffle:
+            rows = random.permutation(rows)
+
+        for begin in range(0, len(rows), chunk_size):
+            chunk = rows[begin : begin + chunk_size]
+            if shuffle:
+                # Read the rows in order, which HDF5 requires, and shuffle them after.
+                chunk = np.sort(chunk)
+            if chunk[-1] - chunk[0] == len(chunk) - 1:
+                index = slice(chunk[0], chunk[-1] + 1)
+            else:
+                index = chunk
+            data = {name: np.asarray(column[index]) for name, column in columns.items()}
+
+            # An episode also ends before each row that was not subsampled.
+            following = rows[begin + 1 : begin + len(chunk) + 1]
+            episode_ends = np.ones(len(chunk), dtype=np.bool_)
+            if not shuffle:
+                gaps = following != chunk[: len(following)] + 1
+                episode_ends[: len(following)] = gaps
+            episode_ends |= np.asarray(data.pop("episode_ends", False), dtype=np.bool_)
+            episode_ends |= np.asarray(data.get("done", False), dtype=np.bool_)
+
+            if shuffle:
+                order = random.permutation(len(chunk))
+                data = {name: x[order] for name, x in data.items()}
+            target_er.extend(
+                Observation(**data), episode_ends=torch.from_numpy(episode_ends)
+            )
+            num_transitions += len(chunk)
+            progress_bar.update(len(chunk))
+
+    progress_bar.close()
+    elapsed = time.time() - start_time
+    return {
+        "num_transitions": num_transitions,
+        "time": elapsed,
+        "transitions_per_second": num_transitions / max(elapsed, 1e-9),
+    }
+
+
+def sample_initial_states(
+    initial_states_dataset=None,
+    num_initial_state_samples=0,
+    initial_distribution=None,
+    num_initial_distribution_samples=0,
+    memory=None,
+    num_memory_samples=0,
+    out=None,
+):
+    """Sample initial states from a mixture of sources in one call.
+
+    The states are written into a single [num_samples x dim_state] tensor: first
+    the ones sampled from the initial states dataset, then the ones sampled from the
+    initial distribution and last the states of transitions sampled from the memory
+    with `ExperienceReplay.sample_states'.
+
+    Parameters
+    ----------
+    initial_states_dataset: StateExperienceReplay, optional.
+        Empirical initial state distribution.
+    num_initial_state_samples: int, optional (default=0).
+        Number of states sampled from `initial_states_dataset'.
+    initial_distribution: Distribution, optional.
+        Initial state distribution.
+    num_initial_distribution_samples: int, optional (default=0).
+        Number of states sampled from `initial_distribution'.
+    memory: ExperienceReplay, optional.
+        Experience replay of real transitions.
+    num_memory_samples: int, optional (default=0).
+        Number of states sampled from `memory'.
+    out: Tensor, optional.
+        Tensor of shape [num_samples x dim_state] where the states are written.
+
+    Returns
+    -------
+    states: Tensor.
+    """
+    num_samples = (
+        num_initial_state_samples
+        + num_initial_distribution_samples
+        + num_memory_samples
+    )
+    if out is None:
+        if num_initial_state_samples > 0:
+            dim_state = initial_states_dataset.dim_state
+        elif num_initial_distribution_samples > 0:
+            dim_state = initial_distribution.event_shape
+        else:
+            dim_state = memory.memory.state.shape[1:]
+        out = torch.empty((num_samples,) + tuple(dim_state))
+
+    end = num_initial_state_samples
+    if num_initial_state_samples > 0:
+        initial_states_dataset.sample_batch(num_initial_state_samples, out=out[:end])
+
+    begin, end = end, end + num_initial_distribution_samples
+    if num_initial_distribution_samples > 0:
+        out[begin:end] = initial_distribution.sample(
+            (num_initial_distribution_samples,)
+        )
+
+    begin, end = end, end + num_memory_samples
+    if num_memory_samples > 0:
+        out[begin:end] = memory.sample_states(num_memory_samples)
+    return out
 
 
 class MakeRaw(object):
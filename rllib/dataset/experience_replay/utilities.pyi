@@ -1,9 +1,13 @@
-from typing import Any
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from torch import Tensor
+from torch.distributions import Distribution
 
 from rllib.agent import AbstractAgent
 from rllib.environment import AbstractEnvironment
 
 from .experience_replay import ExperienceReplay
+from .state_experience_replay import StateExperienceReplay
 
 def init_er_from_er(
     target_er: ExperienceReplay, source_er: ExperienceReplay
@@ -17,6 +21,26 @@ def init_er_from_rollout(
     environment: AbstractEnvironment,
     max_steps: int = ...,
 ) -> None: ...
+def _open_offline_files(path: str) -> Iterator[Mapping[str, Any]]: ...
+def init_er_from_files(
+    target_er: ExperienceReplay,
+    path: str,
+    chunk_size: int = ...,
+    keys: Optional[Dict[str, str]] = ...,
+    subsample: float = ...,
+    shuffle: bool = ...,
+    seed: Optional[int] = ...,
+    progress: bool = ...,
+) -> Dict[str, float]: ...
+def sample_initial_states(
+    initial_states_dataset: Optional[StateExperienceReplay] = ...,
+    num_initial_state_samples: int = ...,
+    initial_distribution: Optional[Distribution] = ...,
+    num_initial_distribution_samples: int = ...,
+    memory: Optional[ExperienceReplay] = ...,
+    num_memory_samples: int = ...,
+    out: Optional[Tensor] = ...,
+) -> Tensor: ...
 
 class MakeRaw(object):
     experience_replay: ExperienceReplay
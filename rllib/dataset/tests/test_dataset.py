@@ -85,6 +85,20 @@ def test_append_error():
         dataset.append(trajectory)
 
 
+def test_append_numpy():
+    dataset = TrajectoryDataset(sequence_length=2)
+    trajectory = [
+        Observation(np.random.randn(4), np.random.randn(2), 1.0, np.random.randn(4))
+        for _ in range(5)
+    ]
+    dataset.append(trajectory)
+    assert len(dataset) == 3  # The last sub-trajectory ends with the trajectory.
+    observation = dataset[0]
+    assert observation.state.shape == (2, 4)
+    assert observation.done.shape == (2,)
+    assert isinstance(observation.done, torch.Tensor)
+
+
 def test_get_item(dataset):
     (
         dataset,
@@ -151,3 +165,48 @@ def test_initial_states(dataset):
 
     initial_states = dataset.initial_states
     assert initial_states.shape == (num_episodes, state_dim)
+
+
+def test_sample_batch(dataset):
+    (
+        dataset,
+        num_episodes,
+        episode_length,
+        state_dim,
+        action_dim,
+        batch_size,
+        sequence_length,
+    ) = dataset
+    if sequence_length is None:
+        with pytest.raises(ValueError):
+            dataset.sample_batch(batch_size)
+        return
+
+    indexes = torch.arange(batch_size)
+    batch = dataset.get_batch(indexes)
+    assert batch.state.shape == torch.Size([batch_size, sequence_length, state_dim])
+    assert batch.reward.shape == torch.Size([batch_size, sequence_length])
+    for i, index in enumerate(indexes):
+        for x, y in zip(batch, dataset[index]):
+            torch.testing.assert_allclose(x[i], y)
+
+    batch = dataset.sample_batch(batch_size)
+    assert batch.action.shape == torch.Size([batch_size, sequence_length, action_dim])
+
+
+def test_all_data(dataset):
+    dataset, num_episodes, episode_length, state_dim, *_ = dataset
+    all_data = dataset.all_data
+    num_points = num_episodes * episode_length
+    assert all_data.state.shape == torch.Size([num_points, state_dim])
+    assert dataset.all_data.state.data_ptr() == all_data.state.data_ptr()
+
+    # Inverting the returned data does not modify the cached data.
+    state = all_data.state.clone()
+    for transformation in reversed(dataset.transformations):
+        all_data = transformation.inverse(all_data)
+    torch.testing.assert_allclose(dataset.all_data.state, state)
+
+    dataset.transformations = []
+    trajectory = dataset._data.state[:episode_length]
+    assert dataset.all_data.state.data_ptr() == trajectory.data_ptr()
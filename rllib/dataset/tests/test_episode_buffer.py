@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+import torch.testing
+
+from rllib.dataset.datatypes import Observation
+from rllib.dataset.episode_buffer import EpisodeBuffer
+
+
+def transition(dim_state=4, dim_action=2):
+    return dict(
+        state=np.random.randn(dim_state),
+        action=np.random.randn(dim_action).astype(np.float32),
+        reward=np.float32(np.random.randn()),
+        next_state=np.random.randn(dim_state),
+        done=False,
+        log_prob_action=torch.randn(()),
+        entropy=torch.randn(()),
+    )
+
+
+@pytest.mark.parametrize("capacity", [1, 3, 256])
+def test_append(capacity):
+    buffer = EpisodeBuffer(capacity=capacity)
+    transitions = [transition() for _ in range(7)]
+    observations = [buffer.append(**transition_) for transition_ in transitions]
+    assert len(buffer) == 7
+    assert len(buffer._blocks) == int(np.ceil(7 / capacity))
+
+    for observation, transition_ in zip(observations, transitions):
+        expected = Observation(**transition_).to_torch()
+        for x, y in zip(observation, expected):
+            torch.testing.assert_allclose(x, y)
+        assert observation.state.dtype == torch.get_default_dtype()
+        assert observation.next_action is Observation.next_action
+
+    for index in range(7):
+        for x, y in zip(buffer[index], observations[index]):
+            assert x is y or x.data_ptr() == y.data_ptr()
+    assert buffer[-1].reward == observations[-1].reward
+    with pytest.raises(IndexError):
+        buffer[7]
+
+
+def test_discrete():
+    buffer = EpisodeBuffer()
+    observation = buffer.append(
+        state=3, action=np.array(1), reward=1.0, next_state=4, done=True
+    )
+    assert observation.state.shape == torch.Size([])
+    assert observation.state == 3
+    assert observation.action == 1
+    assert observation.done == 1
+    assert observation.log_prob_action == 1
+    assert observation.entropy == 0
@@ -19,9 +19,32 @@ class AbstractTransform(nn.Module, metaclass=ABCMeta):
         revert the transformation of the observation.
     update(observation):
         update the parameters of the transformer.
+    version: int
+        counter that changes whenever the output of the transformer may change.
 
     """
 
+    def __init__(self):
+        super().__init__()
+        self._version = 0
+
+    @property
+    def version(self):
+        """Return the version of the transformer.
+
+        Buffers that cache transformed observations compare it to decide if the
+        cache is stale. Transformers whose `update' changes their output bump it.
+        It also changes with the versions of the submodules that have one.
+        """
+        return self._version + sum(
+            getattr(module, "version", 0) for module in self.children()
+        )
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        """Load the state of the transformer, which may change its output."""
+        self._version += 1
+        super()._load_from_state_dict(*args, **kwargs)
+
     def forward(self, observation: Observation):
         """Apply transformation to observation tuple.
 
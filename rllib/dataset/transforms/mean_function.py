@@ -42,3 +42,14 @@ class MeanFunction(AbstractTransform):
         mean_next_state = self.mean_function(observation.state, observation.action)
         observation.next_state = observation.next_state + mean_next_state
         return observation
+
+    @property
+    def version(self):
+        """See `AbstractTransform.version'.
+
+        It also changes when the parameters of the mean function are modified.
+        """
+        version = super().version
+        if isinstance(self.mean_function, nn.Module):
+            version += sum(param._version for param in self.mean_function.parameters())
+        return version
@@ -13,3 +13,5 @@ class MeanFunction(AbstractTransform):
     def __init__(self, mean_function: nn.Module) -> None: ...
     def forward(self, observation: Observation, **kwargs: Any) -> Observation: ...
     def inverse(self, observation: Observation) -> Observation: ...
+    @property
+    def version(self) -> int: ...
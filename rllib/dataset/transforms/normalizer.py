@@ -10,16 +10,74 @@ from .abstract_transform import AbstractTransform
 
 
 class Normalizer(nn.Module):
-    """Normalizer Class."""
+    """Normalizer Class.
+
+    The statistics are updated lazily: `update' only keeps the samples, which are
+    merged at once with the parallel Welford update when the statistics are read
+    next, or when `max_pending' updates are waiting.
+
+    The mean, the variance and the count are buffers of the module, hence they are
+    exported and restored with `state_dict' and `load_state_dict', independently of
+    the data set that updated them. `version' only changes when they change, hence
+    the cached observations of a buffer stay valid until the new samples are merged.
+
+    Parameters
+    ----------
+    preserve_origin: bool, optional (default=False)
+        preserve the origin when rescaling.
+    event_dims: int, optional (default=1)
+        Number of trailing dimensions of a sample. The leading dimensions of the
+        arrays passed to `update' index the samples.
+    """
 
     preserve_orign: bool
+    max_pending = 1024
 
-    def __init__(self, preserve_origin=False):
+    def __init__(self, preserve_origin=False, event_dims=1):
         super().__init__()
-        self.mean = torch.zeros(1)
-        self.variance = torch.ones(1)
-        self.count = torch.tensor(0.0)
+        self.register_buffer("mean", torch.zeros(1))
+        self.register_buffer("variance", torch.ones(1))
+        self.register_buffer("count", torch.tensor(0.0))
         self.preserve_origin = preserve_origin
+        self.event_dims = event_dims
+        self._pending = []
+        self._version = 0
+
+    @property
+    def version(self):
+        """Return a counter that changes whenever the statistics change."""
+        self._merge_pending()
+        return self._version
+
+    def __getattr__(self, name):
+        """Merge the pending samples before the statistics are read."""
+        if name in ("mean", "variance", "count") and self.__dict__.get("_pending"):
+            self._merge_pending()
+        return super().__getattr__(name)
+
+    def __setstate__(self, state):
+        """Restore a normalizer pickled when the statistics were attributes."""
+        super().__setstate__(state)
+        for name in ["mean", "variance", "count"]:
+            if name in self.__dict__:
+                self.register_buffer(name, self.__dict__.pop(name))
+        self.__dict__.setdefault("event_dims", 1)
+        self.__dict__.setdefault("_pending", [])
+        self.__dict__.setdefault("_version", 0)
+
+    def _save_to_state_dict(self, destination, prefix, keep_vars):
+        """Merge the pending samples before the statistics are exported."""
+        self._merge_pending()
+        super()._save_to_state_dict(destination, prefix, keep_vars)
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """Load the statistics, whose shapes may differ from the current ones."""
+        self._pending = []
+        self._version += 1
+        for name in ["mean", "variance", "count"]:
+            if prefix + name in state_dict:
+                self._buffers[name] = state_dict[prefix + name].clone()
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
 
     def forward(self, array):
         """See `AbstractTransform.__call__'."""
@@ -41,8 +99,18 @@ class Normalizer(nn.Module):
     @torch.jit.export
     def update(self, array):
         """See `AbstractTransform.update'."""
-        while array.ndim <= 1:
-            array = array.unsqueeze(0)
+        event_shape = array.shape[max(array.ndim - self.event_dims, 0) :]
+        array = array.detach().reshape((-1,) + (tuple(event_shape) or (1,)))
+        self._pending.append(array.clone())
+        if len(self._pending) >= self.max_pending:
+            self._merge_pending()
+
+    def _merge_pending(self):
+        """Merge the samples of the pending updates into the statistics."""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        array = torch.cat(pending, 0)
         new_mean = torch.mean(array, 0)
         new_var = torch.var(array, 0)
         if torch.any(torch.isnan(new_var)):
@@ -56,6 +124,7 @@ class Normalizer(nn.Module):
         self.mean = update_mean(self.mean, self.count, new_mean, new_count)
 
         self.count += new_count
+        self._version += 1
 
 
 class StateNormalizer(AbstractTransform):
@@ -150,7 +219,7 @@ class RewardNormalizer(AbstractTransform):
 
     def __init__(self, preserve_origin=False):
         super().__init__()
-        self._normalizer = Normalizer(preserve_origin)
+        self._normalizer = Normalizer(preserve_origin, event_dims=0)
 
     def forward(self, observation):
         """See `AbstractTransform.__call__'."""
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Dict, List
 
 import torch.nn as nn
 from torch import Tensor
@@ -8,14 +8,26 @@ from rllib.dataset.datatypes import Array, Observation
 from .abstract_transform import AbstractTransform
 
 class Normalizer(nn.Module):
+    max_pending: int
     mean: Tensor
     variance: Tensor
     count: Tensor
     preserve_origin: bool
-    def __init__(self, preserve_origin: bool = ...) -> None: ...
+    event_dims: int
+    _pending: List[Tensor]
+    _version: int
+    def __init__(self, preserve_origin: bool = ..., event_dims: int = ...) -> None: ...
+    @property
+    def version(self) -> int: ...
+    def __getattr__(self, name: str) -> Any: ...
+    def __setstate__(self, state: Dict[str, Any]) -> None: ...
+    def _save_to_state_dict(
+        self, destination: Dict[str, Any], prefix: str, keep_vars: bool
+    ) -> None: ...
     def forward(self, array: Tensor, **kwargs: Any) -> Tensor: ...
     def inverse(self, array: Tensor) -> Tensor: ...
     def update(self, array: Tensor) -> None: ...
+    def _merge_pending(self) -> None: ...
 
 class StateNormalizer(AbstractTransform):
     _normalizer: Normalizer
@@ -10,6 +10,7 @@ from rllib.dataset.transforms import (
     DeltaState,
     MeanFunction,
     RewardClipper,
+    RewardNormalizer,
     RewardScaler,
     StateNormalizer,
 )
@@ -343,3 +344,56 @@ class TestStateNormalize(object):
         for x, y in zip(obs, inverse_observation):
             if x.shape == y.shape:
                 torch.testing.assert_allclose(x, y)
+
+    def test_batched_updates(self, preserve_origin):
+        transformer = StateNormalizer(preserve_origin)
+        states = torch.randn(3, 50, 4) * 3 + 1
+        version = transformer.version
+        for i in range(3):
+            for j in range(10):
+                transformer.update(Observation(state=states[i, j]))
+            transformer.update(Observation(state=states[i, 10:]))
+        assert transformer.version == version + 1  # The updates are merged once.
+        assert transformer.version == version + 1
+
+        states = states.reshape(-1, 4)
+        torch.testing.assert_allclose(transformer._normalizer.mean, states.mean(0))
+        torch.testing.assert_allclose(transformer._normalizer.variance, states.var(0))
+        assert transformer._normalizer.count == 150
+
+    def test_state_dict(self, trajectory, preserve_origin):
+        transformer = StateNormalizer(preserve_origin)
+        transformer.update(stack_list_of_tuples(trajectory))
+        state_dict = transformer.state_dict()
+        assert set(state_dict) == {
+            "_normalizer.mean",
+            "_normalizer.variance",
+            "_normalizer.count",
+        }
+
+        new_transformer = StateNormalizer(preserve_origin)
+        version = new_transformer.version
+        new_transformer.load_state_dict(state_dict)
+        assert new_transformer.version > version
+        observation = get_observation()
+        torch.testing.assert_allclose(
+            new_transformer(observation.clone()).state,
+            transformer(observation.clone()).state,
+        )
+
+
+class TestRewardNormalize(object):
+    def test_update(self):
+        transformer = RewardNormalizer()
+        rewards = torch.randn(8, 5)
+        transformer.update(Observation(state=torch.randn(4), reward=rewards[0, 0]))
+        transformer.update(Observation(state=torch.randn(8, 5, 4), reward=rewards))
+
+        rewards = torch.cat([rewards[:1, 0], rewards.flatten()])
+        assert transformer._normalizer.mean.shape == (1,)
+        torch.testing.assert_allclose(
+            transformer._normalizer.mean, rewards.mean(0, keepdim=True)
+        )
+        torch.testing.assert_allclose(
+            transformer._normalizer.variance, rewards.var(0, keepdim=True)
+        )
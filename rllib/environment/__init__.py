@@ -7,6 +7,7 @@ import rllib.environment.system_environment
 import rllib.environment.vectorized
 
 from .abstract_environment import AbstractEnvironment
+from .environment_pool import EnvironmentPool
 from .gym_environment import *
 from .mdp import *
 from .system_environment import *
@@ -0,0 +1,287 @@
+"""Pool of worker processes that step copies of an environment."""
+from multiprocessing.connection import wait
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from rllib.dataset.datatypes import Observation
+
+from .abstract_environment import AbstractEnvironment
+
+
+def _worker(environment_fn, rows, arrays, pipe):
+    """Step the environments of `rows' and write their results in `arrays'."""
+    state, action, reward, done = (array.numpy() for array in arrays)
+    environments = [environment_fn() for _ in rows]
+    while True:
+        command, indexes = pipe.recv()
+        if command == "step":
+            infos = []
+            for row, environment in zip(rows, environments):
+                next_state, reward[row], done[row], info = environment.step(action[row])
+                state[row] = next_state
+                infos.append(info)
+            pipe.send(infos)
+        elif command == "reset":
+            for row in indexes:
+                state[row] = environments[row - rows.start].reset()
+            pipe.send(None)
+        else:
+            for environment in environments:
+                environment.close()
+            pipe.close()
+            return
+
+
+def _average_infos(infos):
+    """Average the numeric entries that all the infos have."""
+    if not infos:
+        return dict()
+    keys = set.intersection(*(set(info) for info in infos))
+    return {
+        key: np.mean([info[key] for info in infos])
+        for key in keys
+        if all(isinstance(info[key], (int, float, np.number)) for info in infos)
+    }
+
+
+class EnvironmentPool(AbstractEnvironment):
+    """A pool of worker processes that step copies of an environment.
+
+    Each worker owns `envs_per_worker' environments, which it steps one after the
+    other. The states, actions, rewards and done flags of all the copies live in
+    shared memory, hence only the commands and the infos go through the pipes.
+
+    `step_async' sends actions to some workers and `step_wait' waits until
+    `num_ready' of the stepping workers are done, so the slow copies do not block
+    the fast ones. With the default `num_ready', all the workers are awaited and the
+    pool steps synchronously. `step' and `reset' step and reset all the copies, like
+    a vectorized environment.
+
+    Parameters
+    ----------
+    environment_fn: Callable[[], AbstractEnvironment]
+        Function that creates an environment. It is called once per copy inside the
+        workers, hence it must be picklable with the start method of the processes.
+    num_workers: int.
+        Number of worker processes.
+    envs_per_worker: int, optional (default=1).
+        Number of environments that each worker steps.
+    num_ready: int, optional.
+        Number of workers that `step_wait' waits for. By default, all of them.
+    start_method: str, optional.
+        Start method of the processes, see `torch.multiprocessing.get_context'.
+
+    Examples
+    --------
+    An agent collects episodes from 32 environments in 8 processes::
+
+        pool = EnvironmentPool(lambda: GymEnvironment("HalfCheetah-v2"), 8, 4)
+        rollout_agent_vectorized(pool, agent, num_episodes=64)
+        pool.close()
+    """
+
+    def __init__(
+        self,
+        environment_fn,
+        num_workers,
+        envs_per_worker=1,
+        num_ready=None,
+        start_method=None,
+    ):
+        environment = environment_fn()
+        super().__init__(
+            dim_state=environment.dim_state,
+            dim_action=environment.dim_action,
+            observation_space=environment.observation_space,
+            action_space=environment.action_space,
+            dim_observation=environment.dim_observation,
+            num_states=environment.num_states,
+            num_actions=environment.num_actions,
+            num_observations=environment.num_observations,
+        )
+        self._action_scale = environment.action_scale
+        self._goal = environment.goal
+        self._name = environment.name
+        initial_state = np.asarray(environment.reset())
+        environment.close()
+
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.num_envs = num_workers * envs_per_worker
+        self.num_ready = num_workers if num_ready is None else num_ready
+
+        if self.discrete_action:
+            action = np.zeros(self.num_envs, dtype=np.int64)
+        else:
+            action = np.zeros((self.num_envs,) + tuple(self.dim_action))
+        self._arrays = [
+            torch.from_numpy(array).share_memory_()
+            for array in (
+                np.zeros((self.num_envs,) + initial_state.shape, initial_state.dtype),
+                action,
+                np.zeros(self.num_envs),
+                np.zeros(self.num_envs, dtype=np.bool_),
+            )
+        ]
+        self._state, self._action, self._reward, self._done = (
+            array.numpy() for array in self._arrays
+        )
+        self._last_state = np.zeros_like(self._state)
+        self._time = np.zeros(self.num_envs, dtype=np.int64)
+        self._stepping = set()
+
+        context = mp.get_context(start_method)
+        self._pipes, self._processes = [], []
+        for worker in range(num_workers):
+            pipe, worker_pipe = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(environment_fn, self._rows(worker), self._arrays, worker_pipe),
+                daemon=True,
+            )
+            process.start()
+            worker_pipe.close()
+            self._pipes.append(pipe)
+            self._processes.append(process)
+
+    def _rows(self, worker):
+        """Return the rows of the environments of `worker'."""
+        return range(worker * self.envs_per_worker, (worker + 1) * self.envs_per_worker)
+
+    def _workers(self, indexes):
+        """Return the workers of the environments `indexes'."""
+        if indexes is None:
+            return np.arange(self.num_workers)
+        return np.unique(np.asarray(indexes, dtype=np.int64) // self.envs_per_worker)
+
+    def reset(self, indexes=None):
+        """Reset the environments `indexes', or all of them, and return their states.
+
+        Raises
+        ------
+        RuntimeError
+            If the worker of an environment is stepping.
+        """
+        indexes = np.arange(self.num_envs) if indexes is None else np.asarray(indexes)
+        workers = self._workers(indexes)
+        if self._stepping.intersection(workers.tolist()):
+            raise RuntimeError("Wait for the workers before resetting them.")
+        for worker in workers:
+            rows = self._rows(worker)
+            self._pipes[worker].send(
+                ("reset", [row for row in indexes.tolist() if row in rows])
+            )
+        for worker in workers:
+            self._pipes[worker].recv()
+        self._time[indexes] = 0
+        return self._state[indexes].copy()
+
+    def step_async(self, action, indexes=None):
+        """Send the actions of the environments `indexes' to their workers.
+
+        The environments must be all the ones of their workers, e.g., the indexes
+        returned by `step_wait'.
+
+        Raises
+        ------
+        ValueError
+            If the indexes do not cover all the environments of their workers.
+        RuntimeError
+            If a worker is already stepping.
+        """
+        indexes = np.arange(self.num_envs) if indexes is None else np.asarray(indexes)
+        workers = self._workers(indexes)
+        if len(indexes) != len(workers) * self.envs_per_worker:
+            raise ValueError("All the environments of a worker are stepped together.")
+        if self._stepping.intersection(workers.tolist()):
+            raise RuntimeError("A worker can not step before it is awaited.")
+        self._action[indexes] = np.reshape(action, self._action[indexes].shape)
+        self._last_state[indexes] = self._state[indexes]
+        for worker in workers:
+            self._pipes[worker].send(("step", None))
+            self._stepping.add(int(worker))
+
+    def step_wait(self, num_ready=None):
+        """Wait until `num_ready' of the stepping workers are done.
+
+        Returns
+        -------
+        indexes: np.ndarray
+            Environments of the workers that are done.
+        observation: Observation
+            Transitions of these environments.
+        info: dict
+            Average of the numeric entries of their infos.
+        """
+        num_ready = self.num_ready if num_ready is None else num_ready
+        num_ready = min(num_ready, len(self._stepping))
+        ready, infos = [], []
+        while len(ready) < num_ready:
+            pipes = [self._pipes[worker] for worker in sorted(self._stepping)]
+            for pipe in wait(pipes):
+                worker = self._pipes.index(pipe)
+                infos += pipe.recv()
+                self._stepping.remove(worker)
+                ready.append(worker)
+
+        indexes = np.array(
+            [row for worker in sorted(ready) for row in self._rows(worker)],
+            dtype=np.int64,
+        )
+        self._time[indexes] += 1
+        observation = Observation(
+            state=self._last_state[indexes].copy(),
+            action=self._action[indexes].copy(),
+            reward=self._reward[indexes].copy(),
+            next_state=self._state[indexes].copy(),
+            done=self._done[indexes].copy(),
+        )
+        return indexes, observation, _average_infos(infos)
+
+    def step(self, action):
+        """Step all the environments and wait for all the workers."""
+        self.step_async(action)
+        _, observation, info = self.step_wait(self.num_workers)
+        return observation.next_state, observation.reward, observation.done, info
+
+    def close(self):
+        """Close the environments and stop the workers."""
+        for worker, pipe in enumerate(self._pipes):
+            if worker in self._stepping:
+                pipe.recv()
+            pipe.send(("close", None))
+        for process in self._processes:
+            process.join()
+        self._stepping = set()
+        self._pipes, self._processes = [], []
+
+    @property
+    def action_scale(self):
+        """See `AbstractEnvironment.action_scale'."""
+        return self._action_scale
+
+    @property
+    def goal(self):
+        """See `AbstractEnvironment.goal'."""
+        return self._goal
+
+    @property
+    def state(self):
+        """Return the current states of all the environments."""
+        return self._state.copy()
+
+    @state.setter
+    def state(self, value):
+        raise NotImplementedError("The environments live in the worker processes.")
+
+    @property
+    def time(self):
+        """Return the current time of all the environments."""
+        return self._time.copy()
+
+    @property
+    def name(self):
+        """Return the name of the environment."""
+        return self._name
@@ -0,0 +1,70 @@
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from torch import Tensor
+from torch.multiprocessing import Process
+
+from rllib.dataset.datatypes import Action, Observation, State
+
+from .abstract_environment import AbstractEnvironment
+
+def _worker(
+    environment_fn: Callable[[], AbstractEnvironment],
+    rows: range,
+    arrays: List[Tensor],
+    pipe: Connection,
+) -> None: ...
+def _average_infos(infos: List[Dict[str, Any]]) -> Dict[str, float]: ...
+
+class EnvironmentPool(AbstractEnvironment):
+    num_workers: int
+    envs_per_worker: int
+    num_envs: int
+    num_ready: int
+    _action_scale: Action
+    _goal: Optional[State]
+    _name: str
+    _arrays: List[Tensor]
+    _state: np.ndarray
+    _action: np.ndarray
+    _reward: np.ndarray
+    _done: np.ndarray
+    _last_state: np.ndarray
+    _time: np.ndarray
+    _stepping: Set[int]
+    _pipes: List[Connection]
+    _processes: List[Process]
+    def __init__(
+        self,
+        environment_fn: Callable[[], AbstractEnvironment],
+        num_workers: int,
+        envs_per_worker: int = ...,
+        num_ready: Optional[int] = ...,
+        start_method: Optional[str] = ...,
+    ) -> None: ...
+    def _rows(self, worker: int) -> range: ...
+    def _workers(self, indexes: Optional[Iterable[int]]) -> np.ndarray: ...
+    def reset(self, indexes: Optional[Iterable[int]] = ...) -> np.ndarray: ...
+    def step_async(
+        self, action: Action, indexes: Optional[Iterable[int]] = ...
+    ) -> None: ...
+    def step_wait(
+        self, num_ready: Optional[int] = ...
+    ) -> Tuple[np.ndarray, Observation, Dict[str, float]]: ...
+    def step(
+        self, action: Action
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, float]]: ...
+    def close(self) -> None: ...
+    @property
+    def action_scale(self) -> Action: ...
+    @property
+    def goal(self) -> Optional[State]: ...
+    @property
+    def state(self) -> np.ndarray: ...
+    @state.setter
+    def state(self, value: State) -> None: ...
+    @property
+    def time(self) -> np.ndarray: ...
+    @property
+    def name(self) -> str: ...
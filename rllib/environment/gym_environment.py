@@ -128,7 +128,7 @@ class GymEnvironment(AbstractEnvironment):
 
     @state.setter
     def state(self, value):
-        if hasattr(self.env, "set_state"):
+        if hasattr(self.env, "set_state") and hasattr(self.env, "sim"):  # MuJoCo.
             self.env.set_state(
                 value[: len(self.env.sim.data.qpos)],
                 value[len(self.env.sim.data.qpos) :],
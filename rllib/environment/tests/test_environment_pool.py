@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from rllib.agent import RandomAgent
+from rllib.environment import EnvironmentPool, GymEnvironment
+from rllib.util.rollout import rollout_agent_vectorized
+from rllib.util.training.agent_training import evaluate_agent
+
+
+def make_pendulum():
+    return GymEnvironment("Pendulum-v0")
+
+
+def make_cart_pole():
+    return GymEnvironment("CartPole-v0")
+
+
+@pytest.fixture
+def pool():
+    pool = EnvironmentPool(make_pendulum, num_workers=3, envs_per_worker=2)
+    yield pool
+    pool.close()
+
+
+def test_attributes(pool):
+    environment = make_pendulum()
+    assert pool.num_envs == 6
+    assert pool.dim_state == environment.dim_state
+    assert pool.dim_action == environment.dim_action
+    np.testing.assert_allclose(pool.action_scale, environment.action_scale)
+    assert pool.name == environment.name
+
+
+def test_step(pool):
+    state = pool.reset()
+    assert state.shape == (6, 3)
+    np.testing.assert_allclose(pool.state, state)
+
+    action = np.random.uniform(-2, 2, size=(6, 1))
+    next_state, reward, done, info = pool.step(action)
+    assert next_state.shape == (6, 3)
+    assert reward.shape == (6,)
+    assert done.shape == (6,)
+    np.testing.assert_array_equal(pool.time, np.ones(6))
+    assert (reward <= 0).all()
+    assert not done.any()
+
+    pool.reset([1, 4])
+    np.testing.assert_array_equal(pool.time, [1, 0, 1, 1, 0, 1])
+
+
+def test_step_async(pool):
+    state = pool.reset()
+    pool.step_async(np.zeros((4, 1)), [0, 1, 4, 5])
+    with pytest.raises(RuntimeError):
+        pool.step_async(np.zeros((2, 1)), [0, 1])
+    with pytest.raises(RuntimeError):
+        pool.reset([0])
+    with pytest.raises(ValueError):
+        pool.step_async(np.zeros((1, 1)), [2])
+
+    indexes, observation, _ = pool.step_wait(num_ready=1)
+    assert len(indexes) in [2, 4]
+    np.testing.assert_allclose(observation.state, state[indexes])
+    np.testing.assert_allclose(observation.action, np.zeros((len(indexes), 1)))
+    np.testing.assert_allclose(observation.next_state, pool.state[indexes])
+
+    pool.step_wait()
+    np.testing.assert_array_equal(pool.time, [1, 1, 0, 0, 1, 1])
+
+
+@pytest.mark.parametrize("num_ready", [None, 1])
+def test_rollout_agent_vectorized(num_ready):
+    pool = EnvironmentPool(make_cart_pole, 2, envs_per_worker=2, num_ready=num_ready)
+    agent = RandomAgent.default(pool)
+    rollout_agent_vectorized(pool, agent, num_episodes=5, max_steps=50)
+    assert agent.total_episodes == 5
+    assert all(0 < steps <= 50 for steps in agent.episode_steps)
+
+    evaluate_agent(agent, pool, num_episodes=2, max_steps=50)
+    assert len(agent.logger.get("eval_return")) == 2
+    pool.close()
+
+
+def test_evaluate_discrete_agent():
+    pool = EnvironmentPool(make_cart_pole, 2, envs_per_worker=2)
+    agent = RandomAgent.default(pool)
+    agent.eval()
+    assert agent.act(pool.reset()).shape == (4,)
+    agent.train()
+
+    evaluate_agent(agent, pool, num_episodes=3, max_steps=20)
+    assert len(agent.logger.get("eval_return")) == 3
+    assert agent.total_episodes == 0
+    pool.close()
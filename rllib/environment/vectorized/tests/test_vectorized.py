@@ -2,6 +2,7 @@ import numpy as np
 import torch
 from gym.envs.classic_control import AcrobotEnv, CartPoleEnv, PendulumEnv
 
+from rllib.environment import GymEnvironment
 from rllib.environment.vectorized import (
     DiscreteVectorizedAcrobotEnv,
     DiscreteVectorizedCartPoleEnv,
@@ -288,3 +289,17 @@ class TestPendulum(object):
 
         venv.set_state(vobs[2:])
         np.testing.assert_allclose(venv.state, state[2:])
+
+
+def test_gym_environment_batched_state():
+    for name in ["VPendulum-v0", "VContinuous-Acrobot-v0"]:
+        environment = GymEnvironment(name)
+        environment.reset()
+        state = np.stack([environment.state] * 5)
+        environment.state = state
+        np.testing.assert_allclose(environment.state, state)
+
+        action = np.zeros((5,) + environment.dim_action)
+        next_state, reward, done, _ = environment.step(action)
+        assert next_state.shape == (5,) + environment.dim_state
+        assert reward.shape == (5,)
@@ -236,6 +236,9 @@ class Ensemble(HeteroGaussianNN):
         This is useful for Thompson's Sampling (for example).
         - 'set_head_idx': set a head with .set_head_idx() and return its output.
         Crucially, it has to have the same batch_size as the predicted state-actions.
+        - 'multi_head': the input has a leading dimension of size `num_heads' and
+        each head only predicts its own slice of it, e.g., one bootstrap batch per
+        head.
     """
 
     num_heads: int
@@ -319,6 +322,10 @@ class Ensemble(HeteroGaussianNN):
             head_idx = torch.randint(self.num_heads, out.shape[:-1]).unsqueeze(-1)
             mean = out.gather(-1, head_idx).squeeze(-1)
             scale = torch.diag_embed(scale.gather(-1, head_idx).squeeze(-1))
+        elif self.prediction_strategy == "multi_head":  # One batch per head.
+            head_idx = torch.arange(self.num_heads)
+            mean = out[head_idx, ..., head_idx]
+            scale = torch.diag_embed(scale[head_idx, ..., head_idx])
         elif self.prediction_strategy == "set_head_idx":  # TS-INF
             mean = out.gather(-1, self.head_idx)
             scale = torch.diag_embed(scale.gather(-1, self.head_idx))
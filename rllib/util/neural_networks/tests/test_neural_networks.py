@@ -336,6 +336,25 @@ class TestEnsembleNN(object):
         assert o.has_rsample
         assert not o.has_enumerate_support
 
+    def test_multi_head(self, out_dim, num_heads, deterministic):
+        in_dim = (4,)
+        net = Ensemble(
+            in_dim, out_dim, num_heads=num_heads, deterministic=deterministic
+        )
+        t = torch.randn((num_heads, 8) + in_dim)
+
+        net.set_prediction_strategy("multi_head")
+        mean, scale_tril = net(t)
+        assert mean.shape == torch.Size((num_heads, 8) + out_dim)
+        assert scale_tril.shape == torch.Size((num_heads, 8) + out_dim + out_dim)
+
+        net.set_prediction_strategy("set_head")
+        for head in range(num_heads):
+            net.set_head(head)
+            head_mean, head_scale_tril = net(t[head])
+            torch.testing.assert_allclose(mean[head], head_mean)
+            torch.testing.assert_allclose(scale_tril[head], head_scale_tril)
+
     def test_layers(self, out_dim, num_heads, layers, deterministic):
         in_dim = (4,)
         net = Ensemble(in_dim, out_dim, layers=layers, num_heads=num_heads)
@@ -1,61 +1,79 @@
 """Helper functions to conduct a rollout with policies or agents."""
 
+from dataclasses import replace
+
+import numpy as np
 import torch
 from gym.wrappers.monitoring.video_recorder import VideoRecorder
 from tqdm import tqdm
 
-from rllib.dataset.datatypes import Observation
+from rllib.dataset.datatypes import NaN, Observation
+from rllib.dataset.episode_buffer import EpisodeBuffer
+from rllib.dataset.utilities import unstack_observations
+from rllib.environment import EnvironmentPool
 from rllib.util.training.utilities import Evaluate
 from rllib.util.utilities import get_entropy_and_log_p, tensor_to_distribution
 
 
-def step_env(environment, state, action, action_scale, pi=None, render=False):
-    """Perform a single step in an environment."""
+def _get_entropy_and_log_p(pi, action, action_scale):
+    """Get the entropy of `pi' and the log-probability of `action', if possible."""
+    if pi is None:
+        return 0.0, 1.0
+    if not isinstance(action, torch.Tensor):
+        action = torch.tensor(action, dtype=torch.get_default_dtype())
+    try:
+        with torch.no_grad():
+            return get_entropy_and_log_p(pi, action, action_scale)
+    except RuntimeError:
+        return 0.0, 1.0
+
+
+def step_env(
+    environment, state, action, action_scale, pi=None, render=False, buffer=None
+):
+    """Perform a single step in an environment.
+
+    If `buffer' is given, the transition is written in its next row and the
+    observation is a view of that row, see `EpisodeBuffer'.
+    """
     try:
         next_state, reward, done, info = environment.step(action)
     except TypeError:
         next_state, reward, done, info = environment.step(action.item())
 
-    if not isinstance(action, torch.Tensor):
-        action = torch.tensor(action, dtype=torch.get_default_dtype())
-
-    if pi is not None:
-        try:
-            with torch.no_grad():
-                entropy, log_prob_action = get_entropy_and_log_p(
-                    pi, action, action_scale
-                )
-        except RuntimeError:
-            entropy, log_prob_action = 0.0, 1.0
+    entropy, log_prob_action = _get_entropy_and_log_p(pi, action, action_scale)
+    if buffer is not None:
+        observation = buffer.append(
+            state=state,
+            action=action,
+            reward=reward,
+            next_state=next_state,
+            done=done,
+            log_prob_action=log_prob_action,
+            entropy=entropy,
+        )
     else:
-        entropy, log_prob_action = 0.0, 1.0
-
-    observation = Observation(
-        state=state,
-        action=action,
-        reward=reward,
-        next_state=next_state,
-        done=done,
-        entropy=entropy,
-        log_prob_action=log_prob_action,
-    ).to_torch()
+        if not isinstance(action, torch.Tensor):
+            action = torch.tensor(action, dtype=torch.get_default_dtype())
+        observation = Observation(
+            state=state,
+            action=action,
+            reward=reward,
+            next_state=next_state,
+            done=done,
+            entropy=entropy,
+            log_prob_action=log_prob_action,
+        ).to_torch()
     state = next_state
     if render:
         environment.render()
     return observation, state, done, info
 
 
-def step_model(
-    dynamical_model,
-    reward_model,
-    termination_model,
-    state,
-    action,
-    done=None,
-    action_scale=1.0,
-    pi=None,
+def _sample_transitions(
+    dynamical_model, reward_model, termination_model, state, action, done=None
 ):
-    """Perform a single step in an dynamical model."""
+    """Sample the next states, rewards and done flags of the particles."""
     # Sample a next state
     next_state_out = dynamical_model(state, action)
     next_state_distribution = tensor_to_distribution(next_state_out)
@@ -84,6 +102,76 @@ def step_model(
             .sample()
             .bool()
         )
+    return next_state, reward, done, next_state_out[-1]
+
+
+def _sample_active_transitions(
+    dynamical_model, reward_model, termination_model, state, action, done
+):
+    """Sample the transitions of the active particles and scatter them back.
+
+    The done particles keep their state as next state, with zero reward and scale.
+    """
+    batch_shape, num_particles = done.shape, done.numel()
+    active = torch.nonzero(~done.reshape(-1), as_tuple=True)
+
+    def _flatten(x):
+        return x.reshape(num_particles, *x.shape[done.ndim :])
+
+    def _scatter(x, active_x):
+        return x.index_put(active, active_x).reshape(*batch_shape, *x.shape[1:])
+
+    next_state, reward, active_done, scale_tril = _sample_transitions(
+        dynamical_model,
+        reward_model,
+        termination_model,
+        _flatten(state)[active],
+        _flatten(action)[active],
+    )
+    if scale_tril.ndim == next_state.ndim + 1 and len(scale_tril) == len(next_state):
+        scale_tril = _scatter(
+            scale_tril.new_zeros(num_particles, *scale_tril.shape[1:]), scale_tril
+        )
+    next_state = _scatter(_flatten(state), next_state)
+    reward = _scatter(reward.new_zeros(num_particles, *reward.shape[1:]), reward)
+    done = _scatter(done.reshape(-1), active_done)
+    return next_state, reward, done, scale_tril
+
+
+def step_model(
+    dynamical_model,
+    reward_model,
+    termination_model,
+    state,
+    action,
+    done=None,
+    action_scale=1.0,
+    pi=None,
+    compaction_threshold=None,
+):
+    """Perform a single step in an dynamical model.
+
+    If a fraction of at least `compaction_threshold' of the particles is done, the
+    models are only evaluated on the active particles and their results are
+    scattered back. The done particles then keep their state as next state, with
+    zero scale, instead of a model sample. Models whose predictions are aligned with
+    the particles, as the `multi_head' and `set_head_idx' strategies of ensembles,
+    are always evaluated on all the particles.
+    """
+    if (
+        done is not None
+        and compaction_threshold is not None
+        and compaction_threshold <= done.float().mean() < 1
+        and dynamical_model.get_prediction_strategy()
+        not in ["multi_head", "set_head_idx"]
+    ):
+        next_state, reward, done, scale_tril = _sample_active_transitions(
+            dynamical_model, reward_model, termination_model, state, action, done
+        )
+    else:
+        next_state, reward, done, scale_tril = _sample_transitions(
+            dynamical_model, reward_model, termination_model, state, action, done
+        )
 
     if pi is not None:
         try:
@@ -101,13 +189,11 @@ def step_model(
         done=done.float(),
         entropy=entropy,
         log_prob_action=log_prob_action,
-        next_state_scale_tril=next_state_out[-1],
+        next_state_scale_tril=scale_tril,
     ).to_torch()
 
-    # Update state.
-    next_state = torch.zeros_like(state)
-    next_state[~done] = observation.next_state[~done]  # update next state.
-    next_state[done] = state[done]  # don't update next state.
+    # Update state, except where the rollout is done.
+    next_state = torch.where(done.unsqueeze(-1), state, observation.next_state)
 
     return observation, next_state, done
 
@@ -140,6 +226,7 @@ def rollout_episode(environment, agent, max_steps, render):
     state = environment.reset()
     agent.set_goal(environment.goal)
     agent.start_episode()
+    buffer = EpisodeBuffer()
     done = False
     time_step = 0
     while not done:
@@ -151,6 +238,7 @@ def rollout_episode(environment, agent, max_steps, render):
             action_scale=agent.policy.action_scale,
             pi=agent.pi,
             render=render,
+            buffer=buffer,
         )
         agent.observe(obs)
         # Log info.
@@ -220,6 +308,148 @@ def rollout_agent(
     agent.end_interaction()
 
 
+def _reset_vectorized(environment, state, indexes):
+    """Reset the sub-environments `indexes' of a vectorized environment or a pool.
+
+    A vectorized environment resets a single instance, hence the initial state of
+    each sub-environment is written into the batched internal state.
+    """
+    state = np.array(state)
+    if isinstance(environment, EnvironmentPool):
+        state[indexes] = environment.reset(indexes)
+        return state
+    internal_state = np.array(environment.state)
+    for index in indexes:
+        state[index] = environment.reset()
+        internal_state[index] = environment.state
+    environment.state = internal_state
+    return state
+
+
+def rollout_agent_vectorized(
+    environment,
+    agent,
+    num_envs=None,
+    num_episodes=1,
+    max_steps=1000,
+    print_frequency=0,
+):
+    """Conduct a rollout of an agent in `num_envs' copies of an environment.
+
+    The copies are the sub-environments of a vectorized environment, e.g.,
+    `GymEnvironment("VPendulum-v0")', or the environments of an `EnvironmentPool'.
+    They are stepped in lockstep with one call to `agent.act' on a
+    [num_envs x dim_state] batch per step. An asynchronous pool only returns the
+    environments of the workers that are ready, and the agent acts on these. A
+    sub-environment that finishes is reset and starts a new episode, until
+    `num_episodes' have started.
+
+    The transitions of each sub-environment are kept until its episode finishes,
+    and then the agent observes the episode between `start_episode' and
+    `end_episode', so its memory keeps the episode boundaries of each copy.
+
+    Parameters
+    ----------
+    environment: AbstractEnvironment
+        Vectorized environment or pool with which the agent interacts.
+    agent: AbstractAgent
+        Agent that interacts with the environment.
+    num_envs: int, optional.
+        Number of sub-environments. A pool sets it to its number of environments.
+    num_episodes: int, optional (default=1)
+        Number of episodes.
+    max_steps: int.
+        Maximum number of steps per episode.
+    print_frequency: int, optional.
+        Print agent stats every `print_frequency' episodes if > 0.
+    """
+    pool = isinstance(environment, EnvironmentPool)
+    agent.set_goal(environment.goal)
+    if pool:
+        num_envs = environment.num_envs
+        state = environment.reset()
+    else:
+        states, internal_states = zip(
+            *[
+                (np.array(environment.reset()), np.array(environment.state))
+                for _ in range(num_envs)
+            ]
+        )
+        state = np.stack(states)
+        environment.state = np.stack(internal_states)
+    num_started = min(num_envs, num_episodes)
+    active = np.arange(num_envs) < num_started
+    time_steps = np.zeros(num_envs, dtype=int)
+    trajectories = [[] for _ in range(num_envs)]
+    ready = np.arange(num_envs)
+    entropy, log_prob_action = torch.zeros(num_envs), torch.ones(num_envs)
+
+    progress = tqdm(total=num_episodes)
+    while active.any():
+        if pool:
+            if len(ready):
+                action = agent.act(state[ready])
+                environment.step_async(action, ready)
+                rows = torch.as_tensor(ready)
+                entropy[rows], log_prob_action[rows] = _get_entropy_and_log_p(
+                    agent.pi, action, agent.policy.action_scale
+                )
+            ready, obs, info = environment.step_wait()
+            state[ready], done = obs.next_state, obs.done
+            rows = torch.as_tensor(ready)
+            obs = replace(
+                obs, entropy=entropy[rows], log_prob_action=log_prob_action[rows]
+            ).to_torch()
+        else:
+            action = agent.act(state)
+            # The vectorized environments take the discrete actions as [num_envs x 1].
+            next_state, reward, done, info = environment.step(
+                action[..., np.newaxis] if agent.policy.discrete_action else action
+            )
+            entropy, log_prob_action = _get_entropy_and_log_p(
+                agent.pi, action, agent.policy.action_scale
+            )
+            obs = Observation(
+                state=state,
+                action=torch.tensor(action, dtype=torch.get_default_dtype()),
+                reward=reward,
+                next_state=next_state,
+                done=done,
+                entropy=entropy,
+                log_prob_action=log_prob_action,
+            ).to_torch()
+            state = next_state
+        agent.logger.update(**info)
+        for index, observation in zip(ready, unstack_observations(obs)):
+            if active[index]:
+                trajectories[index].append(observation)
+
+        time_steps[ready] += 1
+        finished = ready[np.asarray(done) | (time_steps[ready] >= max_steps)]
+        for index in finished:
+            if active[index]:
+                agent.start_episode()
+                for observation in trajectories[index]:
+                    agent.observe(observation)
+                agent.end_episode()
+                trajectories[index] = []
+                progress.update()
+                if print_frequency and agent.total_episodes % print_frequency == 0:
+                    print(agent)
+
+            active[index] = active[index] and num_started < num_episodes
+            num_started += int(active[index])
+            time_steps[index] = 0
+        state = _reset_vectorized(environment, state, finished)
+        if pool:  # Only the workers with active environments keep stepping.
+            workers = active[ready].reshape(-1, environment.envs_per_worker)
+            ready = ready[np.repeat(workers.any(-1), environment.envs_per_worker)]
+    if pool:
+        environment.step_wait(environment.num_workers)
+    progress.close()
+    agent.end_interaction()
+
+
 def rollout_policy(environment, policy, num_episodes=1, max_steps=1000, render=False):
     """Conduct a rollout of a policy in an environment.
 
@@ -247,6 +477,7 @@ def rollout_policy(environment, policy, num_episodes=1, max_steps=1000, render=F
         state = environment.reset()
         done = False
         trajectory = []
+        buffer = EpisodeBuffer()
         with torch.no_grad():
             time_step = 0
             while not done:
@@ -264,6 +495,7 @@ def rollout_policy(environment, policy, num_episodes=1, max_steps=1000, render=F
                     action_scale=policy.action_scale,
                     pi=pi,
                     render=render,
+                    buffer=buffer,
                 )
                 trajectory.append(obs)
 
@@ -275,6 +507,71 @@ def rollout_policy(environment, policy, num_episodes=1, max_steps=1000, render=F
     return trajectories
 
 
+def _model_rollout_fields(fields, stack_dim):
+    """Return the fields that a model rollout stores."""
+    if fields is None or stack_dim is None:
+        return (
+            "state",
+            "action",
+            "reward",
+            "next_state",
+            "done",
+            "log_prob_action",
+            "entropy",
+            "next_state_scale_tril",
+        )
+    return tuple(fields)
+
+
+def _write_rollout_step(
+    columns, step, observation, max_steps, fields, initial_steps=64
+):
+    """Write the `fields' of `observation' in row `step' of the rollout `columns'.
+
+    The columns are allocated at the first step with `initial_steps' rows, at most
+    `max_steps', as rollouts often terminate early. When they are full, they are
+    copied into columns with twice as many rows, at most `max_steps'.
+    """
+    for name in fields:
+        value = getattr(observation, name)
+        if step == 0:
+            num_rows = min(max_steps, initial_steps)
+            columns[name] = value.new_empty((num_rows,) + value.shape)
+        elif step == len(columns[name]):
+            column = columns[name]
+            num_rows = min(max_steps, 2 * len(column))
+            columns[name] = column.new_empty((num_rows,) + column.shape[1:])
+            columns[name][:step] = column
+        columns[name][step] = value
+
+
+def _collect_rollout(columns, num_steps, stack_dim=None):
+    """Collect the first `num_steps' rows of the rollout `columns'.
+
+    The rows after `num_steps', which were allocated but not written, are dropped.
+
+    If `stack_dim' is None, return a list with one observation per step, whose fields
+    are views of the rows. Otherwise, return an observation whose fields are views of
+    the columns, with the time dimension moved to `stack_dim' as in
+    `stack_list_of_tuples'. The fields that are not in `columns' are NaN.
+    """
+    if stack_dim is None:
+        return [
+            Observation(**{name: column[step] for name, column in columns.items()})
+            for step in range(num_steps)
+        ]
+
+    def _move_time_dim(column):
+        column = column[:num_steps]
+        if column.ndim - 1 > max(stack_dim, -stack_dim - 1):
+            return column.movedim(0, stack_dim)
+        return column.movedim(0, -1)
+
+    stacked = {name: _move_time_dim(column) for name, column in columns.items()}
+    stacked.setdefault("state", torch.tensor(NaN))
+    return Observation(**stacked)
+
+
 def rollout_model(
     dynamical_model,
     reward_model,
@@ -283,9 +580,15 @@ def rollout_model(
     initial_action=None,
     termination_model=None,
     max_steps=1000,
+    stack_dim=None,
+    fields=None,
+    compaction_threshold=None,
 ):
     """Conduct a rollout of a policy interacting with a model.
 
+    The observations are written in place into [time x ...] tensors, one per field,
+    which grow up to [max_steps x ...], see `_write_rollout_step'.
+
     Parameters
     ----------
     dynamical_model: AbstractModel
@@ -302,21 +605,30 @@ def rollout_model(
         Termination condition to finish the rollout.
     max_steps: int.
         Maximum number of steps per episode.
+    stack_dim: int, optional.
+        If given, return the stacked observation, with the time dimension at
+        `stack_dim' as in `stack_list_of_tuples'.
+    fields: Iterable[str], optional.
+        Names of the fields of the stacked observation. By default, all the fields
+        that `step_model' sets. The other fields are not stored.
+    compaction_threshold: float, optional.
+        Fraction of done particles from which the models are only evaluated on the
+        active particles, see `step_model'. By default, they are always evaluated on
+        all the particles.
 
     Returns
     -------
     trajectory: Trajectory=List[Observation]
-        A list of observations.
+        A list of observations, or the stacked observation if `stack_dim' is given.
 
     Notes
     -----
     It will try to do the re-parametrization trick with the policy and models.
-
-    TODO: Parallelize it!.
     """
-    trajectory = list()
     state = initial_state
     done = torch.full(state.shape[:-1], False, dtype=torch.bool)
+    fields = _model_rollout_fields(fields, stack_dim)
+    columns = dict()
 
     assert max_steps > 0
     for i in range(max_steps):
@@ -347,14 +659,15 @@ def rollout_model(
             action_scale=action_scale,
             done=done,
             pi=pi,
+            compaction_threshold=compaction_threshold,
         )
-        trajectory.append(observation)
+        _write_rollout_step(columns, i, observation, max_steps, fields)
 
         state = next_state
         if torch.all(done):
             break
 
-    return trajectory
+    return _collect_rollout(columns, i + 1, stack_dim)
 
 
 def rollout_actions(
@@ -363,9 +676,15 @@ def rollout_actions(
     action_sequence,
     initial_state,
     termination_model=None,
+    stack_dim=None,
+    fields=None,
+    compaction_threshold=None,
 ):
     """Conduct a rollout of an action sequence interacting with a model.
 
+    The observations are written in place into [time x ...] tensors, one per field,
+    which grow up to [horizon x ...], see `_write_rollout_step'.
+
     Parameters
     ----------
     dynamical_model: AbstractModel
@@ -380,21 +699,32 @@ def rollout_actions(
         The dimensions are [1 x num_samples x dim_state].
     termination_model: Callable.
         Termination condition to finish the rollout.
+    stack_dim: int, optional.
+        If given, return the stacked observation, with the time dimension at
+        `stack_dim' as in `stack_list_of_tuples'.
+    fields: Iterable[str], optional.
+        Names of the fields of the stacked observation. By default, all the fields
+        that `step_model' sets. The other fields are not stored.
+    compaction_threshold: float, optional.
+        Fraction of done particles from which the models are only evaluated on the
+        active particles, see `step_model'. By default, they are always evaluated on
+        all the particles.
 
     Returns
     -------
     trajectory: Trajectory=List[Observation]
-        A list of observations.
+        A list of observations, or the stacked observation if `stack_dim' is given.
 
     Notes
     -----
     It will try to do the re-parametrization trick with the policy and models.
     """
-    trajectory = list()
     state = initial_state
     done = torch.full(state.shape[:-1], False, dtype=torch.bool)
+    fields = _model_rollout_fields(fields, stack_dim)
+    columns = dict()
 
-    for action in action_sequence:  # Normalized actions
+    for i, action in enumerate(action_sequence):  # Normalized actions
 
         observation, next_state, done = step_model(
             dynamical_model=dynamical_model,
@@ -404,11 +734,12 @@ def rollout_actions(
             action=action,
             action_scale=1.0,
             done=done,
+            compaction_threshold=compaction_threshold,
         )
-        trajectory.append(observation)
+        _write_rollout_step(columns, i, observation, len(action_sequence), fields)
 
         state = next_state
         if torch.all(done):
             break
 
-    return trajectory
+    return _collect_rollout(columns, i + 1, stack_dim)
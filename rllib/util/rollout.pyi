@@ -1,4 +1,4 @@
-from typing import Callable, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 from numpy import ndarray
 from torch import Tensor
@@ -6,10 +6,14 @@ from torch.distributions import Distribution
 
 from rllib.agent import AbstractAgent
 from rllib.dataset.datatypes import Action, Observation, State, Trajectory
+from rllib.dataset.episode_buffer import EpisodeBuffer
 from rllib.environment import AbstractEnvironment
 from rllib.model import AbstractModel
 from rllib.policy import AbstractPolicy
 
+def _get_entropy_and_log_p(
+    pi: Optional[Distribution], action: Union[Tensor, ndarray], action_scale: Action
+) -> Tuple[Union[float, Tensor], Union[float, Tensor]]: ...
 def step_env(
     environment: AbstractEnvironment,
     state: Union[int, ndarray],
@@ -17,7 +21,24 @@ def step_env(
     action_scale: Action,
     pi: Optional[Distribution] = ...,
     render: bool = ...,
+    buffer: Optional[EpisodeBuffer] = ...,
 ) -> Tuple[Observation, Union[int, ndarray], bool, dict]: ...
+def _sample_transitions(
+    dynamical_model: AbstractModel,
+    reward_model: AbstractModel,
+    termination_model: Optional[AbstractModel],
+    state: Tensor,
+    action: Tensor,
+    done: Optional[Tensor] = ...,
+) -> Tuple[Tensor, Tensor, Tensor, Tensor]: ...
+def _sample_active_transitions(
+    dynamical_model: AbstractModel,
+    reward_model: AbstractModel,
+    termination_model: Optional[AbstractModel],
+    state: Tensor,
+    action: Tensor,
+    done: Tensor,
+) -> Tuple[Tensor, Tensor, Tensor, Tensor]: ...
 def step_model(
     dynamical_model: AbstractModel,
     reward_model: AbstractModel,
@@ -27,6 +48,7 @@ def step_model(
     done: Optional[Tensor] = ...,
     action_scale: Action = 1.0,
     pi: Optional[Distribution] = ...,
+    compaction_threshold: Optional[float] = ...,
 ) -> Tuple[Observation, Tensor, Tensor]: ...
 def record(
     environment: AbstractEnvironment,
@@ -52,6 +74,17 @@ def rollout_agent(
         List[Callable[[AbstractAgent, AbstractEnvironment, int], None]]
     ] = ...,
 ) -> None: ...
+def _reset_vectorized(
+    environment: AbstractEnvironment, state: ndarray, indexes: Iterable[int]
+) -> ndarray: ...
+def rollout_agent_vectorized(
+    environment: AbstractEnvironment,
+    agent: AbstractAgent,
+    num_envs: Optional[int] = ...,
+    num_episodes: int = ...,
+    max_steps: int = ...,
+    print_frequency: int = ...,
+) -> None: ...
 def rollout_policy(
     environment: AbstractEnvironment,
     policy: AbstractPolicy,
@@ -59,6 +92,20 @@ def rollout_policy(
     max_steps: int = ...,
     render: bool = ...,
 ) -> List[Trajectory]: ...
+def _model_rollout_fields(
+    fields: Optional[Iterable[str]], stack_dim: Optional[int]
+) -> Tuple[str, ...]: ...
+def _write_rollout_step(
+    columns: Dict[str, Tensor],
+    step: int,
+    observation: Observation,
+    max_steps: int,
+    fields: Iterable[str],
+    initial_steps: int = ...,
+) -> None: ...
+def _collect_rollout(
+    columns: Dict[str, Tensor], num_steps: int, stack_dim: Optional[int] = ...
+) -> Union[Trajectory, Observation]: ...
 def rollout_model(
     dynamical_model: AbstractModel,
     reward_model: AbstractModel,
@@ -67,11 +114,17 @@ def rollout_model(
     initial_action: Optional[Action] = ...,
     termination_model: Optional[AbstractModel] = ...,
     max_steps: int = ...,
-) -> Trajectory: ...
+    stack_dim: Optional[int] = ...,
+    fields: Optional[Iterable[str]] = ...,
+    compaction_threshold: Optional[float] = ...,
+) -> Union[Trajectory, Observation]: ...
 def rollout_actions(
     dynamical_model: AbstractModel,
     reward_model: AbstractModel,
     action_sequence: Action,
     initial_state: State,
     termination_model: Optional[AbstractModel] = ...,
-) -> Trajectory: ...
+    stack_dim: Optional[int] = ...,
+    fields: Optional[Iterable[str]] = ...,
+    compaction_threshold: Optional[float] = ...,
+) -> Union[Trajectory, Observation]: ...
@@ -1,10 +1,25 @@
 import pytest
+import torch
+import torch.testing
 
-from rllib.agent import RandomAgent
+from rllib.agent import A2CAgent, RandomAgent
+from rllib.dataset.datatypes import Observation
+from rllib.dataset.utilities import stack_list_of_tuples
 from rllib.environment import GymEnvironment
 from rllib.environment.mdps import EasyGridWorld
+from rllib.environment.mujoco.locomotion import LargeStateTermination
+from rllib.model import LinearModel
 from rllib.policy import RandomPolicy
-from rllib.util.rollout import rollout_agent, rollout_policy
+from rllib.reward.quadratic_reward import QuadraticReward
+from rllib.util.rollout import (
+    _collect_rollout,
+    _write_rollout_step,
+    rollout_actions,
+    rollout_agent,
+    rollout_agent_vectorized,
+    rollout_model,
+    rollout_policy,
+)
 
 
 @pytest.fixture(
@@ -37,3 +52,125 @@ def test_rollout_easy_grid_world():
 
     policy = agent.policy
     rollout_policy(environment, policy)
+
+
+@pytest.mark.parametrize("num_episodes", [2, 5])
+def test_rollout_agent_vectorized(num_episodes):
+    environment = GymEnvironment("VPendulum-v0")
+    agent = RandomAgent.default(environment)
+    rollout_agent_vectorized(
+        environment, agent, num_envs=3, num_episodes=num_episodes, max_steps=10
+    )
+    assert agent.total_episodes == num_episodes
+    assert agent.total_steps == 10 * num_episodes
+
+
+def test_rollout_agent_vectorized_termination():
+    environment = GymEnvironment("VDiscrete-CartPole-v0")
+    agent = RandomAgent.default(environment)
+    rollout_agent_vectorized(environment, agent, num_envs=4, num_episodes=6)
+    assert agent.total_episodes == 6
+    assert all(0 < steps < 1000 for steps in agent.episode_steps)
+
+
+def test_rollout_on_policy_agent_vectorized():
+    environment = GymEnvironment("VPendulum-v0")
+    agent = A2CAgent.default(environment)
+    rollout_agent_vectorized(
+        environment, agent, num_envs=4, num_episodes=4, max_steps=5
+    )
+    assert agent.total_episodes == 4
+    assert agent.total_steps == 20
+
+
+@pytest.fixture
+def models():
+    dynamical_model = LinearModel(torch.eye(2), torch.ones(2, 1))
+    reward_model = QuadraticReward(torch.eye(2), torch.eye(1))
+    return dynamical_model, reward_model
+
+
+def test_rollout_model_stacked(models):
+    policy = RandomPolicy(dim_state=(2,), dim_action=(1,))
+    initial_state = torch.randn(4, 2)
+
+    torch.manual_seed(0)
+    trajectory = rollout_model(*models, policy, initial_state, max_steps=5)
+    assert len(trajectory) == 5
+    expected = stack_list_of_tuples(trajectory, dim=initial_state.ndim - 1)
+
+    torch.manual_seed(0)
+    observation = rollout_model(
+        *models, policy, initial_state, max_steps=5, stack_dim=initial_state.ndim - 1
+    )
+    assert observation.state.shape == (4, 5, 2)
+    assert observation.reward.shape == (4, 5)
+    for name in ["state", "action", "reward", "next_state", "done", "entropy"]:
+        torch.testing.assert_allclose(
+            getattr(observation, name), getattr(expected, name)
+        )
+
+
+def test_rollout_actions_fields(models):
+    action_sequence = torch.randn(6, 8, 1)
+    initial_state = torch.randn(8, 2)
+
+    trajectory = rollout_actions(*models, action_sequence, initial_state)
+    expected = stack_list_of_tuples(trajectory, dim=-2)
+
+    observation = rollout_actions(
+        *models, action_sequence, initial_state, stack_dim=-2, fields=["reward"]
+    )
+    torch.testing.assert_allclose(observation.reward, expected.reward)
+    assert observation.reward.shape == (8, 6)
+    assert torch.isnan(observation.next_state).all()
+
+
+def test_write_rollout_step_growth():
+    columns, rewards = dict(), torch.randn(7, 4)
+    for step, reward in enumerate(rewards[:5]):
+        observation = Observation(state=torch.randn(4, 2), reward=reward)
+        _write_rollout_step(columns, step, observation, 7, ["reward"], 2)
+        assert len(columns["reward"]) == min(7, 2 ** max(1, step.bit_length()))
+
+    observation = _collect_rollout(columns, 5, stack_dim=-1)
+    torch.testing.assert_allclose(observation.reward, rewards[:5].t())
+
+
+class CountingLinearModel(LinearModel):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_evaluations = 0
+
+    def forward(self, state, action, next_state=None):
+        self.num_evaluations += state.shape[0]
+        return super().forward(state, action, next_state)
+
+
+def test_rollout_actions_compaction(models):
+    dynamical_model = CountingLinearModel(1.1 * torch.eye(2), torch.ones(2, 1))
+    termination_model = LargeStateTermination(healthy_state_range=(-2, 2))
+    action_sequence = torch.randn(10, 64, 1)
+    initial_state = torch.randn(64, 2)
+
+    observations, num_evaluations = dict(), dict()
+    for threshold in [None, 0.0]:
+        dynamical_model.num_evaluations = 0
+        observations[threshold] = rollout_actions(
+            dynamical_model,
+            models[1],
+            action_sequence,
+            initial_state,
+            termination_model,
+            stack_dim=-2,
+            compaction_threshold=threshold,
+        )
+        num_evaluations[threshold] = dynamical_model.num_evaluations
+
+    full, compact = observations[None], observations[0.0]
+    for name in ["state", "action", "reward", "done"]:
+        torch.testing.assert_allclose(getattr(compact, name), getattr(full, name))
+    # The done particles keep their state only with compaction.
+    active = full.done == 0
+    torch.testing.assert_allclose(compact.next_state[active], full.next_state[active])
+    assert num_evaluations[0.0] < num_evaluations[None]
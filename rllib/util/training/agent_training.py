@@ -2,7 +2,8 @@
 import matplotlib.pyplot as plt
 import numpy as np
 
-from rllib.util.rollout import rollout_agent
+from rllib.environment import EnvironmentPool
+from rllib.util.rollout import rollout_agent, rollout_agent_vectorized
 
 from .utilities import Evaluate
 
@@ -43,14 +44,21 @@ def evaluate_agent(agent, environment, num_episodes, max_steps, render=True):
     num_episodes: int
     max_steps: int
     render: bool
+        Flag that indicates whether to render the environment or not. The
+        environments of an `EnvironmentPool' are not rendered.
     """
     with Evaluate(agent):
-        rollout_agent(
-            environment,
-            agent,
-            max_steps=max_steps,
-            num_episodes=num_episodes,
-            render=render,
-        )
+        if isinstance(environment, EnvironmentPool):
+            rollout_agent_vectorized(
+                environment, agent, max_steps=max_steps, num_episodes=num_episodes
+            )
+        else:
+            rollout_agent(
+                environment,
+                agent,
+                max_steps=max_steps,
+                num_episodes=num_episodes,
+                render=render,
+            )
         returns = np.mean(agent.logger.get("eval_return")[-num_episodes:])
         print(f"Test Cumulative Rewards: {returns}")
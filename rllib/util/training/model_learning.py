@@ -1,4 +1,6 @@
 """Model Learning Functions."""
+import math
+
 import gpytorch.settings
 import numpy as np
 import torch
@@ -41,6 +43,16 @@ def train_ensemble_step(model, observation, optimizer, mask):
     return ensemble_loss
 
 
+def train_ensemble_heads_step(model, observation, optimizer):
+    """Train a model ensemble with one batch per head.
+
+    The observation has shape [num_heads x batch_size x ...], and all the heads are
+    trained with a single forward pass.
+    """
+    with PredictionStrategy(model, prediction_strategy="multi_head"):
+        return train_nn_step(model, observation, optimizer)
+
+
 def train_exact_gp_type2mll_step(model, observation, optimizer):
     """Train a GP using type-2 Marginal-Log-Likelihood optimization."""
     optimizer.zero_grad()
@@ -66,6 +78,7 @@ def train_model(
     non_decrease_iter=float("inf"),
     logger=None,
     validation_set=None,
+    per_head_batches=False,
 ):
     """Train a Predictive Model.
 
@@ -91,6 +104,9 @@ def train_model(
         Progress logger.
     validation_set: ExperienceReplay, optional.
         Dataset to validate with.
+    per_head_batches: bool, optional (default=False).
+        Train each head of an ensemble with its own batch, sampled from its bootstrap
+        mask with `train_set.sample_heads', instead of weighting a common batch.
     """
     if logger is None:
         logger = Logger(f"{model.name}_training")
@@ -102,11 +118,23 @@ def train_model(
     train_loader = DataLoader(train_set, batch_size=batch_size, shuffle=True)
     validation_loader = DataLoader(validation_set, batch_size=batch_size, shuffle=False)
 
+    per_head_batches = per_head_batches and isinstance(model, EnsembleModel)
     for _ in tqdm(range(max_iter)):
-        for observation, idx, mask in train_loader:
-            observation = Observation(**observation)
+        if per_head_batches:  # The sampled batches replace the weighted ones.
+            train_batches = (
+                (*train_set.sample_heads(batch_size), None)
+                for _ in range(math.ceil(len(train_set) / batch_size))
+            )
+        else:
+            train_batches = train_loader
+
+        for observation, idx, mask in train_batches:
+            if not per_head_batches:
+                observation = Observation(**observation)
             observation.action = observation.action[..., : model.dim_action[0]]
-            if isinstance(model, EnsembleModel):
+            if per_head_batches:
+                loss = train_ensemble_heads_step(model, observation, optimizer)
+            elif isinstance(model, EnsembleModel):
                 loss = train_ensemble_step(model, observation, optimizer, mask)
             elif isinstance(model, NNModel):
                 loss = train_nn_step(model, observation, optimizer)
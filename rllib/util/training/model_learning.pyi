@@ -22,6 +22,9 @@ def train_nn_step(
 def train_ensemble_step(
     model: EnsembleModel, observation: Observation, optimizer: Optimizer, mask: Tensor
 ) -> Tensor: ...
+def train_ensemble_heads_step(
+    model: EnsembleModel, observation: Observation, optimizer: Optimizer
+) -> Tensor: ...
 def train_exact_gp_type2mll_step(
     model: ExactGPModel, observation: Observation, optimizer: Optimizer
 ) -> Tensor: ...
@@ -35,6 +38,7 @@ def train_model(
     non_decrease_iter: int = ...,
     logger: Optional[Logger] = ...,
     validation_set: Optional[ExperienceReplay] = ...,
+    per_head_batches: bool = ...,
 ) -> None: ...
 def calibrate_model(
     model: AbstractModel,
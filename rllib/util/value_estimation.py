@@ -6,7 +6,6 @@ import scipy
 import scipy.signal
 import torch
 
-from rllib.dataset.utilities import stack_list_of_tuples
 from rllib.util.neural_networks.utilities import repeat_along_dimension
 from rllib.util.rollout import rollout_model
 from rllib.util.utilities import RewardTransformer, get_backend
@@ -288,15 +287,15 @@ def mb_return(
     """
     # Repeat states to get a better estimate of the expected value
     state = repeat_along_dimension(state, number=num_samples, dim=0)
-    trajectory = rollout_model(
+    observation = rollout_model(
         dynamical_model=dynamical_model,
         reward_model=reward_model,
         policy=policy,
         initial_state=state,
         max_steps=num_steps,
         termination_model=termination_model,
+        stack_dim=state.ndim - 1,
     )
-    observation = stack_list_of_tuples(trajectory, dim=state.ndim - 1)
     value = mc_return(
         observation=observation,
         gamma=gamma,